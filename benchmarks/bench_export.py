@@ -0,0 +1,76 @@
+# benchmarks/bench_export.py
+"""
+Выгрузка заказов (/admin_export): время и пиковая память.
+
+Для каждого размера истории генерируется снимок (benchmarks.bench_handlers.seed_history),
+прошедшие оплаченные и отменённые заказы уходят в архив, затем вся история
+за период выгружается в csv.gz через OrderRepository.iter_by_dates и
+utils.export.write_export. tracemalloc замеряет пик памяти сверх уже
+загруженных рабочих данных: он ограничен одной месячной партицией архива
+и порцией CHUNK_ROWS, а не размером всей выгрузки.
+Заодно проверяется, что в файл попали все заказы ровно по одному разу.
+
+Запуск из корня репозитория (нужен Bot_berries.env):
+    python -m benchmarks.bench_export [размеры...]
+"""
+import asyncio
+import csv
+import datetime
+import gzip
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.bench_handlers import seed_history
+from storage.backends import JsonBackend
+from storage.orders import OrderRepository
+from utils.export import write_export
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+
+async def measure(size: int) -> None:
+    seed_history(size)
+    repo = OrderRepository(JsonBackend())
+    repo.load()
+    await repo.archive_async()
+    await repo.compact_async()
+
+    today = datetime.date.today()
+    path = Path("export.csv.gz")
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = await write_export(path, repo.iter_by_dates(today - datetime.timedelta(days=400),
+                                                        today + datetime.timedelta(days=60)), "csv")
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    repo.backend.close()
+
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        ids = [row[0] for row in csv.reader(f)][1:]
+    if count != size or len(set(ids)) != size:
+        raise SystemExit(f"❌ Выгружено {count} заказов ({len(set(ids))} разных), ожидалось {size}")
+    print(f"{size:>10}{len(repo.archive):>10}{elapsed:>10.2f}{path.stat().st_size / 1024:>12.0f}{peak / 1024:>12.0f}")
+
+
+async def main() -> None:
+    sizes = [int(x) for x in sys.argv[1:]] or DEFAULT_SIZES
+    logging.getLogger().setLevel(logging.ERROR)
+    print(f"{'заказов':>10}{'в архиве':>10}{'время, с':>10}{'файл, КБ':>12}{'пик, КБ':>12}")
+    cwd = os.getcwd()
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                await measure(size)
+            finally:
+                os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
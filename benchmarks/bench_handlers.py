@@ -0,0 +1,280 @@
+# benchmarks/bench_handlers.py
+"""
+Задержка обработчиков бота при разном объёме истории заказов.
+
+Собирает настоящий Dispatcher (main.create_dispatcher: все роутеры из
+handlers, хранилище FSM, запуск и остановка) и прогоняет через
+dp.feed_update синтетические обновления полного сценария покупателя:
+/start → контакт → ФИО → выбор ягод и количества → /order → дата → время →
+/my_orders → листание → отмена, а вслед за ним — все команды админа,
+включая массовые /oplata и /cancel_order_admin и /admin_export.
+Запросы к Telegram подменены заглушкой, поэтому замеряется только работа
+бота: фильтры, FSM, хранилище, клавиатуры и тексты. Исключение — массовые
+команды: они ждут токены лимитов рассылки (общих с идущей /admin_broadcast),
+и в их время входит это ожидание.
+
+Перед каждым прогоном во временной папке создаётся история из N заказов
+(бэкенд берётся из STORAGE_BACKEND, как при обычном запуске); завершённые
+заказы прошлых дат до начала замеров уходят в архив. Для каждого
+шага печатаются p50/p95/p99, в конце — сводка и обновлений в секунду.
+
+Запуск из корня репозитория (нужен Bot_berries.env):
+    python -m benchmarks.bench_handlers [размеры_истории через запятую] [сценариев]
+    python -m benchmarks.bench_handlers 1000,10000,100000 200
+"""
+import asyncio
+import datetime
+import itertools
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+from aiogram import Bot
+from aiogram.types import CallbackQuery, Chat, Contact, Message, Update, User as TgUser
+
+from benchmarks.bench_webhook import StubSession
+from config import ADMIN_ID, BERRY_PRICES
+from handlers import admin_router, common_router, order_router, start_router, user_menu_router
+from keyboards.inline import delivery_dates
+from main import create_dispatcher
+from storage.backends import JsonBackend
+from storage.orders import cart_fingerprint, orders_repo
+from storage.schema import Order, OrdersData, User
+from storage.slots import SLOT_TIMES
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_SCENARIOS = 200
+ORDERS_PER_USER = 10    # заказов в истории на одного пользователя
+UPCOMING_ORDERS = 300   # сколько последних заказов истории приходится на ближайшие дни (остальные — в прошлом)
+FIRST_USER_ID = 5_000_000
+BULK_ORDERS = 5         # заказов в одной массовой команде админа (/oplata 1,2,3 …)
+EXPORT_DAYS = 7         # период /admin_export, дней до сегодня
+
+STATUSES = ("ожидает оплату", "оплачено", "отменён")
+BERRY_NAMES = list(BERRY_PRICES)
+
+_ids = itertools.count(1)
+
+
+# === Синтетические обновления ===
+def _tg_user(user_id: int) -> TgUser:
+    return TgUser(id=user_id, is_bot=False, first_name="bench")
+
+
+def _message(user_id: int, text: str = None, contact: Contact = None) -> Message:
+    return Message(
+        message_id=next(_ids),
+        date=datetime.datetime.now(),
+        chat=Chat(id=user_id, type="private"),
+        from_user=_tg_user(user_id),
+        text=text,
+        contact=contact
+    )
+
+
+def message_update(user_id: int, text: str = None, contact: Contact = None) -> Update:
+    return Update(update_id=next(_ids), message=_message(user_id, text, contact))
+
+
+def callback_update(user_id: int, data: str) -> Update:
+    return Update(update_id=next(_ids), callback_query=CallbackQuery(
+        id=str(next(_ids)),
+        from_user=_tg_user(user_id),
+        chat_instance="bench",
+        message=_message(user_id, "…"),
+        data=data
+    ))
+
+
+# === История заказов ===
+def _phone(user_id: int) -> str:
+    return f"9{user_id % 10**9:09d}"
+
+
+def seed_history(size: int) -> int:
+    """Пишет в текущую папку снимки orders.json и users.json с size заказами; возвращает число пользователей."""
+    rng = random.Random(size)
+    today = datetime.date.today()
+    users_count = max(1, size // ORDERS_PER_USER)
+    users = {}
+    for i in range(users_count):
+        user_id = FIRST_USER_ID - users_count + i
+        users[_phone(user_id)] = User(user_id=user_id, full_name="Петров Пётр Петрович", phone=_phone(user_id))
+    user_list = list(users.values())
+
+    orders = {}
+    for order_id in range(1, size + 1):
+        user = user_list[order_id % users_count]
+        berry = rng.choice(BERRY_NAMES)
+        kg = rng.choice((0.5, 1.0, 2.0, 3.0))
+        cart = [{"berry": berry, "kg": kg, "price_per_kg": BERRY_PRICES[berry],
+                 "total_price": round(kg * BERRY_PRICES[berry], 2)}]
+        # Большая часть истории — в прошлом, последние заказы — на ближайшие дни
+        days = rng.randint(-365, -1) if order_id <= size - UPCOMING_ORDERS else rng.randint(1, 30)
+        order = orders[str(order_id)] = Order(
+            user_id=user.user_id,
+            full_name=user.full_name,
+            phone=user.phone,
+            cart=cart,
+            date=(today + datetime.timedelta(days=days)).strftime("%d.%m.%Y"),
+            time=rng.choice(SLOT_TIMES),
+            status=rng.choice(STATUSES)
+        )
+        order.fingerprint = cart_fingerprint(order.cart)
+
+    backend = JsonBackend()
+    backend.prepare_compaction(OrdersData(last_id=size, orders=orders), force=True)()
+    backend.prepare_users_compaction(users, force=True)()
+    backend.close()
+    return users_count
+
+
+# === Сценарии ===
+def customer_steps(user_id: int, n: int):
+    """Шаги одного покупателя: (название шага, обновление или функция, которая его построит)."""
+    phone = _phone(user_id)
+    dates = delivery_dates(datetime.date.today())
+    slot = {}
+
+    def choose_date() -> Update:
+        # Первая дата со свободным слотом, начиная с n-й: история могла занять часть слотов
+        slots = orders_repo.slot_index()
+        slot["date"] = next(d for d in dates[n % 30:] + dates if not slots.is_date_full(d))
+        return callback_update(user_id, f"date_{slot['date']}")
+
+    def choose_time() -> Update:
+        slots = orders_repo.slot_index()
+        time_str = next(t for t in SLOT_TIMES if not slots.is_full(slot["date"], t))
+        return callback_update(user_id, f"time_{time_str}")
+
+    def last_order() -> str:
+        return orders_repo.user_orders(user_id)[-1][0]
+
+    yield "/start", message_update(user_id, "/start")
+    yield "контакт", message_update(user_id, contact=Contact(
+        phone_number=f"+7{phone}", first_name="bench", user_id=user_id))
+    yield "ФИО", message_update(user_id, "Иванов Иван Иванович")
+    yield "start_order", callback_update(user_id, "start_order")
+    yield "ягода", message_update(user_id, f"Голубика — {BERRY_PRICES['Голубика']}₽")
+    yield "количество", message_update(user_id, "2")
+    yield "ягода", message_update(user_id, f"Черника — {BERRY_PRICES['Черника']}₽")
+    yield "количество", message_update(user_id, "1,5")
+    yield "Завершить заказ", message_update(user_id, "Завершить заказ")
+    yield "/order", message_update(user_id, "/order")
+    yield "date_", choose_date
+    yield "time_", choose_time
+    yield "/my_orders", message_update(user_id, "/my_orders")
+    yield "my_orders_", lambda: callback_update(user_id, f"my_orders_before_{last_order()}")
+    if n % 2:
+        yield "/cancel_order", message_update(user_id, "/cancel_order")
+    else:
+        yield "cancel_page_", lambda: callback_update(user_id, f"cancel_page_{last_order()}")
+
+
+def admin_steps(pending: List[str], n: int):
+    """
+    Все команды админа. /oplata и /cancel_order_admin — и по одному заказу, и массово
+    (номера через запятую, все неоплаченные на дату); номера берутся из очереди неоплаченных.
+    """
+    today = datetime.date.today()
+    dates = delivery_dates(today)
+
+    def next_pending() -> str:
+        # Когда неоплаченные заказы из истории кончились — берём самый свежий
+        return pending.pop() if pending else str(orders_repo.data.last_id)
+
+    def next_bulk() -> str:
+        return ",".join(next_pending() for _ in range(BULK_ORDERS))
+
+    yield "/help", message_update(ADMIN_ID, "/help")
+    yield "/admin_orders", message_update(ADMIN_ID, "/admin_orders")
+    yield "admin_orders_", lambda: callback_update(ADMIN_ID, f"admin_orders_before_{orders_repo.data.last_id - 9}")
+    yield "/admin_slots", message_update(ADMIN_ID, "/admin_slots")
+    yield "/admin_stats", message_update(ADMIN_ID, "/admin_stats")
+    yield "/admin_stats all", message_update(ADMIN_ID, "/admin_stats all")
+    yield "/oplata", lambda: message_update(ADMIN_ID, f"/oplata {next_pending()} https://pay.example/bench")
+    yield "/cancel_order_admin", lambda: message_update(ADMIN_ID, f"/cancel_order_admin {next_pending()} бенчмарк")
+    yield "/oplata N,M,…", lambda: message_update(ADMIN_ID, f"/oplata {next_bulk()} https://pay.example/bench")
+    yield "/cancel_order_admin N,M,…", lambda: message_update(ADMIN_ID, f"/cancel_order_admin {next_bulk()} бенчмарк")
+    yield "/cancel_order_admin дата", message_update(ADMIN_ID, f"/cancel_order_admin {dates[n % len(dates)]} бенчмарк")
+    yield "/admin_export", message_update(ADMIN_ID, "/admin_export {:%d.%m.%Y} {:%d.%m.%Y}".format(
+        today - datetime.timedelta(days=EXPORT_DAYS), today))
+    yield "/admin_broadcast", message_update(ADMIN_ID, "/admin_broadcast Свежая клубника уже в продаже!")
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _reset_routers() -> None:
+    # Роутеры — модульные синглтоны; для нового Dispatcher их нужно отвязать от прежнего
+    for router in (common_router, start_router, order_router, user_menu_router, admin_router):
+        router._parent_router = None
+
+
+async def bench(size: int, scenarios: int) -> None:
+    timings: Dict[str, List[float]] = defaultdict(list)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            users_count = seed_history(size)
+            _reset_routers()
+            # Сценарии идут без пауз — защита от флуда отбросила бы большую часть шагов
+            dp = create_dispatcher(Path(tmp) / "fsm.db", throttle_limits={})
+            bot = Bot(token="42:BENCH", session=StubSession())
+            await dp.emit_startup(bot=bot, dispatcher=dp)
+            # Прошлые завершённые заказы уходят в архив фоном сразу после запуска —
+            # дожидаемся этого, чтобы замерять обычный режим работы
+            await orders_repo.archive_async()
+            await orders_repo.compact_async()
+            pending = [oid for oid, _ in orders_repo.orders_by_status("ожидает оплату")]
+
+            async def feed(name, update) -> None:
+                if callable(update):
+                    update = update()
+                start = time.perf_counter()
+                await dp.feed_update(bot, update)
+                timings[name].append(time.perf_counter() - start)
+
+            started = time.perf_counter()
+            for n in range(scenarios):
+                for name, update in customer_steps(FIRST_USER_ID + n, n):
+                    await feed(name, update)
+                for name, update in admin_steps(pending, n):
+                    await feed(name, update)
+            elapsed = time.perf_counter() - started
+
+            # Остановка сворачивает хранилище и закрывает базу FSM
+            await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        finally:
+            os.chdir(cwd)
+
+    total = sum(len(values) for values in timings.values())
+    everything = [t for values in timings.values() for t in values]
+    print(f"\nЗаказов в истории: {size} (пользователей: {users_count}), сценариев: {scenarios}")
+    print(f"{'шаг':<28}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}")
+    for name, values in timings.items():
+        print(f"{name:<28}" + "".join(f"{percentile(values, q) * 1000:9.2f}" for q in (0.5, 0.95, 0.99)))
+    print(f"{'все шаги':<28}" + "".join(f"{percentile(everything, q) * 1000:9.2f}" for q in (0.5, 0.95, 0.99)))
+    print(f"Обновлений: {total} за {elapsed:.2f} с — {total / elapsed:.0f} обновлений/с")
+
+
+async def main() -> None:
+    sizes = [int(s) for s in sys.argv[1].split(",")] if len(sys.argv) > 1 else DEFAULT_SIZES
+    scenarios = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SCENARIOS
+    # Логи фоновых задач (уведомления, рассылка) не нужны в выводе
+    logging.getLogger().setLevel(logging.ERROR)
+    for size in sizes:
+        await bench(size, scenarios)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
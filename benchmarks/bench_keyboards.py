@@ -0,0 +1,31 @@
+# benchmarks/bench_keyboards.py
+"""
+Стоимость получения клавиатур на одно обновление: сборка с нуля против кэша.
+
+Запуск из корня репозитория (нужен Bot_berries.env):
+    python -m benchmarks.bench_keyboards
+"""
+import timeit
+from datetime import date
+
+from keyboards.inline import get_date_keyboard, get_time_keyboard
+from keyboards.reply import _build_berry_keyboard, _catalog, get_berry_keyboard
+
+NUMBER = 2000
+
+CASES = [
+    ("berry", lambda: _build_berry_keyboard.__wrapped__(_catalog()), get_berry_keyboard),
+    ("date", lambda: get_date_keyboard.__wrapped__(date.today()), lambda: get_date_keyboard(date.today())),
+    ("time", get_time_keyboard.__wrapped__, get_time_keyboard),
+]
+
+
+def main() -> None:
+    for name, uncached, cached in CASES:
+        before = timeit.timeit(uncached, number=NUMBER) / NUMBER * 1e6
+        after = timeit.timeit(cached, number=NUMBER) / NUMBER * 1e6
+        print(f"{name:<6} сборка {before:8.1f} мкс   кэш {after:6.2f} мкс   (x{before / after:.0f})")
+
+
+if __name__ == "__main__":
+    main()
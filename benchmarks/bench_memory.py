@@ -0,0 +1,122 @@
+# benchmarks/bench_memory.py
+"""
+Память на один заказ в истории: заказы как вложенные dict-ы (результат
+json.loads снимка orders.json) против компактных объектов storage.schema
+(__slots__, интернированные строки, упакованные общие корзины).
+
+Для каждого размера генерируется снимок с правдоподобным разнообразием
+(клиенты с повторными заказами, даты за год, 1–3 позиции в корзине), затем в
+отдельном процессе tracemalloc замеряет, сколько памяти занимает загруженная
+история в каждом представлении. Заодно проверяется, что преобразование
+туда и обратно не теряет данных.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_memory [размеры...]
+"""
+import datetime
+import gc
+import hashlib
+import json
+import multiprocessing
+import random
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+ORDERS_PER_USER = 10
+
+SURNAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов"]
+NAMES = ["Иван", "Пётр", "Алексей", "Сергей", "Андрей", "Дмитрий", "Михаил", "Николай"]
+PATRONYMICS = ["Иванович", "Петрович", "Сергеевич", "Андреевич", "Николаевич", "Михайлович"]
+PRICES = {"Голубика": 500, "Шелковица": 600, "Черника": 450, "Черешня": 400,
+          "Бузина": 350, "Смородина чёрная": 380, "Клюква": 420, "Земляника": 550, "Вишня": 300}
+KGS = (0.5, 1.0, 1.5, 2.0, 3.0, 5.0)
+STATUSES = ("ожидает оплату", "оплачено", "отменён")
+TIMES = tuple(f"{h:02d}:00" for h in range(10, 21))
+
+
+def _fingerprint(cart: list) -> str:
+    # Как storage.orders.cart_fingerprint, но без импорта хранилища в родительский процесс
+    pairs = sorted((item["berry"], float(item["kg"])) for item in cart)
+    canonical = ";".join(f"{berry}:{kg!r}" for berry, kg in pairs)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def write_snapshot(path: Path, count: int) -> None:
+    """Пишет снимок orders.json из count заказов, не держа их все в памяти."""
+    rng = random.Random(count)
+    start = datetime.date(2025, 1, 1)
+    dates = [(start + datetime.timedelta(days=i)).strftime("%d.%m.%Y") for i in range(365)]
+    users = max(1, count // ORDERS_PER_USER)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'{{"last_id": {count}, "orders": {{')
+        for order_id in range(1, count + 1):
+            user = order_id % users
+            user_rng = random.Random(user)
+            cart = []
+            for berry in rng.sample(list(PRICES), rng.randint(1, 3)):
+                kg = rng.choice(KGS)
+                cart.append({"berry": berry, "kg": kg, "price_per_kg": PRICES[berry],
+                             "total_price": round(kg * PRICES[berry], 2)})
+            order = {
+                "user_id": 1_000_000 + user,
+                "full_name": f"{user_rng.choice(SURNAMES)} {user_rng.choice(NAMES)} {user_rng.choice(PATRONYMICS)}",
+                "phone": f"9{user:09d}",
+                "cart": cart,
+                "date": rng.choice(dates),
+                "time": rng.choice(TIMES),
+                "status": rng.choice(STATUSES),
+                "fingerprint": _fingerprint(cart),
+            }
+            if order_id > 1:
+                f.write(", ")
+            f.write(f'"{order_id}": {json.dumps(order, ensure_ascii=False)}')
+        f.write("}}")
+
+
+def measure(path: str, form: str, results) -> None:
+    """Выполняется в отдельном процессе: память загруженной истории в представлении form."""
+    from storage.schema import OrdersData
+
+    payload = Path(path).read_text(encoding="utf-8")
+    gc.collect()
+    tracemalloc.start()
+    if form == "dict":
+        data = json.loads(payload)
+    else:
+        data = OrdersData(**json.loads(payload))
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if form == "slots":
+        # Обратное преобразование должно давать ровно исходный снимок
+        assert data.to_dict() == json.loads(payload), "преобразование в JSON потеряло данные"
+    results.put(size)
+
+
+def run(path: Path, form: str) -> int:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=measure, args=(str(path), form, results))
+    process.start()
+    size = results.get()
+    process.join()
+    return size
+
+
+def main() -> None:
+    sizes = [int(x) for x in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'заказов':>10}{'dict, байт/заказ':>20}{'__slots__, байт/заказ':>24}{'экономия':>10}")
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "orders.json"
+            write_snapshot(path, count)
+            as_dicts = run(path, "dict")
+            as_slots = run(path, "slots")
+        print(f"{count:>10}{as_dicts / count:>20.0f}{as_slots / count:>24.0f}{as_dicts / as_slots:>9.1f}×")
+
+
+if __name__ == "__main__":
+    main()
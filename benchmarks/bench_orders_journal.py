@@ -0,0 +1,80 @@
+# benchmarks/bench_orders_journal.py
+"""
+Сравнение стоимости одного изменения заказа:
+полная перезапись orders.json (как было раньше) против дозаписи в журнал.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_orders_journal [размеры...]
+"""
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from storage.backends import JsonBackend
+from storage.orders import OrderRepository
+from storage.schema import OrdersData
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_orders(count: int) -> dict:
+    order = {
+        "user_id": 100,
+        "full_name": "Иванов Иван Иванович",
+        "phone": "9001234567",
+        "cart": [{"berry": "Голубика", "kg": 2.0, "price_per_kg": 500, "total_price": 1000.0}],
+        "date": "20.10.2026",
+        "time": "12:00",
+        "status": "ожидает оплату",
+    }
+    return {"last_id": count, "orders": {str(i): dict(order) for i in range(1, count + 1)}}
+
+
+def bench_full_rewrite(path: Path, data: dict, repeats: int) -> list:
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        data["orders"][str(i + 1)]["status"] = "оплачено"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_journal(tmp: Path, data: dict, repeats: int) -> list:
+    backend = JsonBackend(tmp / "orders.json", tmp / "orders.journal.jsonl", tmp / "users.json",
+                          compact_every=10 ** 9)
+    repo = OrderRepository(backend)
+    repo._data = OrdersData(**data)
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        repo.set_status(str(i + 1), "отменён")
+        timings.append(time.perf_counter() - start)
+    backend.close()
+    return timings
+
+
+def report(name: str, timings: list) -> None:
+    print(f"  {name:<16} median {statistics.median(timings) * 1000:10.3f} ms"
+          f"   max {max(timings) * 1000:10.3f} ms   (n={len(timings)})")
+
+
+def main() -> None:
+    sizes = [int(x) for x in sys.argv[1:]] or DEFAULT_SIZES
+    for size in sizes:
+        data = make_orders(size)
+        # Полная перезапись при 1M заказов занимает секунды — ограничиваем число повторов
+        rewrite_repeats = max(3, min(50, 200_000 // size))
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            print(f"{size} заказов:")
+            report("full rewrite", bench_full_rewrite(tmp / "orders_full.json", data, rewrite_repeats))
+            report("journal append", bench_journal(tmp, data, 1000))
+
+
+if __name__ == "__main__":
+    main()
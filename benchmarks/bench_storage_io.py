@@ -0,0 +1,66 @@
+# benchmarks/bench_storage_io.py
+"""
+Задержка «посторонних» обновлений во время записи большого JSON-снимка:
+синхронная запись прямо в event loop против записи через storage.io.run_io.
+
+Каждое «обновление» — корутина, которая ждёт 1 мс и замеряет,
+насколько позже она получила управление. Запуск из корня репозитория:
+    python -m benchmarks.bench_storage_io [количество_пользователей]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from storage.io import atomic_write_json, run_io
+
+DEFAULT_USERS = 100_000
+UPDATES = 2000
+
+
+async def unrelated_updates(latencies: list) -> None:
+    for _ in range(UPDATES):
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        latencies.append(time.perf_counter() - start - 0.001)
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def run(mode: str, path: Path, users: dict) -> list:
+    latencies = []
+    updates = asyncio.create_task(unrelated_updates(latencies))
+    while not updates.done():
+        if mode == "sync":
+            atomic_write_json(path, users)
+        elif mode == "async":
+            await run_io(atomic_write_json, path, users)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_USERS
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "users.json"
+        users = {
+            f"9{i:09d}": {"user_id": i, "full_name": "Иванов Иван Иванович", "phone": f"9{i:09d}"}
+            for i in range(count)
+        }
+        atomic_write_json(path, users)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"users.json: {count} пользователей, {size_mb:.1f} МБ")
+        for mode in ("idle", "sync", "async"):
+            latencies = asyncio.run(run(mode, path, users))
+            print(f"  {mode:<6} p50 {statistics.median(latencies) * 1000:8.2f} ms"
+                  f"   p99 {percentile(latencies, 0.99) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/bench_webhook.py
+"""
+Пропускная способность приёма обновлений: вебхук против long polling.
+
+Оба режима гоняют одни и те же синтетические обновления (/help от разных
+пользователей) через настоящий Dispatcher с роутером common. Запросы к
+Telegram подменены заглушкой; для polling каждый getUpdates стоит RTT секунд
+(имитация сетевой задержки), вебхук получает обновления POST-запросами
+на локальный aiohttp-сервер с секретным токеном.
+
+Клиент, шлющий POST-запросы, работает в том же процессе и event loop, что
+и сервер, поэтому цифры для вебхука — оценка снизу.
+
+Запуск из корня репозитория (нужен Bot_berries.env):
+    python -m benchmarks.bench_webhook [число_обновлений]
+"""
+import asyncio
+import datetime
+import sys
+import time
+
+from aiohttp import ClientSession, web
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, GetUpdates, SendMessage
+from aiogram.types import Chat, Message, Update, User
+
+from handlers import common_router
+from utils.webhook import create_webhook_app
+
+DEFAULT_UPDATES = 5000
+RTT = 0.05              # сетевая задержка одного getUpdates, с
+POLL_LIMIT = 100        # обновлений за один getUpdates (максимум Telegram)
+CONCURRENCY = 40        # одновременных POST-запросов (max_connections у Telegram до 100)
+SECRET = "bench-secret"
+PORT = 8765
+
+
+def make_update(i: int) -> Update:
+    uid = 1_000_000 + i
+    return Update(update_id=i + 1, message=Message(
+        message_id=i + 1,
+        date=datetime.datetime.now(),
+        chat=Chat(id=uid, type="private"),
+        from_user=User(id=uid, is_bot=False, first_name="u"),
+        text="/help"
+    ))
+
+
+class StubSession(BaseSession):
+    """Заглушка Bot API: отвечает на sendMessage мгновенно, getUpdates отдаёт заготовленные обновления."""
+
+    def __init__(self, updates=()):
+        super().__init__()
+        self.updates = list(updates)
+        self.position = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, GetUpdates):
+            await asyncio.sleep(RTT)
+            offset = method.offset or 0
+            start = max(self.position, offset - 1)
+            batch = self.updates[start:start + POLL_LIMIT]
+            self.position = start + len(batch)
+            return batch
+        if isinstance(method, GetMe):
+            return User(id=42, is_bot=True, first_name="bench")
+        if isinstance(method, SendMessage):
+            return Message(message_id=1, date=datetime.datetime.now(),
+                           chat=Chat(id=method.chat_id, type="private"), text=method.text)
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def make_dispatcher(total: int):
+    common_router._parent_router = None  # роутер переиспользуется между прогонами
+    dp = Dispatcher()
+    dp.include_router(common_router)
+    done = asyncio.Event()
+    handled = 0
+
+    @dp.update.outer_middleware()
+    async def count(handler, event, data):
+        nonlocal handled
+        try:
+            return await handler(event, data)
+        finally:
+            handled += 1
+            if handled >= total:
+                done.set()
+
+    return dp, done
+
+
+async def bench_polling(total: int) -> float:
+    updates = [make_update(i) for i in range(total)]
+    bot = Bot(token="42:BENCH", session=StubSession(updates))
+    dp, done = make_dispatcher(total)
+    start = time.perf_counter()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=0))
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await dp.stop_polling()
+    await polling
+    return elapsed
+
+
+async def bench_webhook(total: int) -> float:
+    bot = Bot(token="42:BENCH", session=StubSession())
+    dp, done = make_dispatcher(total)
+    app = create_webhook_app(dp, bot, "/webhook", SECRET)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    payloads = [make_update(i).model_dump_json(exclude_none=True) for i in range(total)]
+    url = f"http://127.0.0.1:{PORT}/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET, "Content-Type": "application/json"}
+    try:
+        async with ClientSession() as http:
+            # Проверка токена: запрос без секрета должен быть отклонён
+            async with http.post(url, data=payloads[0]) as resp:
+                assert resp.status == 401, resp.status
+
+            queue = iter(payloads)
+
+            async def sender():
+                for body in queue:
+                    async with http.post(url, data=body, headers=headers) as resp:
+                        assert resp.status == 200, resp.status
+
+            start = time.perf_counter()
+            await asyncio.gather(*(sender() for _ in range(CONCURRENCY)))
+            await done.wait()
+            return time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+
+
+async def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_UPDATES
+    print(f"Обновлений: {total}, RTT getUpdates: {RTT * 1000:.0f} мс, параллельных POST: {CONCURRENCY}")
+    for name, bench in (("polling", bench_polling), ("webhook", bench_webhook)):
+        elapsed = await bench(total)
+        print(f"{name:<8} {elapsed:7.2f} с   {total / elapsed:8.0f} обновлений/с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
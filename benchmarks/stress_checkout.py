@@ -0,0 +1,121 @@
+# benchmarks/stress_checkout.py
+"""
+Нагрузочная проверка оформления заказа двойными нажатиями.
+
+Собирает настоящий Dispatcher (main.create_dispatcher) и для каждого из N
+покупателей проходит сценарий до выбора даты, а затем шлёт очередь из K
+одинаковых нажатий date_ и K одинаковых нажатий time_ одновременно — как
+при «дребезге» кнопки или повторной доставке обновления. Все покупатели
+работают параллельно. Запросы к Telegram подменены заглушкой с сетевой
+задержкой, поэтому обработки повторов действительно пересекаются во времени.
+Напоследок каждый покупатель ещё раз нажимает ту же кнопку времени уже
+после оформления заказа.
+
+Ожидается ровно один заказ на покупателя; печатается, сколько повторов
+не дошло до обработчика (дождались первой обработки или пришли сразу после неё).
+
+Запуск из корня репозитория (нужен Bot_berries.env):
+    python -m benchmarks.stress_checkout [покупателей] [нажатий_в_очереди]
+"""
+import asyncio
+import datetime
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.types import Contact
+
+from benchmarks.bench_handlers import _reset_routers, callback_update, message_update
+from benchmarks.bench_webhook import StubSession
+from config import BERRY_PRICES
+from keyboards.inline import delivery_dates
+from main import create_dispatcher
+from storage.orders import orders_repo
+from storage.slots import SLOT_TIMES
+from utils.inflight import coalesced_total
+
+DEFAULT_USERS = 200
+DEFAULT_BURST = 5
+LATENCY = 0.02          # задержка одного запроса к Bot API, с
+FIRST_USER_ID = 7_000_000
+
+
+class LatencySession(StubSession):
+    """Заглушка Bot API, каждый запрос к которой занимает LATENCY секунд."""
+
+    async def make_request(self, bot, method, timeout=None):
+        await asyncio.sleep(LATENCY)
+        return await super().make_request(bot, method, timeout)
+
+
+async def customer(dp, bot: Bot, user_id: int, n: int, burst: int) -> None:
+    phone = f"9{user_id % 10**9:09d}"
+    steps = [
+        message_update(user_id, "/start"),
+        message_update(user_id, contact=Contact(phone_number=f"+7{phone}", first_name="stress", user_id=user_id)),
+        message_update(user_id, "Иванов Иван Иванович"),
+        callback_update(user_id, "start_order"),
+        message_update(user_id, f"Голубика — {BERRY_PRICES['Голубика']}₽"),
+        message_update(user_id, "1"),
+        message_update(user_id, "Завершить заказ"),
+        message_update(user_id, "/order"),
+    ]
+    for update in steps:
+        await dp.feed_update(bot, update)
+
+    # Слоты делят все покупатели — берём свободный, как это сделал бы человек
+    slots = orders_repo.slot_index()
+    dates = delivery_dates(datetime.date.today())
+    date_str = next(d for d in dates[n % len(dates):] + dates if not slots.is_date_full(d))
+    await asyncio.gather(*(dp.feed_update(bot, callback_update(user_id, f"date_{date_str}")) for _ in range(burst)))
+    times = SLOT_TIMES[(n // len(dates)) % len(SLOT_TIMES):] + SLOT_TIMES
+    time_str = next(t for t in times if not slots.is_full(date_str, t))
+    await asyncio.gather(*(dp.feed_update(bot, callback_update(user_id, f"time_{time_str}")) for _ in range(burst)))
+    # Запоздалое нажатие уже после оформления
+    await dp.feed_update(bot, callback_update(user_id, f"time_{time_str}"))
+
+
+async def stress(users: int, burst: int) -> None:
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            _reset_routers()
+            # Без защиты от флуда: проверяется именно склейка повторов
+            dp = create_dispatcher(Path(tmp) / "fsm.db", throttle_limits={})
+            bot = Bot(token="42:STRESS", session=LatencySession())
+            await dp.emit_startup(bot=bot, dispatcher=dp)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(customer(dp, bot, FIRST_USER_ID + n, n, burst) for n in range(users)))
+            elapsed = time.perf_counter() - started
+
+            per_user = [len(orders_repo.user_orders(FIRST_USER_ID + n)) for n in range(users)]
+            await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        finally:
+            os.chdir(cwd)
+
+    in_flight = coalesced_total.value(reason="in_flight")
+    recent = coalesced_total.value(reason="recent")
+    print(f"Покупателей: {users}, одинаковых нажатий в очереди: {burst}, время: {elapsed:.2f} с")
+    print(f"Заказов: {sum(per_user)} (ожидалось {users}); "
+          f"повторов дождались первой обработки: {in_flight:.0f}, отброшено сразу после неё: {recent:.0f}")
+    duplicated = sum(1 for count in per_user if count != 1)
+    if duplicated:
+        raise SystemExit(f"❌ У {duplicated} покупателей не ровно один заказ")
+    print("✅ Повторные нажатия не создали лишних заказов")
+
+
+async def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_USERS
+    burst = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BURST
+    logging.getLogger().setLevel(logging.ERROR)
+    await stress(users, burst)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,8 @@
 # config.py
 import os
 from pathlib import Path
+from typing import Dict, Tuple
+
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения из файла Bot_berries.env
@@ -29,6 +31,119 @@ if HELPER_IDS_RAW.strip():
     except ValueError:
         raise ValueError("❌ HELPER_IDS должен содержать целые числа, разделённые запятыми")
 
+# === Получение обновлений ===
+# polling — long polling (по умолчанию), webhook — локальный HTTP-сервер для вебхука
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+if BOT_MODE not in ("polling", "webhook"):
+    raise ValueError("❌ BOT_MODE должен быть 'polling' или 'webhook'")
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")            # внешний адрес, например https://example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")      # пусто — генерируется при запуске
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "127.0.0.1")
+try:
+    WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+    WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "100"))
+    if WEBHOOK_MAX_IN_FLIGHT <= 0:
+        raise ValueError
+except ValueError:
+    raise ValueError("❌ WEBAPP_PORT и WEBHOOK_MAX_IN_FLIGHT должны быть положительными целыми числами")
+
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    raise ValueError("❌ Для BOT_MODE=webhook задайте WEBHOOK_URL")
+
+# === Метрики ===
+# Эндпоинт /metrics в формате Prometheus; 0 — выключен.
+# При WORKERS > 1 рабочий процесс N отдаёт свои метрики на порту METRICS_PORT + 1 + N
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+try:
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    if METRICS_PORT < 0:
+        raise ValueError
+except ValueError:
+    raise ValueError("❌ METRICS_PORT должен быть неотрицательным целым числом (0 — метрики выключены)")
+
+# === Диагностика event loop ===
+# Порог в секундах: если loop занят дольше, в лог пишется стек блокирующего кода; 0 — сторож выключен
+# PROFILE_DIR — папка для профилей обработчиков (сэмплирующий профилировщик); пусто — выключен
+PROFILE_DIR_RAW = os.getenv("PROFILE_DIR", "").strip()
+PROFILE_DIR = Path(PROFILE_DIR_RAW) if PROFILE_DIR_RAW else None
+try:
+    LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0"))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+    if LOOP_LAG_THRESHOLD < 0 or PROFILE_INTERVAL <= 0:
+        raise ValueError
+except ValueError:
+    raise ValueError("❌ LOOP_LAG_THRESHOLD должен быть неотрицательным числом, PROFILE_INTERVAL — положительным (в секундах)")
+
+# === Защита от флуда ===
+# Лимиты запросов одного пользователя по классам команд: класс=запросов_в_секунду:запас через запятую.
+# default — ввод и кнопки, history — история и оформление заказов, admin — команды админа;
+# класс без лимита не ограничивается, off — защита выключена
+THROTTLE_LIMITS_RAW = os.getenv("THROTTLE_LIMITS", "default=2:10,history=0.5:3,admin=1:5").strip()
+THROTTLE_LIMITS: Dict[str, Tuple[float, float]] = {}
+if THROTTLE_LIMITS_RAW.lower() != "off":
+    try:
+        for part in filter(None, THROTTLE_LIMITS_RAW.split(",")):
+            name, limit = part.split("=")
+            rate, burst = limit.split(":")
+            name, rate, burst = name.strip(), float(rate), float(burst)
+            if name not in ("default", "history", "admin") or rate <= 0 or burst < 1:
+                raise ValueError
+            THROTTLE_LIMITS[name] = (rate, burst)
+    except ValueError:
+        raise ValueError("❌ THROTTLE_LIMITS должен иметь вид default=2:10,history=0.5:3,admin=1:5 "
+                         "(классы default/history/admin, скорость > 0, запас ≥ 1) или off")
+
+# === Хранилище ===
+# json — файлы orders.json/users.json, sqlite — база SQLite (SQLITE_PATH)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").strip().lower()
+if STORAGE_BACKEND not in ("json", "sqlite"):
+    raise ValueError("❌ STORAGE_BACKEND должен быть 'json' или 'sqlite'")
+
+SQLITE_PATH = Path(os.getenv("SQLITE_PATH", "berries.db"))
+
+# Через сколько дней после даты доставки оплаченные и отменённые заказы уходят
+# в помесячный архив (orders_archive/ или таблица orders_archive); 0 — архив выключен
+try:
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "1"))
+    if ARCHIVE_AFTER_DAYS < 0:
+        raise ValueError
+except ValueError:
+    raise ValueError("❌ ARCHIVE_AFTER_DAYS должен быть неотрицательным целым числом (0 — архив выключен)")
+
+# === Рабочие процессы ===
+# Сколько процессов обрабатывают обновления (пользователи распределяются по user_id)
+try:
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    if WORKERS <= 0:
+        raise ValueError
+except ValueError:
+    raise ValueError("❌ WORKERS должен быть положительным целым числом")
+
+if WORKERS > 1 and STORAGE_BACKEND != "sqlite":
+    raise ValueError("❌ Для WORKERS > 1 нужно STORAGE_BACKEND=sqlite: JSON-файлы нельзя делить между процессами")
+
+# === Состояния диалогов (FSM) ===
+# Корзины и данные входа хранятся в SQLite-файле FSM_PATH и переживают перезапуск
+FSM_PATH = Path(os.getenv("FSM_PATH", "fsm.db"))
+try:
+    FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+    FSM_SESSION_TTL = int(os.getenv("FSM_SESSION_TTL", str(7 * 24 * 3600)))
+    if FSM_CACHE_SIZE <= 0 or FSM_SESSION_TTL <= 0:
+        raise ValueError
+except ValueError:
+    raise ValueError("❌ FSM_CACHE_SIZE и FSM_SESSION_TTL должны быть положительными целыми числами")
+
+# === Доставка ===
+# Сколько заказов принимается на один часовой слот доставки
+try:
+    SLOT_CAPACITY = int(os.getenv("SLOT_CAPACITY", "3"))
+    if SLOT_CAPACITY <= 0:
+        raise ValueError
+except ValueError:
+    raise ValueError("❌ SLOT_CAPACITY должен быть положительным целым числом")
+
 # === Константы ассортимента ===
 BERRIES = [
     "Голубика", "Шелковица", "Черника", "Черешня",
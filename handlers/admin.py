@@ -1,41 +1,99 @@
 # handlers/admin.py
-from aiogram import Router, F, Bot
-from aiogram.types import Message
+import asyncio
+import datetime
+import re
+import tempfile
 from collections import defaultdict
-from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
+from aiogram import Router, F, Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message, CallbackQuery
 
 from config import ADMIN_ID
-from storage.users import load_users
-from storage.orders import load_orders, save_orders
+from storage.users import users_repo
+from utils.broadcast import broadcaster
+from utils.export import DOCUMENT_LIMIT, EXPORT_FORMATS, write_export
+from storage.orders import orders_repo
+from keyboards.inline import get_orders_page_keyboard
+from storage.schema import Order
+from utils.helpers import parse_order_ids, parse_page_cursor
 
 # Создаём роутер и применяем фильтр: обрабатывать сообщения только от админа
 router = Router(name="admin")
 router.message.filter(F.from_user.id == ADMIN_ID)
+router.callback_query.filter(F.from_user.id == ADMIN_ID)
+
+
+# Сколько заказов можно изменить одной командой
+MAX_BULK_ORDERS = 500
+
+# Сколько номеров заказов перечислять в итоговом сообщении
+SUMMARY_IDS = 30
+
+DATE_RE = re.compile(r"\d{2}\.\d{2}\.\d{4}")
+
+
+def _format_ids(order_ids: List[str]) -> str:
+    shown = ", ".join(f"№{oid}" for oid in order_ids[:SUMMARY_IDS])
+    rest = len(order_ids) - SUMMARY_IDS
+    return shown + (f" и ещё {rest}" if rest > 0 else "")
+
+
+def _summary(title: str, groups: List[Tuple[str, List[str]]]) -> str:
+    """Итог массовой операции: заголовок и непустые группы номеров."""
+    lines = [title]
+    lines += [f"{label} ({len(ids)}): {_format_ids(ids)}" for label, ids in groups if ids]
+    return "\n".join(lines)
+
+
+def _group_by_user(order_ids: List[str], orders: Dict[str, Order]) -> Dict[int, List[str]]:
+    by_user: Dict[int, List[str]] = defaultdict(list)
+    for order_id in order_ids:
+        by_user[orders[order_id].user_id].append(order_id)
+    return by_user
+
+
+async def _notify_customers(bot: Bot, texts: Dict[int, str]) -> Dict[int, bool]:
+    """
+    Отправляет клиентам по сообщению параллельно под лимитами рассылки
+    (общими для всех массовых отправок бота). Возвращает user_id → доставлено ли.
+    """
+    user_ids = list(texts)
+    results = await asyncio.gather(*(broadcaster.send(bot, uid, texts[uid]) for uid in user_ids))
+    return dict(zip(user_ids, results))
 
 
 @router.message(F.text.startswith("/oplata"))
 async def cmd_payment(message: Message, bot: Bot):
     parts = message.text.split(" ", 2)
-    if len(parts) != 3 or not parts[1].isdigit():
-        await message.answer("❌ Неверный формат.\nИспользуйте: /oplata <номер_заказа> <ссылка_на_оплату>")
+    order_ids = parse_order_ids(parts[1], MAX_BULK_ORDERS) if len(parts) == 3 else None
+    if not order_ids:
+        await message.answer(
+            "❌ Неверный формат.\nИспользуйте: /oplata <номер_заказа> <ссылка_на_оплату>\n"
+            f"Несколько заказов: /oplata 12,15,20-25 <ссылка> (до {MAX_BULK_ORDERS} шт.)"
+        )
+        return
+    if len(order_ids) > 1:
+        await bulk_payment(message, bot, order_ids, parts[2])
         return
 
-    order_id, payment_link = parts[1], parts[2]
-    orders_data = load_orders()
-    order = orders_data["orders"].get(order_id)
+    order_id, payment_link = order_ids[0], parts[2]
+    order = await orders_repo.fetch(order_id)
 
     if not order:
         await message.answer(f"Заказ №{order_id} не найден.")
         return
 
-    if order["status"] == "оплачено":
+    if order.status == "оплачено":
         await message.answer(f"Заказ №{order_id} уже оплачен.")
         return
 
     try:
         await bot.send_message(
-            order["user_id"],
+            order.user_id,
             f"💳 Ссылка на оплату для заказа №{order_id}:\n{payment_link}\n\n"
             f"После оплаты с вами свяжется менеджер."
         )
@@ -44,40 +102,88 @@ async def cmd_payment(message: Message, bot: Bot):
         return
 
     # Обновляем статус заказа
-    order["status"] = "оплачено"
-    save_orders(orders_data)
+    await orders_repo.set_status_async(order_id, "оплачено")
     await message.answer(f"✅ Ссылка на оплату отправлена клиенту заказа №{order_id}.")
 
 
+async def bulk_payment(message: Message, bot: Bot, order_ids: List[str], payment_link: str):
+    """
+    /oplata для нескольких заказов: каждому клиенту одно сообщение со ссылкой
+    по всем его заказам, затем статус «оплачено» — одной записью в хранилище
+    и только для заказов, чьи клиенты сообщение получили.
+    """
+    orders = await orders_repo.fetch_many(order_ids)
+    missing = [oid for oid in order_ids if oid not in orders]
+    already_paid = [oid for oid in order_ids if oid in orders and orders[oid].status == "оплачено"]
+    pending = [oid for oid in order_ids if oid in orders and orders[oid].status != "оплачено"]
+
+    by_user = _group_by_user(pending, orders)
+    texts = {}
+    for user_id, ids in by_user.items():
+        what = f"заказа №{ids[0]}" if len(ids) == 1 else f"заказов {_format_ids(ids)}"
+        texts[user_id] = f"💳 Ссылка на оплату для {what}:\n{payment_link}\n\nПосле оплаты с вами свяжется менеджер."
+    delivered = await _notify_customers(bot, texts)
+
+    sent = [oid for oid in pending if delivered[orders[oid].user_id]]
+    failed = [oid for oid in pending if not delivered[orders[oid].user_id]]
+    if sent:
+        await orders_repo.set_statuses_async({oid: "оплачено" for oid in sent})
+
+    await message.answer(_summary(
+        f"💳 Ссылки на оплату: отправлено по {len(sent)} из {len(order_ids)} заказов.",
+        [
+            ("✅ Отправлено, статус «оплачено»", sent),
+            ("⚠️ Не удалось отправить (статус не изменён)", failed),
+            ("ℹ️ Уже оплачены", already_paid),
+            ("❓ Не найдены", missing),
+        ]
+    ))
+
+
 @router.message(F.text.startswith("/cancel_order_admin"))
 async def cmd_cancel_order_admin(message: Message, bot: Bot):
     parts = message.text.strip().split(" ", 2)
-    if len(parts) < 2 or not parts[1].isdigit():
-        await message.answer("❌ Неверный формат.\nИспользуйте: /cancel_order_admin <номер_заказа> [причина]")
+    reason = parts[2] if len(parts) > 2 else "Причина не указана"
+    if len(parts) >= 2 and DATE_RE.fullmatch(parts[1]):
+        # Все неоплаченные заказы на дату доставки
+        date = parts[1]
+        order_ids = [oid for oid, order in orders_repo.orders_by_date(date) if order.status == "ожидает оплату"]
+        if not order_ids:
+            await message.answer(f"📦 Неоплаченных заказов на {date} нет.")
+            return
+        await bulk_cancel(message, bot, sorted(order_ids, key=int), reason)
         return
 
-    order_id = parts[1]
-    reason = parts[2] if len(parts) > 2 else "Причина не указана"
+    order_ids = parse_order_ids(parts[1], MAX_BULK_ORDERS) if len(parts) >= 2 else None
+    if not order_ids:
+        await message.answer(
+            "❌ Неверный формат.\nИспользуйте: /cancel_order_admin <номер_заказа> [причина]\n"
+            f"Несколько заказов: /cancel_order_admin 12,15,20-25 [причина] (до {MAX_BULK_ORDERS} шт.)\n"
+            "Все неоплаченные на дату: /cancel_order_admin дд.мм.гггг [причина]"
+        )
+        return
+    if len(order_ids) > 1:
+        await bulk_cancel(message, bot, order_ids, reason)
+        return
 
-    orders_data = load_orders()
-    order = orders_data["orders"].get(order_id)
+    order_id = order_ids[0]
+    order = await orders_repo.fetch(order_id)
 
     if not order:
         await message.answer(f"Заказ №{order_id} не найден.")
         return
 
-    if order["status"] == "отменён":
+    if order.status == "отменён":
         await message.answer(f"Заказ №{order_id} уже отменён.")
         return
 
     # Отменяем заказ
-    order["status"] = "отменён"
-    save_orders(orders_data)
+    await orders_repo.set_status_async(order_id, "отменён")
 
     # Уведомляем клиента
     try:
         await bot.send_message(
-            order["user_id"],
+            order.user_id,
             f"❌ Ваш заказ №{order_id} был отменён администратором.\nПричина: {reason}"
         )
     except Exception as e:
@@ -85,80 +191,183 @@ async def cmd_cancel_order_admin(message: Message, bot: Bot):
 
     await message.answer(f"✅ Заказ №{order_id} успешно отменён.\nПричина: {reason}")
 
+
+async def bulk_cancel(message: Message, bot: Bot, order_ids: List[str], reason: str):
+    """
+    Отмена нескольких заказов: статусы меняются одной записью в хранилище,
+    затем каждому клиенту уходит одно уведомление по всем его заказам.
+    """
+    orders = await orders_repo.fetch_many(order_ids)
+    missing = [oid for oid in order_ids if oid not in orders]
+    already_cancelled = [oid for oid in order_ids if oid in orders and orders[oid].status == "отменён"]
+    to_cancel = [oid for oid in order_ids if oid in orders and orders[oid].status != "отменён"]
+    if to_cancel:
+        await orders_repo.set_statuses_async({oid: "отменён" for oid in to_cancel})
+
+    by_user = _group_by_user(to_cancel, orders)
+    texts = {}
+    for user_id, ids in by_user.items():
+        if len(ids) == 1:
+            texts[user_id] = f"❌ Ваш заказ №{ids[0]} был отменён администратором.\nПричина: {reason}"
+        else:
+            texts[user_id] = f"❌ Ваши заказы {_format_ids(ids)} были отменены администратором.\nПричина: {reason}"
+    delivered = await _notify_customers(bot, texts)
+    not_notified = [oid for oid in to_cancel if not delivered[orders[oid].user_id]]
+
+    await message.answer(_summary(
+        f"✅ Отменено заказов: {len(to_cancel)} из {len(order_ids)}.\nПричина: {reason}",
+        [
+            ("✅ Отменены", to_cancel),
+            ("⚠️ Клиент не уведомлён", not_notified),
+            ("ℹ️ Уже отменены", already_cancelled),
+            ("❓ Не найдены", missing),
+        ]
+    ))
+
+async def render_admin_orders_page(before: Optional[int] = None, after: Optional[int] = None):
+    """Текст и клавиатура страницы списка всех заказов (от новых к старым)."""
+    page = await orders_repo.orders_page(before=before, after=after)
+    if not page.items:
+        return None, None
+    response = f"📋 Все заказы {page.offset + 1}–{page.offset + len(page.items)} из {page.total}:\n\n"
+    for order_id, order in page.items:
+        response += (
+            f"№{order_id} | {order.full_name} | +7{order.phone[-10:]}\n"
+            f"📅 {order.date} в {order.time} | 💰 {round(order.total, 2)}₽ | 📌 {order.status}\n\n"
+        )
+    keyboard = get_orders_page_keyboard(
+        "admin_orders",
+        first_id=int(page.items[0][0]),
+        last_id=int(page.items[-1][0]),
+        has_newer=page.has_newer,
+        has_older=page.has_older
+    )
+    return response, keyboard
+
+
 @router.message(F.text == "/admin_orders")
 async def cmd_admin_orders(message: Message):
     try:
-        orders_data = load_orders()
-        orders = orders_data["orders"]
-        if not orders:
+        text, keyboard = await render_admin_orders_page()
+        if text is None:
             await message.answer("📦 Нет заказов.")
             return
-
-        response = "📋 Все заказы:\n\n"
-        for order_id, order in sorted(orders.items(), key=lambda x: int(x[0]), reverse=True):
-            status = order["status"]
-            total = sum(item["total_price"] for item in order["cart"])
-            response += (
-                f"№{order_id} | {order['full_name']} | +7{order['phone'][-10:]}\n"
-                f"📅 {order['date']} в {order['time']} | 💰 {round(total, 2)}₽ | 📌 {status}\n\n"
-            )
-        await message.answer(response)
+        await message.answer(text, reply_markup=keyboard)
     except Exception as e:
         await message.answer(f"❌ Ошибка: {e}")
 
+
+@router.callback_query(F.data.startswith("admin_orders_"))
+async def admin_orders_page(callback: CallbackQuery):
+    before, after = parse_page_cursor(callback.data)
+    text, keyboard = await render_admin_orders_page(before=before, after=after)
+    if text is None:
+        await callback.answer("Заказов больше нет.", show_alert=True)
+        return
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest:
+        pass  # Страница не изменилась
+    await callback.answer()
+
 @router.message(F.text == "/admin_slots")
 async def cmd_admin_slots(message: Message):
     try:
-        orders_data = load_orders()
-        slots = defaultdict(list)
-
-        for order_id, order in orders_data["orders"].items():
-            if order["status"] != "отменён":
-                slots[order["date"]].append(order["time"])
-
-        if not slots:
+        # Занятость берётся из индекса слотов — без обхода заказов
+        slots = orders_repo.slot_index()
+        occupied = list(slots.occupied())
+        if not occupied:
             await message.answer("📅 Нет активных слотов.")
             return
 
-        response = "🗓 Занятые слоты доставки:\n\n"
-        for date in sorted(slots.keys(), key=lambda x: datetime.strptime(x, "%d.%m.%Y")):
-            times = sorted(slots[date])
-            response += f"📅 {date}: {', '.join(times)}\n"
+        response = f"🗓 Занятые слоты доставки (мест в слоте: {slots.capacity}):\n\n"
+        for date, times in occupied:
+            marked = [f"{t} ({count}{' 🚫' if count >= slots.capacity else ''})" for t, count in times]
+            response += f"📅 {date}: {', '.join(marked)}\n"
         await message.answer(response)
     except Exception as e:
         await message.answer(f"❌ Ошибка: {e}")
 
 # В handlers/admin.py
 
-@router.message(F.text == "/admin_stats")
-async def cmd_admin_stats(message: Message):
-    try:
-        orders_data = load_orders()
-        orders = [o for o in orders_data["orders"].values() if o["status"] == "оплачено"]
-        total_revenue = sum(sum(item["total_price"] for item in o["cart"]) for o in orders)
-        total_orders = len(orders)
-
-        # ТОП ягод
-        berry_sales = defaultdict(float)
-        for order in orders:
-            for item in order["cart"]:
-                berry_sales[item["berry"]] += item["kg"]
+@router.message(Command("admin_stats"))
+async def cmd_admin_stats(message: Message, command: CommandObject):
+    parts = (command.args or "").split()
+    arg = parts[0] if parts else "3"
+    if arg != "all" and not (arg.isdigit() and int(arg) > 0):
+        await message.answer("❌ Неверный формат.\nИспользуйте: /admin_stats [N|all]")
+        return
+    limit = None if arg == "all" else int(arg)
 
-        top_berries = sorted(berry_sales.items(), key=lambda x: x[1], reverse=True)[:3]
+    try:
+        # Статистика ведётся инкрементально при смене статусов — без обхода заказов
+        # (архив читается только при первом запросе после запуска)
+        stats = await orders_repo.sales_stats()
+        top_berries = stats.top_berries(limit)
 
+        title = "Рейтинг ягод" if limit is None else f"ТОП-{limit} ягод"
         response = (
             f"📊 Статистика продаж:\n\n"
-            f"🛒 Всего оплачено заказов: {total_orders}\n"
-            f"💰 Общая выручка: {round(total_revenue, 2)}₽\n\n"
-            f"🏆 ТОП-3 ягоды по объёму:\n"
+            f"🛒 Всего оплачено заказов: {stats.paid_count}\n"
+            f"💰 Общая выручка: {round(stats.revenue, 2)}₽\n\n"
+            f"🏆 {title} по объёму:\n"
         )
-        for i, (berry, kg) in enumerate(top_berries, 1):
-            response += f"{i}. {berry} — {kg} кг\n"
+        for i, (berry, kg, revenue) in enumerate(top_berries, 1):
+            response += f"{i}. {berry} — {round(kg, 2)} кг ({round(revenue, 2)}₽)\n"
 
         await message.answer(response)
     except Exception as e:
         await message.answer(f"❌ Ошибка: {e}")
 
+
+EXPORT_STATUSES = ("ожидает оплату", "оплачено", "отменён")
+
+# Самый длинный период одной выгрузки, дней
+EXPORT_MAX_DAYS = 366
+
+EXPORT_USAGE = (
+    "❌ Неверный формат.\nИспользуйте: /admin_export <с> <по> [статус] [csv|jsonl]\n"
+    "Например: /admin_export 01.06.2026 30.06.2026 оплачено\n"
+    f"Статусы: {', '.join(EXPORT_STATUSES)}"
+)
+
+
+@router.message(Command("admin_export"))
+async def cmd_admin_export(message: Message, command: CommandObject):
+    parts = (command.args or "").split(maxsplit=2)
+    rest = parts[2].split() if len(parts) > 2 else []
+    fmt = rest.pop() if rest and rest[-1] in EXPORT_FORMATS else "csv"
+    status = " ".join(rest) or None
+    try:
+        date_from = datetime.datetime.strptime(parts[0], "%d.%m.%Y").date()
+        date_to = datetime.datetime.strptime(parts[1], "%d.%m.%Y").date()
+    except (IndexError, ValueError):
+        await message.answer(EXPORT_USAGE)
+        return
+    if date_from > date_to or (status is not None and status not in EXPORT_STATUSES):
+        await message.answer(EXPORT_USAGE)
+        return
+    if (date_to - date_from).days >= EXPORT_MAX_DAYS:
+        await message.answer(f"❌ Слишком длинный период: за одну выгрузку — не больше {EXPORT_MAX_DAYS} дней.")
+        return
+
+    period = f"{parts[0]}–{parts[1]}"
+    try:
+        # Заказы идут из индекса дат и партиций архива прямо в сжатый файл — без списка в памяти
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / f"orders_{parts[0]}_{parts[1]}.{fmt}.gz"
+            count = await write_export(path, orders_repo.iter_by_dates(date_from, date_to, status), fmt)
+            if not count:
+                await message.answer(f"📦 Нет заказов за {period}.")
+                return
+            if path.stat().st_size > DOCUMENT_LIMIT:
+                await message.answer("❌ Файл выгрузки больше 50 МБ — уменьшите период.")
+                return
+            caption = f"📤 Заказы за {period}" + (f" ({status})" if status else "") + f": {count}"
+            await message.answer_document(FSInputFile(path), caption=caption)
+    except Exception as e:
+        await message.answer(f"❌ Ошибка: {e}")
+
 # В handlers/admin.py
 
 @router.message(F.text.startswith("/admin_broadcast"))
@@ -168,19 +377,22 @@ async def cmd_admin_broadcast(message: Message, bot: Bot):
         await message.answer("Используйте: /admin_broadcast [текст рассылки]")
         return
 
+    if broadcaster.running:
+        await message.answer("⏳ Предыдущая рассылка ещё не завершена.")
+        return
+
     text = parts[1]
-    users = load_users()
+    users = users_repo.all()
     if not users:
         await message.answer("📭 Нет пользователей для рассылки.")
         return
 
-    success = 0
-    failed = 0
-    for user_data in users.values():
-        try:
-            await bot.send_message(user_data["user_id"], f"📢 Рассылка:\n\n{text}")
-            success += 1
-        except Exception:
-            failed += 1
-
-    await message.answer(f"✅ Рассылка завершена!\nУспешно: {success}, Неудачно: {failed}")
\ No newline at end of file
+    # Рассылка идёт в фоне; прогресс и итог появятся в этом сообщении
+    status = await message.answer(f"📢 Рассылка: 0/{len(users)}…")
+    broadcaster.start(
+        bot,
+        text=text,
+        user_ids=[user.user_id for user in users],
+        chat_id=message.chat.id,
+        status_message_id=status.message_id
+    )
\ No newline at end of file
@@ -14,11 +14,12 @@ async def cmd_help(message: Message):
     if user_id == ADMIN_ID:
         text = (
             "🛠 <b>Админка:</b>\n"
-            "/oplata [номер] [ссылка] — отправить клиенту ссылку на оплату\n"
-            "/cancel_order_admin [номер] [причина] — отменить заказ\n"
+            "/oplata [номера] [ссылка] — отправить клиентам ссылку на оплату (номера: 12 или 12,15,20-25)\n"
+            "/cancel_order_admin [номера|дд.мм.гггг] [причина] — отменить заказы (по дате — все неоплаченные)\n"
             "/admin_orders — список всех заказов\n"
             "/admin_slots — занятые даты и время доставки\n"
-            "/admin_stats — статистика продаж\n"
+            "/admin_stats [N|all] — статистика продаж и рейтинг ягод\n"
+            "/admin_export [с] [по] [статус] [csv|jsonl] — выгрузка заказов за период файлом (.gz)\n"
             "/admin_broadcast [текст] — рассылка всем пользователям\n"
             "🛒 <b>Покупатель:</b>\n"
             "/start — начать работу / перезайти\n"
@@ -1,17 +1,22 @@
 # handlers/order.py
 from datetime import datetime, timedelta
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from config import BERRIES, BERRY_PRICES, ADMIN_ID
+from config import BERRIES, BERRY_PRICES
 from keyboards.reply import get_berry_keyboard
-from keyboards.inline import get_date_keyboard, get_time_keyboard
+from keyboards.inline import delivery_dates, get_date_keyboard, get_time_keyboard
 from utils.helpers import extract_berry_name
-from storage.orders import load_orders, save_orders, is_duplicate_order
+from utils.inflight import CallbackDeduplicator
+from storage.orders import orders_repo, is_duplicate_order
+from storage.schema import Order
+from utils.notifier import admin_notifier
 
 router = Router(name="order")
+# Двойное нажатие даты или времени не должно оформлять заказ и слать уведомление дважды
+router.callback_query.middleware(CallbackDeduplicator())
 
 
 class OrderStates(StatesGroup):
@@ -135,9 +140,10 @@ async def cmd_order(message: Message, state: FSMContext):
         )
         return
 
-    # Генерация клавиатуры с датами
+    # Генерация клавиатуры с датами (полностью занятые даты помечены)
     today = datetime.now().date()
-    keyboard = get_date_keyboard(today)
+    full_dates = orders_repo.slot_index().full_dates(delivery_dates(today))
+    keyboard = get_date_keyboard(today, full_dates)
     await message.answer("📅 Выберите дату доставки:", reply_markup=keyboard)
     await state.set_state(OrderStates.choosing_date)
 
@@ -146,8 +152,12 @@ async def cmd_order(message: Message, state: FSMContext):
 @router.callback_query(F.data.startswith("date_"))
 async def choose_date(callback: CallbackQuery, state: FSMContext):
     date_str = callback.data.split("_", 1)[1]
+    slots = orders_repo.slot_index()
+    if slots.is_date_full(date_str):
+        await callback.answer("🚫 На эту дату все слоты заняты, выберите другую.", show_alert=True)
+        return
     await state.update_data(delivery_date=date_str)
-    keyboard = get_time_keyboard()
+    keyboard = get_time_keyboard(slots.full_times(date_str))
     await callback.message.edit_text(f"🚚 Доставка {date_str}. Выберите удобное время:", reply_markup=keyboard)
     await state.set_state(OrderStates.choosing_time)
     await callback.answer()
@@ -155,26 +165,36 @@ async def choose_date(callback: CallbackQuery, state: FSMContext):
 
 # === Выбор времени и сохранение заказа ===
 @router.callback_query(F.data.startswith("time_"))
-async def choose_time(callback: CallbackQuery, state: FSMContext, bot: Bot):
+async def choose_time(callback: CallbackQuery, state: FSMContext):
     time_str = callback.data.split("_", 1)[1]
-    await state.update_data(delivery_time=time_str)
     data = await state.get_data()
+    if "delivery_date" not in data:
+        # Заказ по этой клавиатуре уже оформлен (сессия очищена) или она устарела
+        await callback.answer("Этот заказ уже оформлен. Новый заказ — /order", show_alert=True)
+        return
 
-    # Загружаем и обновляем заказы
-    orders_data = load_orders()
-    order_id = orders_data["last_id"] + 1
-    orders_data["last_id"] = order_id
-
-    orders_data["orders"][str(order_id)] = {
-        "user_id": data["user_id"],
-        "full_name": data["full_name"],
-        "phone": data["phone"],
-        "cart": data["cart"],
-        "date": data["delivery_date"],
-        "time": data["delivery_time"],
-        "status": "ожидает оплату"
-    }
-    save_orders(orders_data)
+    # Слот мог заполниться, пока пользователь выбирал время
+    slots = orders_repo.slot_index()
+    if slots.is_full(data["delivery_date"], time_str):
+        await callback.message.edit_reply_markup(
+            reply_markup=get_time_keyboard(slots.full_times(data["delivery_date"]))
+        )
+        await callback.answer("🚫 Это время уже занято, выберите другое.", show_alert=True)
+        return
+    data["delivery_time"] = time_str
+
+    # Сохраняем заказ. Слот занимается сразу, до первого await: проверка выше
+    # и резерв не разделены переключением на другой обработчик
+    order_id = await orders_repo.create_async(Order(
+        user_id=data["user_id"],
+        full_name=data["full_name"],
+        phone=data["phone"],
+        cart=data["cart"],
+        date=data["delivery_date"],
+        time=data["delivery_time"],
+        status="ожидает оплату"
+    ))
+    await state.update_data(delivery_time=time_str)
 
     # Считаем итог
     total = sum(item["total_price"] for item in data["cart"])
@@ -188,9 +208,8 @@ async def choose_time(callback: CallbackQuery, state: FSMContext, bot: Bot):
         "Ожидайте ссылку на оплату от менеджера."
     )
 
-    # Уведомление админу
-    await bot.send_message(
-        ADMIN_ID,
+    # Уведомление админу (отправляется в фоне)
+    admin_notifier.notify(
         f"🛒 <b>Новый заказ №{order_id}</b>\n"
         f"👤 {data['full_name']}\n"
         f"📞 +7{data['phone'][-10:]}\n"
@@ -198,8 +217,16 @@ async def choose_time(callback: CallbackQuery, state: FSMContext, bot: Bot):
         f"📦\n{cart_summary}\n"
         f"💰 {round(total, 2)}₽\n\n"
         f"Используйте: /oplata {order_id} https://...",
+        kind="order",
+        summary=f"№{order_id}",
         parse_mode="HTML"
     )
 
     await state.clear()
-    await callback.answer()
\ No newline at end of file
+    await callback.answer()
+
+
+# === Нажатие на заполненный слот ===
+@router.callback_query(F.data == "slot_full")
+async def slot_full(callback: CallbackQuery):
+    await callback.answer("🚫 Мест нет, выберите другой вариант.", show_alert=True)
\ No newline at end of file
@@ -1,4 +1,5 @@
 # handlers/start.py
+import logging
 import re
 from aiogram import Router, F
 from aiogram.types import Message, Contact, ReplyKeyboardMarkup, KeyboardButton
@@ -9,9 +10,11 @@ from aiogram.fsm.state import State, StatesGroup, any_state
 
 from config import ADMIN_ID
 from keyboards.inline import get_main_menu
-from storage.users import load_users, save_user
+from storage.schema import User
+from storage.users import users_repo
 
 router = Router(name="start")
+logger = logging.getLogger(__name__)
 
 
 class RegistrationStates(StatesGroup):
@@ -34,13 +37,12 @@ async def start(message: Message, state: FSMContext):
 
 @router.message(F.contact, StateFilter(any_state))
 async def handle_contact(message: Message, state: FSMContext):
-    print("📞 Контакт получен:", message.contact.phone_number)
-
     if not message.contact:
         await message.answer("Пожалуйста, используйте кнопку для отправки контакта.")
         return
 
     contact = message.contact
+    logger.info(f"📞 Контакт получен от пользователя {message.from_user.id}")
 
     # Проверка: контакт должен принадлежать отправителю
     if contact.user_id != message.from_user.id:
@@ -59,18 +61,17 @@ async def handle_contact(message: Message, state: FSMContext):
         return
 
     user_id = message.from_user.id
-    users = load_users()
+    user = users_repo.get_by_phone(phone)
 
-    if phone in users:
+    if user is not None:
         # Вход
-        user_data = users[phone]
         await state.update_data(
             user_id=user_id,
             phone=phone,
-            full_name=user_data["full_name"]
+            full_name=user.full_name
         )
         await message.answer(
-            f"👋 Добро пожаловать, {user_data['full_name']}!\n"
+            f"👋 Добро пожаловать, {user.full_name}!\n"
             f"📞 +7 {phone}\n\n"
             f"Вы вошли в свой аккаунт.",
             reply_markup=get_main_menu()
@@ -102,7 +103,7 @@ async def handle_full_name(message: Message, state: FSMContext):
     user_id = data["user_id"]
 
     # Сохраняем пользователя
-    save_user(phone=phone, user_id=user_id, full_name=full_name)
+    await users_repo.upsert_async(User(user_id=user_id, full_name=full_name, phone=phone))
     await state.update_data(full_name=full_name)
 
     await message.answer(
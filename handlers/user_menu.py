@@ -1,26 +1,41 @@
 # handlers/user_menu.py
+from typing import List, Optional
+
 from aiogram import Router, F, Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message, CallbackQuery
 
-from config import ADMIN_ID
-from storage.orders import load_orders, save_orders
+from keyboards.inline import get_orders_page_keyboard
+from storage.orders import OrdersPage, orders_repo
+from storage.schema import Order
+from utils.helpers import parse_page_cursor
+from utils.notifier import admin_notifier
 
 router = Router(name="user_menu")
 
+# Самое длинное сообщение, которое примет Telegram
+MESSAGE_LIMIT = 4096
+
+# Сколько позиций корзины показывать в истории заказов, остальные — одной строкой
+CART_PREVIEW_ITEMS = 15
+
 
-def format_order(order_id: str, order: dict) -> str:
+def format_order(order_id: str, order: Order) -> str:
     """Форматирует заказ для отображения."""
     status_labels = {
         "ожидает оплату": "⏳ Ожидает оплаты",
         "оплачено": "✅ Оплачен",
         "отменён": "❌ Отменён"
     }
-    status = status_labels.get(order["status"], order["status"])
-    total = sum(item["total_price"] for item in order["cart"])
-    berries = "\n".join([f"  • {item['berry']}: {item['kg']} кг" for item in order["cart"]])
+    status = status_labels.get(order.status, order.status)
+    total = order.total
+    cart = order.cart
+    berries = "\n".join([f"  • {item.berry}: {item.kg} кг" for item in cart[:CART_PREVIEW_ITEMS]])
+    if len(cart) > CART_PREVIEW_ITEMS:
+        berries += f"\n  … и ещё позиций: {len(cart) - CART_PREVIEW_ITEMS}"
     return (
         f"<b>Заказ №{order_id}</b>\n"
-        f"📅 {order['date']} в {order['time']}\n"
+        f"📅 {order.date} в {order.time}\n"
         f"{berries}\n"
         f"💰 Итого: {round(total, 2)}₽\n"
         f"📌 {status}"
@@ -28,39 +43,60 @@ def format_order(order_id: str, order: dict) -> str:
 
 
 # === История заказов ===
+def _fitting(blocks: List[str], length: int) -> int:
+    """Сколько первых блоков (не меньше одного) помещается в сообщение после заголовка длиной length."""
+    count = 0
+    for block in blocks:
+        length += 2 + len(block)
+        if count and length > MESSAGE_LIMIT:
+            break
+        count += 1
+    return count
+
+
+async def render_orders_page(user_id: int, before: Optional[int] = None, after: Optional[int] = None):
+    """Текст и клавиатура страницы истории заказов пользователя (от новых к старым)."""
+    page = await orders_repo.orders_page(user_id, before=before, after=after)
+    if not page.items:
+        return None, None
+    blocks = [format_order(oid, order) for oid, order in page.items]
+    # Заказы с большими корзинами могут не уместиться в одно сообщение — тогда на странице
+    # остаются заказы, ближайшие к курсору, остальные покажет следующее листание.
+    # Страница «новее», дошедшая до самых новых заказов, добрана старыми — её режем как первую
+    newest_first = after is None or page.offset == 0
+    keep = _fitting(blocks if newest_first else blocks[::-1],
+                    len(f"📜 Ваши заказы {page.offset + 1}–{page.offset + len(page.items)} из {page.total}:"))
+    if newest_first:
+        page, blocks = OrdersPage(page.items[:keep], page.offset, page.total), blocks[:keep]
+    else:
+        dropped = len(blocks) - keep
+        page, blocks = OrdersPage(page.items[dropped:], page.offset + dropped, page.total), blocks[dropped:]
+    header = f"📜 Ваши заказы {page.offset + 1}–{page.offset + len(page.items)} из {page.total}:"
+    text = header + "\n\n" + "\n\n".join(blocks)
+    keyboard = get_orders_page_keyboard(
+        "my_orders",
+        first_id=int(page.items[0][0]),
+        last_id=int(page.items[-1][0]),
+        has_newer=page.has_newer,
+        has_older=page.has_older,
+        cancel_ids=tuple(oid for oid, order in page.items if order.status in ("ожидает оплату", "оплачено"))
+    )
+    return text, keyboard
+
+
 @router.callback_query(F.data == "my_orders")
 @router.message(F.text == "/my_orders")
 async def cmd_my_orders(event, bot: Bot = None):
     message = event.message if isinstance(event, CallbackQuery) else event
-    user_id = message.from_user.id
+    user_id = event.from_user.id
 
     try:
-        orders_data = load_orders()
-        user_orders = [
-            (oid, order)
-            for oid, order in orders_data["orders"].items()
-            if order["user_id"] == user_id
-        ]
-
-        if not user_orders:
+        # Одно сообщение с первой страницей; листание — правкой этого же сообщения
+        text, keyboard = await render_orders_page(user_id)
+        if text is None:
             await message.answer("У вас пока нет заказов. 🛒")
-            return
-
-        # Сортируем по номеру заказа (по убыванию)
-        user_orders.sort(key=lambda x: int(x[0]), reverse=True)
-
-        from keyboards.inline import get_cancel_order_button
-
-        for order_id, order in user_orders:
-            text = format_order(order_id, order)
-            if order["status"] in ("ожидает оплату", "оплачено"):
-                await message.answer(
-                    text,
-                    reply_markup=get_cancel_order_button(order_id),
-                    parse_mode="HTML"
-                )
-            else:
-                await message.answer(text, parse_mode="HTML")
+        else:
+            await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
         if isinstance(event, CallbackQuery):
             await event.answer()
@@ -69,17 +105,30 @@ async def cmd_my_orders(event, bot: Bot = None):
         await message.answer(f"⚠️ Ошибка при загрузке заказов: {e}")
 
 
+@router.callback_query(F.data.startswith("my_orders_"))
+async def my_orders_page(callback: CallbackQuery):
+    before, after = parse_page_cursor(callback.data)
+    text, keyboard = await render_orders_page(callback.from_user.id, before=before, after=after)
+    if text is None:
+        await callback.answer("Заказов больше нет.", show_alert=True)
+        return
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    except TelegramBadRequest:
+        pass  # Страница не изменилась
+    await callback.answer()
+
+
 # === Текущие заказы (активные) ===
 @router.callback_query(F.data == "current_orders")
 async def current_orders(callback: CallbackQuery):
     user_id = callback.from_user.id
     try:
-        orders_data = load_orders()
         current = []
-        for oid, order in orders_data["orders"].items():
-            if order["user_id"] == user_id and order["status"] in ("ожидает оплату", "оплачено"):
-                status = "⏳" if order["status"] == "ожидает оплату" else "✅"
-                current.append(f"{status} №{oid} — {order['date']} в {order['time']}")
+        for oid, order in orders_repo.user_orders(user_id):
+            if order.status in ("ожидает оплату", "оплачено"):
+                status = "⏳" if order.status == "ожидает оплату" else "✅"
+                current.append(f"{status} №{oid} — {order.date} в {order.time}")
 
         if not current:
             await callback.answer("У вас нет активных заказов.", show_alert=True)
@@ -92,66 +141,74 @@ async def current_orders(callback: CallbackQuery):
 
 
 # === Отмена заказа через кнопку ===
-@router.callback_query(F.data.startswith("cancel_user_"))
-async def cancel_order_inline(callback: CallbackQuery, bot: Bot):
-    order_id = callback.data.split("_")[-1]
-    orders_data = load_orders()
-    order = orders_data["orders"].get(order_id)
+async def _cancel_by_user(callback: CallbackQuery, order_id: str) -> bool:
+    """Проверяет права и отменяет заказ пользователя. Возвращает True, если заказ отменён."""
+    # Заказ со страницы истории может быть и архивным
+    order = await orders_repo.fetch(order_id)
 
     if not order:
         await callback.answer("Заказ не найден.", show_alert=True)
-        return
+        return False
 
-    if order["user_id"] != callback.from_user.id:
+    if order.user_id != callback.from_user.id:
         await callback.answer("Вы не можете отменить чужой заказ.", show_alert=True)
-        return
+        return False
 
-    if order["status"] == "отменён":
+    if order.status == "отменён":
         await callback.answer("Этот заказ уже отменён.", show_alert=True)
-        return
+        return False
 
     # Отменяем заказ
-    order["status"] = "отменён"
-    save_orders(orders_data)
+    await orders_repo.set_status_async(order_id, "отменён")
+
+    # Уведомляем админа (в фоне)
+    admin_notifier.notify(f"🔁 Пользователь отменил заказ №{order_id}", kind="cancel", summary=f"№{order_id}")
+    return True
+
+
+@router.callback_query(F.data.startswith("cancel_user_"))
+async def cancel_order_inline(callback: CallbackQuery):
+    order_id = callback.data.split("_")[-1]
+    if not await _cancel_by_user(callback, order_id):
+        return
 
     # Обновляем сообщение
     await callback.message.edit_text(f"❌ Заказ №{order_id} отменён.")
+    await callback.answer("Заказ успешно отменён.")
 
-    # Уведомляем админа
-    try:
-        await bot.send_message(ADMIN_ID, f"🔁 Пользователь отменил заказ №{order_id}")
-    except Exception:
-        pass  # Игнорируем ошибку отправки админу
 
+@router.callback_query(F.data.startswith("cancel_page_"))
+async def cancel_order_from_page(callback: CallbackQuery):
+    order_id = callback.data.split("_")[-1]
+    if not await _cancel_by_user(callback, order_id):
+        return
+
+    # Перерисовываем страницу истории, начиная с отменённого заказа
+    text, keyboard = await render_orders_page(callback.from_user.id, before=int(order_id) + 1)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
     await callback.answer("Заказ успешно отменён.")
 
 
 # === Отмена последнего активного заказа командой ===
 @router.message(F.text == "/cancel_order")
-async def cmd_cancel_order(message: Message, bot: Bot):
+async def cmd_cancel_order(message: Message):
     user_id = message.from_user.id
     try:
-        orders_data = load_orders()
-        active_orders = [
-            (oid, o)
-            for oid, o in orders_data["orders"].items()
-            if o["user_id"] == user_id and o["status"] in ("ожидает оплату", "оплачено")
-        ]
-
-        if not active_orders:
+        # Находим самый свежий активный заказ (индекс отсортирован по номеру)
+        latest_id = next(
+            (oid for oid, o in orders_repo.user_orders(user_id, newest_first=True)
+             if o.status in ("ожидает оплату", "оплачено")),
+            None
+        )
+
+        if latest_id is None:
             await message.answer("У вас нет активных заказов для отмены.")
             return
 
-        # Находим самый свежий заказ (по номеру)
-        latest_id, _ = max(active_orders, key=lambda x: int(x[0]))
-        orders_data["orders"][latest_id]["status"] = "отменён"
-        save_orders(orders_data)
+        await orders_repo.set_status_async(latest_id, "отменён")
 
         await message.answer(f"❌ Заказ №{latest_id} отменён.")
-        try:
-            await bot.send_message(ADMIN_ID, f"🔁 Пользователь отменил заказ №{latest_id}")
-        except Exception:
-            pass
+        admin_notifier.notify(f"🔁 Пользователь отменил заказ №{latest_id}", kind="cancel", summary=f"№{latest_id}")
 
     except Exception as e:
         await message.answer(f"⚠️ Ошибка при отмене заказа: {e}")
\ No newline at end of file
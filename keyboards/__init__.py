@@ -1,4 +1,4 @@
 # keyboards/__init__.py
 
-from .inline import get_main_menu, get_date_keyboard, get_time_keyboard, get_cancel_order_button
-from .reply import get_berry_keyboard
\ No newline at end of file
+from .inline import get_main_menu, delivery_dates, get_date_keyboard, get_time_keyboard, get_cancel_order_button, get_orders_page_keyboard
+from .reply import get_berry_keyboard, invalidate_berry_keyboard
\ No newline at end of file
@@ -1,8 +1,13 @@
 # keyboards/inline.py
 from datetime import date, timedelta
+from functools import lru_cache
+from typing import FrozenSet, Optional, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from storage.slots import SLOT_TIMES
 
+
+@lru_cache(maxsize=None)
 def get_main_menu() -> InlineKeyboardMarkup:
     """Главное меню пользователя после входа."""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -14,14 +19,26 @@ def get_main_menu() -> InlineKeyboardMarkup:
     ])
 
 
-def get_date_keyboard(today: date) -> InlineKeyboardMarkup:
-    """Генерирует клавиатуру с датами на 30 дней вперёд (по 3 в ряд)."""
+@lru_cache(maxsize=1)
+def delivery_dates(today: date) -> Tuple[str, ...]:
+    """Даты доставки на 30 дней вперёд в формате dd.mm.YYYY."""
+    return tuple((today + timedelta(days=i)).strftime("%d.%m.%Y") for i in range(1, 31))
+
+
+@lru_cache(maxsize=32)
+def get_date_keyboard(today: date, full_dates: FrozenSet[str] = frozenset()) -> InlineKeyboardMarkup:
+    """
+    Генерирует клавиатуру с датами на 30 дней вперёд (по 3 в ряд).
+    Даты без свободных слотов помечаются 🚫 и не выбираются.
+    Результат кэшируется по (день, занятые даты) и пересобирается только при их смене.
+    """
     buttons = []
     row = []
-    for i in range(1, 31):  # 30 дней вперёд
-        delivery_day = today + timedelta(days=i)
-        date_str = delivery_day.strftime("%d.%m.%Y")
-        button = InlineKeyboardButton(text=date_str, callback_data=f"date_{date_str}")
+    for date_str in delivery_dates(today):
+        if date_str in full_dates:
+            button = InlineKeyboardButton(text=f"🚫 {date_str}", callback_data="slot_full")
+        else:
+            button = InlineKeyboardButton(text=date_str, callback_data=f"date_{date_str}")
         row.append(button)
         if len(row) == 3:
             buttons.append(row)
@@ -31,17 +48,43 @@ def get_date_keyboard(today: date) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def get_time_keyboard() -> InlineKeyboardMarkup:
-    """Генерирует клавиатуру со временем доставки с 10:00 до 20:00."""
+@lru_cache(maxsize=64)
+def get_time_keyboard(full_times: FrozenSet[str] = frozenset()) -> InlineKeyboardMarkup:
+    """
+    Генерирует клавиатуру со временем доставки с 10:00 до 20:00.
+    Заполненные слоты помечаются 🚫 и не выбираются.
+    """
     buttons = [
-        [InlineKeyboardButton(text=f"{h:02d}:00", callback_data=f"time_{h:02d}:00")]
-        for h in range(10, 21)  # 10:00 – 20:00 включительно
+        [InlineKeyboardButton(text=f"🚫 {t} — мест нет", callback_data="slot_full")]
+        if t in full_times else
+        [InlineKeyboardButton(text=t, callback_data=f"time_{t}")]
+        for t in SLOT_TIMES
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=1024)
 def get_cancel_order_button(order_id: str) -> InlineKeyboardMarkup:
     """Кнопка для отмены конкретного заказа."""
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="❌ Отменить заказ", callback_data=f"cancel_user_{order_id}")]
-    ])
\ No newline at end of file
+    ])
+
+def get_orders_page_keyboard(prefix: str, first_id: int, last_id: int, has_newer: bool, has_older: bool,
+                             cancel_ids: Tuple[str, ...] = ()) -> Optional[InlineKeyboardMarkup]:
+    """
+    Навигация по страницам заказов: курсоры — номера первого и последнего заказа на странице.
+    cancel_ids — заказы на странице, которые можно отменить (по кнопке на каждый).
+    """
+    buttons = [
+        [InlineKeyboardButton(text=f"❌ Отменить заказ №{oid}", callback_data=f"cancel_page_{oid}")]
+        for oid in cancel_ids
+    ]
+    nav = []
+    if has_newer:
+        nav.append(InlineKeyboardButton(text="◀️ Новее", callback_data=f"{prefix}_after_{first_id}"))
+    if has_older:
+        nav.append(InlineKeyboardButton(text="Старее ▶️", callback_data=f"{prefix}_before_{last_id}"))
+    if nav:
+        buttons.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=buttons) if buttons else None
@@ -1,25 +1,43 @@
 # keyboards/reply.py
+from functools import lru_cache
+from typing import Optional, Tuple
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from config import BERRIES, BERRY_PRICES
 
 
-def get_berry_keyboard() -> ReplyKeyboardMarkup:
-    """
-    Возвращает клавиатуру с ягодами и ценами + кнопку 'Завершить заказ'.
-    """
+def _catalog() -> Tuple[Tuple[str, Optional[int]], ...]:
+    """Текущий ассортимент с ценами — ключ кэша клавиатуры."""
+    return tuple((berry, BERRY_PRICES.get(berry)) for berry in BERRIES)
+
+
+@lru_cache(maxsize=1)
+def _build_berry_keyboard(catalog: Tuple[Tuple[str, Optional[int]], ...]) -> ReplyKeyboardMarkup:
     keyboard = []
-    for berry in BERRIES:
+    for berry, price in catalog:
         if berry == "Завершить заказ":
             # Кнопка завершения — без цены
             keyboard.append([KeyboardButton(text=berry)])
         else:
             # Формат: "Голубика — 500₽"
-            price = BERRY_PRICES[berry]
             button_text = f"{berry} — {price}₽"
             keyboard.append([KeyboardButton(text=button_text)])
-    
+
     return ReplyKeyboardMarkup(
         keyboard=keyboard,
         resize_keyboard=True,
         one_time_keyboard=False  # чтобы клавиатура оставалась видимой при выборе нескольких ягод
-    )
\ No newline at end of file
+    )
+
+
+def get_berry_keyboard() -> ReplyKeyboardMarkup:
+    """
+    Возвращает клавиатуру с ягодами и ценами + кнопку 'Завершить заказ'.
+    Клавиатура строится один раз и пересобирается только при изменении ассортимента или цен.
+    """
+    return _build_berry_keyboard(_catalog())
+
+
+def invalidate_berry_keyboard() -> None:
+    """Сбрасывает кэш клавиатуры с ягодами (например, после обновления цен)."""
+    _build_berry_keyboard.cache_clear()
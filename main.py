@@ -1,10 +1,28 @@
 # main.py
 import asyncio
 import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN
+from config import (
+    BOT_TOKEN, ADMIN_ID, STORAGE_BACKEND, SQLITE_PATH, SLOT_CAPACITY, ARCHIVE_AFTER_DAYS,
+    FSM_PATH, FSM_CACHE_SIZE, FSM_SESSION_TTL,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT, WEBHOOK_MAX_IN_FLIGHT,
+    WORKERS, METRICS_HOST, METRICS_PORT, LOOP_LAG_THRESHOLD, PROFILE_DIR, PROFILE_INTERVAL, THROTTLE_LIMITS
+)
+from storage.backends import create_backend, get_backend, set_backend
+from storage.fsm import SQLiteFSMStorage
+from storage.orders import orders_repo
+from storage.users import users_repo
+from utils.broadcast import broadcaster
+from utils.metrics import setup_metrics
+from utils.notifier import admin_notifier
+from utils.throttling import setup_throttling
+from utils.watchdog import setup_watchdog
+from utils.webhook import run_webhook
+from utils.workers import WorkerPool
 from handlers import (
     common_router,
     start_router,
@@ -20,9 +38,38 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    bot = Bot(token=BOT_TOKEN)
-    storage = MemoryStorage()
+async def on_startup(bot: Bot, resume_broadcast: bool = True):
+    set_backend(create_backend(STORAGE_BACKEND, sqlite_path=SQLITE_PATH))
+    orders_repo.slots.capacity = SLOT_CAPACITY
+    orders_repo.archive_after_days = ARCHIVE_AFTER_DAYS
+    # Заказы читаются из хранилища один раз — дальше они обслуживаются из памяти
+    await orders_repo.start()
+    await users_repo.start()
+    admin_notifier.start(bot, chat_id=ADMIN_ID)
+    # Продолжаем рассылку, прерванную остановкой бота
+    if resume_broadcast:
+        broadcaster.resume(bot)
+
+
+async def on_shutdown():
+    await broadcaster.stop()
+    await admin_notifier.stop()
+    # Сворачиваем журнал в свежий снимок (или делаем checkpoint SQLite) перед выходом
+    await orders_repo.close()
+    await users_repo.close()
+    get_backend().close()
+
+
+def create_dispatcher(fsm_path: Path = FSM_PATH, metrics_port: int = METRICS_PORT,
+                      profile_dir: Optional[Path] = PROFILE_DIR,
+                      throttle_limits: Dict[str, Tuple[float, float]] = THROTTLE_LIMITS) -> Dispatcher:
+    """
+    Dispatcher со всеми роутерами и обработчиками запуска/остановки.
+    metrics_port=0 — без /metrics, profile_dir=None — без профилировщика,
+    пустые throttle_limits — без защиты от флуда.
+    """
+    # Состояния диалогов (корзины, данные входа) сохраняются на диск; Dispatcher сам закроет хранилище
+    storage = SQLiteFSMStorage(fsm_path, cache_size=FSM_CACHE_SIZE, ttl=FSM_SESSION_TTL)
     dp = Dispatcher(storage=storage)
 
     # Подключаем ТОЛЬКО роутеры — НИКАКИХ dp.message.register!
@@ -32,9 +79,40 @@ async def main():
     dp.include_router(user_menu_router)
     dp.include_router(admin_router)
 
-    await bot.delete_webhook(drop_pending_updates=True)
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    setup_metrics(dp, METRICS_HOST, metrics_port)
+    setup_watchdog(dp, LOOP_LAG_THRESHOLD, profile_dir, PROFILE_INTERVAL)
+    # До фильтров и обработчиков: лишние запросы отбрасываются сразу
+    setup_throttling(dp, throttle_limits)
+    return dp
+
+
+async def main():
+    bot = Bot(token=BOT_TOKEN)
+    if WORKERS > 1:
+        # Этот процесс только принимает обновления и раздаёт их рабочим процессам
+        dp = Dispatcher()
+        WorkerPool(WORKERS, FSM_PATH).attach(dp)
+        setup_metrics(dp, METRICS_HOST, METRICS_PORT)
+        setup_watchdog(dp, LOOP_LAG_THRESHOLD)
+    else:
+        dp = create_dispatcher()
+
     logger.info("✅ Бот 'Ягодки' запущен и готов принимать заказы!")
-    await dp.start_polling(bot)
+    if BOT_MODE == "webhook":
+        await run_webhook(
+            dp, bot,
+            base_url=WEBHOOK_URL,
+            path=WEBHOOK_PATH,
+            host=WEBAPP_HOST,
+            port=WEBAPP_PORT,
+            secret_token=WEBHOOK_SECRET or None,
+            max_in_flight=WEBHOOK_MAX_IN_FLIGHT
+        )
+    else:
+        await bot.delete_webhook(drop_pending_updates=True)
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
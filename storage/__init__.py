@@ -1,4 +1,4 @@
 # storage/__init__.py
 
-from .users import load_users, save_user
-from .orders import load_orders, save_orders, is_duplicate_order
\ No newline at end of file
+from .users import load_users, save_user, aload_users, asave_user, users_repo, UserRepository
+from .orders import load_orders, save_orders, aload_orders, asave_orders, is_duplicate_order, cart_fingerprint, orders_repo, OrderRepository
\ No newline at end of file
@@ -0,0 +1,119 @@
+# storage/archive.py
+import bisect
+import datetime
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .schema import Order, SalesStats
+
+# Статусы, после которых заказ больше не меняется сам по себе
+TERMINAL_STATUSES = ("оплачено", "отменён")
+
+
+def archive_month(date: str) -> str:
+    """Месячная партиция архива для даты доставки dd.mm.YYYY: «YYYY-MM»."""
+    day, month, year = date.split(".")
+    return f"{year}-{month}"
+
+
+def is_archive_date(date: str, today: datetime.date, after_days: int) -> bool:
+    """
+    Прошло ли с даты доставки dd.mm.YYYY не меньше after_days дней — тогда
+    оплаченные и отменённые заказы на эту дату уходят в архив.
+    Некорректные даты не архивируются.
+    """
+    try:
+        delivery = datetime.datetime.strptime(date, "%d.%m.%Y").date()
+    except ValueError:
+        return False
+    return (today - delivery).days >= after_days
+
+
+def partition_stats(orders: Iterable[Order]) -> SalesStats:
+    """Статистика оплаченных заказов партиции — её бэкенды сохраняют вместе с партицией."""
+    stats = SalesStats()
+    for order in orders:
+        if order.status == "оплачено":
+            stats.add_order(order)
+    return stats
+
+
+class ArchiveIndex:
+    """
+    Какие заказы лежат в архиве и в какой месячной партиции.
+    Хранит только номера заказов и user_id (компактные массивы, отсортированные
+    по номеру) — сами заказы читаются из партиций по требованию.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, array] = {}
+        self._users: Dict[str, array] = {}
+
+    @classmethod
+    def from_catalog(cls, catalog: Dict[str, List[Tuple[int, int]]], exclude: Iterable[str] = ()) -> "ArchiveIndex":
+        """
+        Строит индекс по каталогу бэкенда (месяц → пары (номер, user_id)).
+        Номера из exclude пропускаются: если заказ есть и в рабочих данных,
+        верна рабочая копия (её вернули из архива или не успели из неё убрать).
+        """
+        index = cls()
+        exclude = set(exclude)
+        for month, entries in catalog.items():
+            index.add(month, [(oid, uid) for oid, uid in entries if str(oid) not in exclude])
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._ids.values())
+
+    def __contains__(self, order_id: int) -> bool:
+        return self.month_of(order_id) is not None
+
+    def months(self) -> List[str]:
+        return sorted(self._ids)
+
+    def month_ids(self, month: str) -> array:
+        return self._ids.get(month, array("q"))
+
+    def entries(self) -> Iterator[Tuple[int, int]]:
+        """Все пары (номер заказа, user_id) архива."""
+        for month in self._ids:
+            yield from zip(self._ids[month], self._users[month])
+
+    def month_of(self, order_id: int) -> Optional[str]:
+        for month, ids in self._ids.items():
+            pos = bisect.bisect_left(ids, order_id)
+            if pos < len(ids) and ids[pos] == order_id:
+                return month
+        return None
+
+    def add(self, month: str, entries: List[Tuple[int, int]]) -> None:
+        if not entries:
+            return
+        merged = dict(zip(self._ids.get(month, ()), self._users.get(month, ())))
+        merged.update((int(oid), int(uid)) for oid, uid in entries)
+        ordered = sorted(merged.items())
+        self._ids[month] = array("q", (oid for oid, _ in ordered))
+        self._users[month] = array("q", (uid for _, uid in ordered))
+
+    def discard(self, order_id: int) -> Optional[str]:
+        """Убирает заказ из индекса; возвращает его месяц (None — заказа в архиве не было)."""
+        month = self.month_of(order_id)
+        if month is not None:
+            ids = self._ids[month]
+            pos = bisect.bisect_left(ids, order_id)
+            del ids[pos]
+            del self._users[month][pos]
+            if not ids:
+                del self._ids[month], self._users[month]
+        return month
+
+    def discard_many(self, order_ids: Iterable[int]) -> int:
+        """Убирает из индекса сразу много заказов (один проход по архиву); возвращает, сколько их там было."""
+        order_ids = set(order_ids)
+        removed = 0
+        for month in list(self._ids):
+            kept = [(oid, uid) for oid, uid in zip(self._ids[month], self._users[month]) if oid not in order_ids]
+            removed += len(self._ids[month]) - len(kept)
+            del self._ids[month], self._users[month]
+            self.add(month, kept)
+        return removed
@@ -0,0 +1,57 @@
+# storage/backends/__init__.py
+import logging
+from pathlib import Path
+
+from .base import StorageBackend
+from .json_backend import JsonBackend
+from .sqlite_backend import SQLiteBackend, SQLITE_FILE
+
+logger = logging.getLogger(__name__)
+
+# Текущий бэкенд; по умолчанию — JSON-файлы, main.py может заменить его до запуска
+_backend: StorageBackend = JsonBackend()
+
+
+def get_backend() -> StorageBackend:
+    return _backend
+
+
+def set_backend(backend: StorageBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def create_backend(name: str, sqlite_path: Path = SQLITE_FILE) -> StorageBackend:
+    """
+    Создаёт бэкенд по имени из конфигурации ("json" или "sqlite").
+    При первом запуске SQLite-бэкенда в пустую базу переносятся данные из JSON-файлов.
+    """
+    if name == "json":
+        return JsonBackend()
+    if name == "sqlite":
+        backend = SQLiteBackend(sqlite_path)
+        if backend.is_empty():
+            _import_json(backend)
+        return backend
+    raise ValueError(f"Неизвестный бэкенд хранилища: {name}")
+
+
+def _import_json(backend: StorageBackend) -> None:
+    source = JsonBackend()
+    orders = source.load_orders()
+    users = source.load_users()
+    archive = {month: source.load_archive_month(month) for month in source.load_archive_catalog()}
+    source.close()
+    if not orders.orders and not users and not archive:
+        return
+    logger.info(f"📦 Перенос данных из JSON в {backend.name}: "
+                f"{len(orders.orders)} заказов, {len(users)} пользователей, "
+                f"{sum(len(month) for month in archive.values())} заказов в архиве")
+    job = backend.prepare_compaction(orders, force=True)
+    if job is not None:
+        job()
+    job = backend.prepare_archive(archive)
+    if job is not None:
+        job()
+    for user in users.values():
+        backend.upsert_user(user)
@@ -0,0 +1,133 @@
+# storage/backends/base.py
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..schema import Order, OrdersData, SalesStats, User
+
+
+class StorageBackend(ABC):
+    """
+    Интерфейс хранилища заказов и пользователей.
+
+    Бэкенд отвечает только за запись на диск: рабочая копия заказов
+    и индексы живут в памяти (см. storage.orders.OrderRepository).
+    Методы изменения вызываются из event loop и должны быть быстрыми —
+    тяжёлая работа выносится в prepare_compaction и prepare_archive.
+    Бэкенд, запись в который может ждать блокировку (файл делят несколько
+    процессов), ставит blocking_writes = True: тогда обработчики вызывают
+    его методы изменения из пула потоков (см. OrderRepository._write).
+    """
+
+    name = "base"
+    blocking_writes = False
+
+    # === Заказы ===
+    @abstractmethod
+    def load_orders(self) -> OrdersData:
+        """Читает все заказы с диска."""
+
+    @abstractmethod
+    def insert_order(self, order_id: int, order: Order) -> None:
+        """Сохраняет новый заказ."""
+
+    def create_order(self, order: Order, last_id: int) -> int:
+        """
+        Сохраняет новый заказ и возвращает его номер.
+        По умолчанию номер — следующий после last_id; бэкенды, которые делят
+        несколько процессов, выдают номер сами, атомарно.
+        """
+        order_id = last_id + 1
+        self.insert_order(order_id, order)
+        return order_id
+
+    @abstractmethod
+    def update_status(self, order_id: int, status: str) -> None:
+        """Сохраняет смену статуса заказа."""
+
+    def update_statuses(self, changes: List[Tuple[int, str]]) -> None:
+        """
+        Сохраняет смену статусов нескольких заказов (номер, статус) одной записью.
+        По умолчанию — по одному update_status; бэкенды, которые умеют писать
+        пачкой атомарно, переопределяют метод.
+        """
+        for order_id, status in changes:
+            self.update_status(order_id, status)
+
+    def needs_compaction(self) -> bool:
+        """Пора ли запускать фоновое обслуживание хранилища."""
+        return False
+
+    def prepare_compaction(self, data: OrdersData, force: bool = False) -> Optional[Callable[[], None]]:
+        """
+        Готовит фоновое обслуживание хранилища (свёртку журнала, checkpoint и т.п.).
+        Вызывается в event loop; возвращённая функция выполняется в пуле потоков.
+        При force=True data нужно сохранить целиком (используется save_orders).
+        """
+        return None
+
+    # === Архив ===
+    def load_archive_catalog(self) -> Dict[str, List[Tuple[int, int]]]:
+        """Каталог архива: месяц «YYYY-MM» → пары (номер заказа, user_id). Сами заказы не читаются."""
+        return {}
+
+    def load_archive_month(self, month: str) -> Dict[str, Order]:
+        """Читает одну месячную партицию архива."""
+        return {}
+
+    def load_archive_stats(self) -> Dict[str, Tuple[int, SalesStats]]:
+        """
+        Сохранённая статистика оплаченных заказов по месяцам архива:
+        месяц → (сколько заказов партиции она учитывает, статистика).
+        Месяцы без сохранённой статистики пропускаются.
+        """
+        return {}
+
+    def prepare_archive(self, months: Dict[str, Dict[str, Order]]) -> Optional[Callable[[], List[str]]]:
+        """
+        Готовит перенос заказов из рабочих данных в месячные партиции архива.
+        Вызывается в event loop; возвращённая функция выполняется в пуле потоков
+        и возвращает номера заказов, которые теперь лежат в архиве.
+        None — бэкенд не поддерживает архив.
+        """
+        return None
+
+    def restore_order(self, order_id: int, order: Order) -> None:
+        """Возвращает заказ из архива в рабочие данные (с уже изменённым статусом)."""
+        self.insert_order(order_id, order)
+
+    # === Изменения из других процессов ===
+    def data_version(self) -> int:
+        """Текущая версия данных; изменения после неё вернут order_changes/user_changes."""
+        return 0
+
+    def order_changes(self, since: int) -> Optional[Tuple[int, List[Tuple[str, Order]]]]:
+        """
+        Заказы, изменённые после версии since (в том числе другими процессами),
+        и новая версия. None — бэкенд не поддерживает работу в нескольких процессах.
+        """
+        return None
+
+    def user_changes(self, since: int) -> Optional[Tuple[int, List[User]]]:
+        """То же, что order_changes, но для пользователей."""
+        return None
+
+    # === Пользователи ===
+    @abstractmethod
+    def load_users(self) -> Dict[str, User]:
+        """Читает всех пользователей; ключ — номер телефона."""
+
+    @abstractmethod
+    def upsert_user(self, user: User) -> None:
+        """Сохраняет или обновляет пользователя по номеру телефона."""
+
+    def users_need_compaction(self) -> bool:
+        """Пора ли сворачивать накопленные изменения пользователей."""
+        return False
+
+    def prepare_users_compaction(self, users: Dict[str, User],
+                                 force: bool = False) -> Optional[Callable[[], None]]:
+        """То же, что prepare_compaction, но для пользователей (ключ — номер телефона)."""
+        return None
+
+    def close(self) -> None:
+        """Освобождает файлы и соединения."""
@@ -0,0 +1,268 @@
+# storage/backends/json_backend.py
+import json
+import logging
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..io import atomic_write_text
+from ..journal import Journal
+from ..archive import partition_stats
+from ..schema import Order, OrdersData, SalesStats, User
+from .base import StorageBackend
+
+# Путь к файлу с заказами (снимок) и к журналу изменений
+ORDERS_FILE = Path("orders.json")
+ORDERS_JOURNAL_FILE = Path("orders.journal.jsonl")
+
+# Путь к файлу с пользователями (снимок) и к журналу регистраций
+USERS_FILE = Path("users.json")
+USERS_JOURNAL_FILE = Path("users.journal.jsonl")
+
+# Папка архива: месячные партиции YYYY-MM.json, каталог catalog.json
+# и статистика оплаченных заказов по месяцам stats.json
+ARCHIVE_DIR = Path("orders_archive")
+ARCHIVE_CATALOG = "catalog.json"
+ARCHIVE_STATS = "stats.json"
+
+# После скольких событий в журнале запускать фоновую компактизацию
+COMPACT_EVERY = 1000
+
+# События журнала для смены статуса
+STATUS_EVENTS = {
+    "оплачено": "paid",
+    "отменён": "cancelled",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _empty_orders() -> Dict[str, Any]:
+    return {"last_id": 0, "orders": {}}
+
+
+class JsonBackend(StorageBackend):
+    """
+    Хранилище в JSON-файлах.
+    Заказы: снимок orders.json + append-only журнал изменений, который
+    периодически сворачивается в новый снимок (атомарная подмена файла).
+    Пользователи: снимок users.json + журнал регистраций, устроенный так же.
+    Архив: завершённые заказы прошлых месяцев — по файлу на месяц в
+    orders_archive/ и каталог номеров заказов catalog.json.
+    """
+
+    name = "json"
+
+    def __init__(self, orders_path: Path = ORDERS_FILE, journal_path: Path = ORDERS_JOURNAL_FILE,
+                 users_path: Path = USERS_FILE, compact_every: int = COMPACT_EVERY,
+                 users_journal_path: Path = USERS_JOURNAL_FILE, archive_dir: Path = ARCHIVE_DIR):
+        self.orders_path = orders_path
+        self.archive_dir = archive_dir
+        self.users_path = users_path
+        self.journal = Journal(journal_path)
+        self.compact_every = compact_every
+        self.users_journal = Journal(users_journal_path)
+        # Заказы ушли в архив, а снимок orders.json их ещё содержит
+        self._snapshot_stale = False
+    # === Заказы ===
+    def load_orders(self) -> OrdersData:
+        """
+        Читает снимок orders.json и доигрывает события из журнала.
+        Если снимка нет или он повреждён — начинает с пустой структуры.
+        """
+        data = self._read_snapshot()
+        for event in self.journal.replay():
+            self._apply(data, event)
+        return OrdersData(**data)
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        if not self.orders_path.exists():
+            return _empty_orders()
+        try:
+            with open(self.orders_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # Проверка структуры (на случай ручного редактирования)
+            if "last_id" not in data or "orders" not in data:
+                raise ValueError("Invalid structure")
+            return data
+        except (json.JSONDecodeError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Ошибка чтения {self.orders_path}: {e}. Начинаем с пустого снимка.")
+            try:
+                self.orders_path.rename(self.orders_path.with_suffix(".json.corrupted"))
+            except OSError:
+                pass
+            return _empty_orders()
+
+    @staticmethod
+    def _apply(data: Dict[str, Any], event: Dict[str, Any]) -> None:
+        """Применяет событие журнала. Повторное применение ничего не ломает."""
+        orders = data["orders"]
+        order_id = str(event.get("id"))
+        if event["event"] in ("created", "restored"):
+            orders[order_id] = event["order"]
+            data["last_id"] = max(data["last_id"], int(order_id))
+        elif event["event"] == "statuses":
+            for changed_id, status in event["changes"]:
+                if str(changed_id) in orders:
+                    orders[str(changed_id)]["status"] = status
+        elif order_id in orders:
+            orders[order_id]["status"] = event["status"]
+
+    def insert_order(self, order_id: int, order: Order) -> None:
+        self.journal.append({"event": "created", "id": str(order_id), "order": order.to_dict()})
+
+    def update_status(self, order_id: int, status: str) -> None:
+        self.journal.append({
+            "event": STATUS_EVENTS.get(status, "status"),
+            "id": str(order_id),
+            "status": status,
+        })
+
+    def update_statuses(self, changes: List[Tuple[int, str]]) -> None:
+        # Вся пачка — одна строка журнала: после падения она применится целиком или не применится вовсе
+        self.journal.append({
+            "event": "statuses",
+            "changes": [[str(order_id), status] for order_id, status in changes],
+        })
+
+    def restore_order(self, order_id: int, order: Order) -> None:
+        # Копия в партиции архива остаётся: при загрузке рабочая копия важнее
+        self.journal.append({"event": "restored", "id": str(order_id), "order": order.to_dict()})
+
+    def needs_compaction(self) -> bool:
+        return self.journal.size >= self.compact_every or self._snapshot_stale
+
+    def prepare_compaction(self, data: OrdersData, force: bool = False) -> Optional[Callable[[], None]]:
+        if not force and self.journal.size == 0 and not self._snapshot_stale:
+            return None
+        self._snapshot_stale = False
+        # В event loop — только копия словаря и статусов: из полей заказа на месте меняется
+        # лишь статус. Без выделения объекта на каждый заказ копия не будит сборщик мусора;
+        # в словари и JSON заказы превращаются уже в пуле потоков
+        orders = data.orders.copy()
+        statuses = [order.status for order in orders.values()]
+        self.journal.rotate()
+        return partial(self._finish_compaction, data.last_id, orders, statuses)
+
+    def _finish_compaction(self, last_id: int, orders: Dict[str, Order], statuses: List[str]) -> None:
+        payload = {}
+        for (order_id, order), status in zip(orders.items(), statuses):
+            payload[order_id] = order.to_dict()
+            payload[order_id]["status"] = status
+        atomic_write_text(self.orders_path, json.dumps({"last_id": last_id, "orders": payload}, ensure_ascii=False))
+        self.journal.finish_compaction()
+
+    # === Архив ===
+    def _month_path(self, month: str) -> Path:
+        return self.archive_dir / f"{month}.json"
+
+    def _read_json(self, path: Path, default: Any) -> Any:
+        if not path.exists():
+            return default
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"⚠️ Ошибка чтения {path}: {e}")
+            return default
+
+    def load_archive_catalog(self) -> Dict[str, List[Tuple[int, int]]]:
+        catalog = self._read_json(self.archive_dir / ARCHIVE_CATALOG, {})
+        return {month: [(oid, uid) for oid, uid in entries] for month, entries in catalog.items()}
+
+    def load_archive_month(self, month: str) -> Dict[str, Order]:
+        orders = self._read_json(self._month_path(month), {})
+        return {order_id: Order(**order) for order_id, order in orders.items()}
+
+    def load_archive_stats(self) -> Dict[str, Tuple[int, SalesStats]]:
+        saved = self._read_json(self.archive_dir / ARCHIVE_STATS, {})
+        return {month: (entry["orders"], SalesStats.from_dict(entry["stats"])) for month, entry in saved.items()}
+
+    def prepare_archive(self, months: Dict[str, Dict[str, Order]]) -> Optional[Callable[[], List[str]]]:
+        if not months:
+            return None
+        # Заказы сериализуются в event loop — в том состоянии, в котором их решили архивировать
+        payloads = {month: {oid: order.to_dict() for oid, order in orders.items()}
+                    for month, orders in months.items()}
+        return partial(self._write_archive, payloads)
+
+    def _write_archive(self, payloads: Dict[str, Dict[str, Dict[str, Any]]]) -> List[str]:
+        """
+        Дописывает заказы в партиции, затем обновляет их статистику и каталог. Из снимка
+        orders.json они уйдут при следующей компактизации; до тех пор (и при
+        падении посередине) заказ есть в обоих местах, и верна рабочая копия.
+        """
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        catalog_path = self.archive_dir / ARCHIVE_CATALOG
+        stats_path = self.archive_dir / ARCHIVE_STATS
+        catalog = self._read_json(catalog_path, {})
+        saved_stats = self._read_json(stats_path, {})
+        for month, orders in payloads.items():
+            stored = self._read_json(self._month_path(month), {})
+            stored.update(orders)
+            atomic_write_text(self._month_path(month), json.dumps(stored, ensure_ascii=False))
+            stats = partition_stats(Order(**order) for order in stored.values())
+            saved_stats[month] = {"orders": len(stored), "stats": stats.to_dict()}
+            catalog[month] = sorted([int(oid), order["user_id"]] for oid, order in stored.items())
+        atomic_write_text(stats_path, json.dumps(saved_stats, ensure_ascii=False))
+        atomic_write_text(catalog_path, json.dumps(catalog))
+        self._snapshot_stale = True
+        return [oid for orders in payloads.values() for oid in orders]
+
+    # === Пользователи ===
+    def load_users(self) -> Dict[str, User]:
+        """Читает снимок users.json и доигрывает журнал регистраций."""
+        users = self._read_users()
+        for event in self.users_journal.replay():
+            user = event["user"]
+            users[user["phone"]] = user
+        return {phone: User(**user) for phone, user in users.items()}
+
+    def _read_users(self) -> Dict[str, Any]:
+        """
+        Загружает пользователей из users.json.
+        Если файл не существует — возвращает пустой словарь.
+        Если файл повреждён — создаёт резервную копию и возвращает пустой словарь.
+        """
+        if not self.users_path.exists():
+            return {}
+
+        try:
+            with open(self.users_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                # Убедимся, что это словарь
+                if not isinstance(data, dict):
+                    raise ValueError("users.json должен содержать объект (словарь).")
+                return data
+        except (json.JSONDecodeError, ValueError, OSError) as e:
+            logger.warning(f"⚠️ Ошибка чтения {self.users_path}: {e}. Данные не загружены.")
+            try:
+                self.users_path.rename(self.users_path.with_suffix(".json.corrupted"))
+            except Exception:
+                pass
+            return {}
+
+    def upsert_user(self, user: User) -> None:
+        self.users_journal.append({"event": "upsert", "user": user.to_dict()})
+
+    def users_need_compaction(self) -> bool:
+        return self.users_journal.size >= self.compact_every
+
+    def prepare_users_compaction(self, users: Dict[str, User],
+                                 force: bool = False) -> Optional[Callable[[], None]]:
+        if not force and self.users_journal.size == 0:
+            return None
+        # Пользователи не меняются на месте (upsert заменяет объект) — в event loop
+        # достаточно копии словаря, сериализация идёт в пуле потоков
+        snapshot = users.copy()
+        self.users_journal.rotate()
+        return partial(self._finish_users_compaction, snapshot)
+
+    def _finish_users_compaction(self, users: Dict[str, User]) -> None:
+        payload = json.dumps({phone: user.to_dict() for phone, user in users.items()}, ensure_ascii=False)
+        atomic_write_text(self.users_path, payload)
+        self.users_journal.finish_compaction()
+
+    def close(self) -> None:
+        self.journal.close()
+        self.users_journal.close()
@@ -0,0 +1,367 @@
+# storage/backends/sqlite_backend.py
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..archive import partition_stats
+from ..schema import Order, OrdersData, SalesStats, User
+from .base import StorageBackend
+
+# Путь к файлу базы данных по умолчанию
+SQLITE_FILE = Path("berries.db")
+
+# После скольких изменений выполнять checkpoint WAL-журнала
+CHECKPOINT_EVERY = 1000
+
+# Сколько миллисекунд SQLite ждёт чужую блокировку записи за одну попытку.
+# Ожидание короткое: соединение общее, и пока идёт попытка, остальные вызовы
+# этого процесса стоят на _lock. Между попытками блокировка отпускается.
+BUSY_TIMEOUT_MS = 100
+
+# Сколько секунд в сумме пытаться начать транзакцию, прежде чем отдать ошибку
+WRITE_TIMEOUT = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id          INTEGER PRIMARY KEY,
+    user_id     INTEGER NOT NULL,
+    full_name   TEXT    NOT NULL,
+    phone       TEXT    NOT NULL,
+    cart        TEXT    NOT NULL,
+    date        TEXT    NOT NULL,
+    time        TEXT    NOT NULL,
+    status      TEXT    NOT NULL,
+    fingerprint TEXT    NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status);
+CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (date);
+CREATE INDEX IF NOT EXISTS idx_orders_phone ON orders (phone);
+
+CREATE TABLE IF NOT EXISTS orders_archive (
+    id          INTEGER PRIMARY KEY,
+    user_id     INTEGER NOT NULL,
+    full_name   TEXT    NOT NULL,
+    phone       TEXT    NOT NULL,
+    cart        TEXT    NOT NULL,
+    date        TEXT    NOT NULL,
+    time        TEXT    NOT NULL,
+    status      TEXT    NOT NULL,
+    fingerprint TEXT    NOT NULL DEFAULT '',
+    month       TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_archive_month ON orders_archive (month);
+
+CREATE TABLE IF NOT EXISTS archive_stats (
+    month  TEXT    PRIMARY KEY,
+    orders INTEGER NOT NULL,
+    stats  TEXT    NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    phone     TEXT    PRIMARY KEY,
+    user_id   INTEGER NOT NULL,
+    full_name TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_user_id ON users (user_id);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT    PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Номер версии у каждой строки: по нему другие процессы находят свежие изменения
+VERSIONED_TABLES = ("orders", "users")
+
+ORDER_COLUMNS = "id, user_id, full_name, phone, cart, date, time, status, fingerprint"
+
+
+def _order_row(order_id: int, order: Order) -> Tuple:
+    cart = json.dumps([item.to_dict() for item in order.cart], ensure_ascii=False)
+    return (order_id, order.user_id, order.full_name, order.phone, cart,
+            order.date, order.time, order.status, order.fingerprint)
+
+
+def _order_from_row(row: Tuple) -> Tuple[str, Order]:
+    order_id, user_id, full_name, phone, cart, date, time, status, fingerprint = row
+    return str(order_id), Order(
+        user_id=user_id, full_name=full_name, phone=phone, cart=json.loads(cart),
+        date=date, time=time, status=status, fingerprint=fingerprint
+    )
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Хранилище в SQLite (режим WAL).
+    Каждое изменение — вставка или обновление одной строки в отдельной
+    транзакции, по user_id, status, date и phone построены индексы.
+
+    Базу могут одновременно использовать несколько процессов бота:
+    номера заказов выдаёт счётчик в таблице counters внутри транзакции,
+    а каждая изменённая строка получает новый номер версии, по которому
+    процессы подтягивают чужие изменения (order_changes, user_changes).
+
+    Архив — таблица orders_archive, партиция — значение столбца month;
+    статистика оплаченных заказов каждой партиции — в archive_stats.
+    Перенос и возврат заказа — одна транзакция, поэтому смена статуса
+    заказа, который другой процесс уже убрал в архив, не теряется:
+    update_status сам возвращает его в orders.
+
+    Запись может ждать блокировку другого процесса или checkpoint из пула
+    потоков, поэтому обработчики пишут через пул (blocking_writes).
+    """
+
+    name = "sqlite"
+    blocking_writes = True
+
+    def __init__(self, path: Path = SQLITE_FILE, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self._writes = 0
+        # Соединение используется и из event loop, и из пула потоков
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Другой процесс может держать блокировку записи — недолго ждём, затем повторяем (см. _transaction)
+        self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._writes = 0
+
+    def _migrate(self) -> None:
+        """Добавляет столбцы версий в базы, созданные до их появления, и заводит счётчики."""
+        with self._transaction() as conn:
+            for table in VERSIONED_TABLES:
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if "version" not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_version ON {table} (version)")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) "
+                         "SELECT 'order_id', COALESCE(MAX(id), 0) FROM orders")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('version', 0)")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Транзакция с блокировкой записи сразу при начале (BEGIN IMMEDIATE).
+        Если запись держит другой процесс, попытка повторяется с растущей паузой
+        (до WRITE_TIMEOUT секунд); во время паузы _lock свободен.
+        """
+        deadline = time.monotonic() + WRITE_TIMEOUT
+        delay = 0.01
+        while True:
+            self._lock.acquire()
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                break
+            except sqlite3.OperationalError as e:
+                self._lock.release()
+                if "locked" not in str(e) or time.monotonic() >= deadline:
+                    raise
+            except BaseException:
+                self._lock.release()
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+        try:
+            yield self._conn
+            self._conn.execute("COMMIT")
+            self._writes += 1
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _next(conn: sqlite3.Connection, counter: str) -> int:
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (counter,))
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (counter,)).fetchone()[0]
+
+    @staticmethod
+    def _raise_counter(conn: sqlite3.Connection, counter: str, value: int) -> None:
+        conn.execute("UPDATE counters SET value = MAX(value, ?) WHERE name = ?", (value, counter))
+
+    def data_version(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM counters WHERE name = 'version'").fetchone()[0]
+
+    # === Заказы ===
+    def load_orders(self) -> OrdersData:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {ORDER_COLUMNS} FROM orders ORDER BY id").fetchall()
+            # Последние заказы могли уйти в архив — номер берём из счётчика
+            last_id = self._conn.execute("SELECT value FROM counters WHERE name = 'order_id'").fetchone()[0]
+        orders = dict(_order_from_row(row) for row in rows)
+        return OrdersData(last_id=last_id, orders=orders)
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return (self._conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone() is None
+                    and self._conn.execute("SELECT 1 FROM orders_archive LIMIT 1").fetchone() is None)
+
+    def insert_order(self, order_id: int, order: Order) -> None:
+        with self._transaction() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO orders ({ORDER_COLUMNS}, version) "
+                         f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         _order_row(order_id, order) + (self._next(conn, "version"),))
+            self._raise_counter(conn, "order_id", order_id)
+
+    def create_order(self, order: Order, last_id: int) -> int:
+        # Номер выдаёт счётчик в базе: два процесса не получат один и тот же
+        with self._transaction() as conn:
+            order_id = self._next(conn, "order_id")
+            conn.execute(f"INSERT INTO orders ({ORDER_COLUMNS}, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         _order_row(order_id, order) + (self._next(conn, "version"),))
+        return order_id
+
+    def update_status(self, order_id: int, status: str) -> None:
+        self.update_statuses([(order_id, status)])
+
+    def update_statuses(self, changes: List[Tuple[int, str]]) -> None:
+        # Одна транзакция и одна версия на всю пачку
+        with self._transaction() as conn:
+            version = self._next(conn, "version")
+            for order_id, status in changes:
+                updated = conn.execute("UPDATE orders SET status = ?, version = ? WHERE id = ?",
+                                       (status, version, order_id)).rowcount
+                if not updated:
+                    # Заказ уже в архиве (его перенёс другой процесс) — возвращаем с новым статусом
+                    conn.execute(f"INSERT INTO orders ({ORDER_COLUMNS}, version) "
+                                 f"SELECT id, user_id, full_name, phone, cart, date, time, ?, fingerprint, ? "
+                                 f"FROM orders_archive WHERE id = ?", (status, version, order_id))
+                    conn.execute("DELETE FROM orders_archive WHERE id = ?", (order_id,))
+
+    def order_changes(self, since: int) -> Tuple[int, List[Tuple[str, Order]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {ORDER_COLUMNS}, version FROM orders WHERE version > ? ORDER BY version", (since,)
+            ).fetchall()
+        if not rows:
+            return since, []
+        return rows[-1][-1], [_order_from_row(row[:-1]) for row in rows]
+
+    def needs_compaction(self) -> bool:
+        return self._writes >= self.checkpoint_every
+
+    def prepare_compaction(self, data: OrdersData, force: bool = False) -> Optional[Callable[[], None]]:
+        if force:
+            rows = [_order_row(int(oid), order) for oid, order in data.orders.items()]
+            return partial(self._replace_all, rows, data.last_id)
+        if self._writes == 0:
+            return None
+        return self._checkpoint
+
+    def _replace_all(self, rows: List[Tuple], last_id: int = 0) -> None:
+        with self._transaction() as conn:
+            version = self._next(conn, "version")
+            conn.execute("DELETE FROM orders")
+            conn.executemany(
+                f"INSERT INTO orders ({ORDER_COLUMNS}, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row + (version,) for row in rows]
+            )
+            self._raise_counter(conn, "order_id", max([row[0] for row in rows] + [last_id]))
+
+    def _checkpoint(self) -> None:
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._writes = 0
+
+    # === Архив ===
+    def load_archive_catalog(self) -> Dict[str, List[Tuple[int, int]]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT month, id, user_id FROM orders_archive ORDER BY id").fetchall()
+        catalog: Dict[str, List[Tuple[int, int]]] = {}
+        for month, order_id, user_id in rows:
+            catalog.setdefault(month, []).append((order_id, user_id))
+        return catalog
+
+    def load_archive_month(self, month: str) -> Dict[str, Order]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {ORDER_COLUMNS} FROM orders_archive WHERE month = ?", (month,)
+            ).fetchall()
+        return dict(_order_from_row(row) for row in rows)
+
+    def load_archive_stats(self) -> Dict[str, Tuple[int, SalesStats]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT month, orders, stats FROM archive_stats").fetchall()
+        return {month: (orders, SalesStats.from_dict(json.loads(stats))) for month, orders, stats in rows}
+
+    def prepare_archive(self, months: Dict[str, Dict[str, Order]]) -> Optional[Callable[[], List[str]]]:
+        if not months:
+            return None
+        rows = [_order_row(int(oid), order) + (month,)
+                for month, orders in months.items() for oid, order in orders.items()]
+        return partial(self._archive_rows, rows)
+
+    def _archive_rows(self, rows: List[Tuple]) -> List[str]:
+        archived = []
+        with self._transaction() as conn:
+            for row in rows:
+                order_id, status = row[0], row[7]
+                # Переносим, только если статус в базе тот же, что при выборе заказа
+                moved = conn.execute("DELETE FROM orders WHERE id = ? AND status = ?",
+                                     (order_id, status)).rowcount
+                if not moved and conn.execute("SELECT 1 FROM orders WHERE id = ?", (order_id,)).fetchone():
+                    continue  # статус успели изменить — заказ остаётся в рабочих данных
+                # Если заказ уже перенёс другой процесс, его копия в архиве остаётся
+                conn.execute(f"INSERT OR {'REPLACE' if moved else 'IGNORE'} INTO orders_archive "
+                             f"({ORDER_COLUMNS}, month) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                archived.append(str(order_id))
+            # Номера из архива не должны выдаваться повторно
+            self._raise_counter(conn, "order_id", max((row[0] for row in rows), default=0))
+            for month in {row[-1] for row in rows}:
+                self._save_month_stats(conn, month)
+        return archived
+
+    @staticmethod
+    def _save_month_stats(conn: sqlite3.Connection, month: str) -> None:
+        orders = [order for _, order in map(_order_from_row, conn.execute(
+            f"SELECT {ORDER_COLUMNS} FROM orders_archive WHERE month = ?", (month,)))]
+        conn.execute("INSERT OR REPLACE INTO archive_stats (month, orders, stats) VALUES (?, ?, ?)",
+                     (month, len(orders), json.dumps(partition_stats(orders).to_dict(), ensure_ascii=False)))
+
+    def restore_order(self, order_id: int, order: Order) -> None:
+        with self._transaction() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO orders ({ORDER_COLUMNS}, version) "
+                         f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         _order_row(order_id, order) + (self._next(conn, "version"),))
+            conn.execute("DELETE FROM orders_archive WHERE id = ?", (order_id,))
+
+    # === Пользователи ===
+    def load_users(self) -> Dict[str, User]:
+        with self._lock:
+            rows = self._conn.execute("SELECT phone, user_id, full_name FROM users").fetchall()
+        return {phone: User(user_id=user_id, full_name=full_name, phone=phone)
+                for phone, user_id, full_name in rows}
+
+    def upsert_user(self, user: User) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (phone, user_id, full_name, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(phone) DO UPDATE SET user_id = excluded.user_id, full_name = excluded.full_name, "
+                "version = excluded.version",
+                (user.phone, user.user_id, user.full_name, self._next(conn, "version"))
+            )
+
+    def user_changes(self, since: int) -> Tuple[int, List[User]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT phone, user_id, full_name, version FROM users WHERE version > ? ORDER BY version", (since,)
+            ).fetchall()
+        if not rows:
+            return since, []
+        return rows[-1][-1], [User(user_id=user_id, full_name=full_name, phone=phone)
+                              for phone, user_id, full_name, _ in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,238 @@
+# storage/fsm.py
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from .io import run_io
+from utils.metrics import storage_seconds
+
+# Файл базы с состояниями диалогов (корзины, данные входа)
+FSM_FILE = Path("fsm.db")
+
+# Сколько сессий держать в памяти (остальные читаются из базы по запросу)
+CACHE_SIZE = 10_000
+
+# Через сколько секунд без активности сессия удаляется (7 дней)
+SESSION_TTL = 7 * 24 * 3600
+
+# Изменения пишутся в базу пачкой: не реже FLUSH_INTERVAL секунд или сразу по накоплении FLUSH_BATCH
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH = 200
+
+# Как часто (в секундах) удалять устаревшие сессии из базы
+SWEEP_INTERVAL = 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key     TEXT PRIMARY KEY,
+    state   TEXT,
+    data    TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fsm_updated ON fsm (updated);
+"""
+
+logger = logging.getLogger(__name__)
+
+# Запись сессии в кэше: (состояние, данные, время последнего изменения)
+Record = Tuple[Optional[str], Dict[str, Any], float]
+
+
+class SQLiteFSMStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в SQLite с кэшем в памяти.
+
+    Чтения обслуживаются из LRU-кэша на CACHE_SIZE сессий, промахи читаются
+    из базы в пуле потоков. Изменения копятся и записываются одной транзакцией
+    (раз в FLUSH_INTERVAL секунд или по FLUSH_BATCH изменений), так что
+    корзины и данные входа переживают перезапуск бота. Пустые сессии
+    (после state.clear()) удаляются, а неактивные дольше SESSION_TTL —
+    вычищаются из памяти и базы.
+    """
+
+    def __init__(self, path: Path = FSM_FILE, cache_size: int = CACHE_SIZE, ttl: float = SESSION_TTL,
+                 flush_interval: float = FLUSH_INTERVAL, flush_batch: int = FLUSH_BATCH,
+                 sweep_interval: float = SWEEP_INTERVAL, key_builder: Optional[KeyBuilder] = None):
+        self.path = path
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.sweep_interval = sweep_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache: "OrderedDict[str, Record]" = OrderedDict()
+        # Ещё не записанные изменения; None — удалить сессию
+        self._dirty: Dict[str, Optional[Record]] = {}
+        # Изменения, которые записываются прямо сейчас
+        self._writing: Dict[str, Optional[Record]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._sweep_task: Optional[asyncio.Task] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        # Соединение используется из пула потоков
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    # === Интерфейс BaseStorage ===
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        key = self.key_builder.build(key)
+        _, data, _ = await self._get(key)
+        self._put(key, state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._get(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        key = self.key_builder.build(key)
+        state, _, _ = await self._get(key)
+        self._put(key, state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data, _ = await self._get(self.key_builder.build(key))
+        return data.copy()
+
+    async def close(self) -> None:
+        """Записывает накопленные изменения и закрывает базу (вызывается Dispatcher при остановке)."""
+        for task in (self._flush_task, self._sweep_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self._flush_task = self._sweep_task = None
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        await self.flush()
+        with self._lock:
+            self._conn.close()
+
+    # === Кэш ===
+    async def _get(self, key: str) -> Record:
+        record = self._cache.get(key)
+        if record is not None:
+            self._cache.move_to_end(key)
+            return record
+        pending = self._dirty if key in self._dirty else self._writing
+        if key in pending:
+            # Вытеснена из кэша, но ещё не записана
+            record = pending[key] or (None, {}, time.time())
+        else:
+            with storage_seconds.time(operation="fsm_read"):
+                record = await run_io(self._read, key)
+            if key in self._cache:
+                # Пока читали, сессию успели изменить
+                return self._cache[key]
+        self._remember(key, record)
+        return record
+
+    def _put(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        record = (state, data, time.time())
+        self._remember(key, record)
+        # Пустая сессия (после state.clear()) в базе не нужна
+        self._dirty[key] = record if state is not None or data else None
+        self._schedule_flush()
+
+    def _remember(self, key: str, record: Record) -> None:
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # === Запись в базу ===
+    def _schedule_flush(self) -> None:
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_periodically())
+        if len(self._dirty) >= self.flush_batch:
+            task = asyncio.create_task(self.flush())
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        # Отмена таймера (при остановке) не должна прерывать уже начатую запись
+        await asyncio.shield(self.flush())
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения одной транзакцией в пуле потоков."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch = self._writing = self._dirty
+            self._dirty = {}
+            try:
+                with storage_seconds.time(operation="fsm_flush"):
+                    await run_io(self._write, list(batch.items()))
+            except Exception as e:
+                # Возвращаем изменения в очередь, если их не перекрыли более свежие
+                logger.error(f"❌ Ошибка записи состояний FSM: {e}")
+                for key, record in batch.items():
+                    self._dirty.setdefault(key, record)
+            finally:
+                self._writing = {}
+
+    # === Очистка устаревших сессий ===
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"❌ Ошибка очистки сессий FSM: {e}")
+
+    async def sweep(self) -> int:
+        """Удаляет сессии, неактивные дольше ttl, из памяти и базы. Возвращает число удалённых из базы."""
+        deadline = time.time() - self.ttl
+        for key in [k for k, (_, _, updated) in self._cache.items() if updated < deadline]:
+            del self._cache[key]
+        removed = await run_io(self._delete_expired, deadline)
+        if removed:
+            logger.info(f"🧹 Удалено устаревших сессий FSM: {removed}")
+        return removed
+
+    # === Работа с SQLite (в пуле потоков) ===
+    def _read(self, key: str) -> Record:
+        with self._lock:
+            row = self._conn.execute("SELECT state, data, updated FROM fsm WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, {}, time.time()
+        return row[0], json.loads(row[1]), row[2]
+
+    def _write(self, batch: List[Tuple[str, Optional[Record]]]) -> None:
+        upserts = [
+            (key, record[0], json.dumps(record[1], ensure_ascii=False), record[2])
+            for key, record in batch if record is not None
+        ]
+        deletes = [(key,) for key, record in batch if record is None]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO fsm (key, state, data, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+                    "updated = excluded.updated",
+                    upserts
+                )
+                self._conn.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete_expired(self, deadline: float) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM fsm WHERE updated < ?", (deadline,)).rowcount
@@ -0,0 +1,59 @@
+# storage/io.py
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Сколько потоков может одновременно работать с файлами хранилища
+STORAGE_IO_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=STORAGE_IO_WORKERS, thread_name_prefix="storage-io")
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Выполняет блокирующую файловую операцию в отдельном пуле потоков,
+    чтобы чтение и запись больших JSON-файлов не останавливали event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+async def run_io_shielded(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    То же, что run_io, но отмена вызывающей задачи не бросает операцию на полпути:
+    поток всё равно доработает, поэтому сначала дожидаемся его и только потом
+    пробрасываем CancelledError. Так блокировка, под которой идёт запись,
+    не освобождается, пока запись ещё выполняется.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+def atomic_write_text(path: Path, payload: str) -> None:
+    """
+    Записывает файл атомарно: сначала во временный файл рядом,
+    затем подменяет им основной через os.replace.
+    При падении посреди записи старая версия файла остаётся целой.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def atomic_write_json(path: Path, data: Any) -> None:
+    """Атомарно сохраняет данные в JSON-файл с форматированием."""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2))
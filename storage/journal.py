@@ -0,0 +1,85 @@
+# storage/journal.py
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, IO
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """
+    Append-only журнал событий в формате JSONL (одно событие — одна строка).
+
+    Каждое изменение — дозапись одной короткой строки в конец файла.
+    При компактизации текущий журнал переименовывается в *.compacting,
+    а новые события пишутся в свежий файл; после записи снимка
+    *.compacting удаляется.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.compacting_path = path.with_name(path.name + ".compacting")
+        self._file: Optional[IO[str]] = None
+        self.size = 0  # количество событий в текущем файле журнала
+
+    def append(self, event: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.size += 1
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """
+        Возвращает события из незавершённой компактизации и текущего журнала.
+        Оборванная последняя строка (падение во время записи) пропускается.
+        """
+        self.size = 0
+        for path in (self.compacting_path, self.path):
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"⚠️ Пропущена повреждённая запись в {path}")
+                        continue
+                    if path == self.path:
+                        self.size += 1
+                    yield event
+
+    def rotate(self) -> None:
+        """
+        Начинает компактизацию: текущий журнал откладывается в *.compacting,
+        следующие события попадут в новый файл.
+        Если прошлая компактизация не завершилась, её события дописываются к текущим.
+        """
+        self.close()
+        if not self.path.exists():
+            return
+        if self.compacting_path.exists():
+            with open(self.compacting_path, "a", encoding="utf-8") as dst, \
+                    open(self.path, "r", encoding="utf-8") as src:
+                dst.write(src.read())
+            self.path.unlink()
+        else:
+            os.replace(self.path, self.compacting_path)
+        self.size = 0
+
+    def finish_compaction(self) -> None:
+        """Удаляет журнал, события которого уже вошли в снимок."""
+        try:
+            self.compacting_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
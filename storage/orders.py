@@ -1,61 +1,793 @@
 # storage/orders.py
-import json
-from pathlib import Path
-from typing import Dict, List, Any
+import asyncio
+import bisect
+import datetime
+import hashlib
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
 
-# Путь к файлу с заказами
-ORDERS_FILE = Path("orders.json")
+from .archive import TERMINAL_STATUSES, ArchiveIndex, archive_month, is_archive_date
+from .backends import StorageBackend, get_backend
+from .io import run_io, run_io_shielded
+from .schema import CartItem, Order, OrdersData, SalesStats
+from .slots import SlotIndex
+from utils.metrics import storage_seconds
 
+T = TypeVar("T")
 
-def load_orders() -> Dict[str, Any]:
+# Как часто (в секундах) проверять хранилище на необходимость компактизации
+COMPACT_INTERVAL = 300.0
+
+# Сколько заказов показывать на одной странице списка
+PAGE_SIZE = 10
+
+# Через сколько дней после даты доставки оплаченный или отменённый заказ уходит в архив; 0 — никогда
+ARCHIVE_AFTER_DAYS = 1
+
+# Сколько прочитанных месячных партиций архива держать в памяти
+ARCHIVE_CACHE_MONTHS = 3
+
+logger = logging.getLogger(__name__)
+
+
+def cart_fingerprint(cart: List[CartItem]) -> str:
     """
-    Загружает данные заказов из orders.json.
-    Если файл не существует или повреждён — создаёт новый с пустой структурой.
+    Стабильный отпечаток состава корзины: хэш по отсортированным парам (ягода, кг).
+    Не зависит от порядка позиций в корзине.
     """
-    if not ORDERS_FILE.exists():
-        # Инициализация пустого файла
-        default_data = {"last_id": 0, "orders": {}}
-        save_orders(default_data)
-        return default_data
+    pairs = sorted((item.berry, float(item.kg)) for item in cart)
+    canonical = ";".join(f"{berry}:{kg!r}" for berry, kg in pairs)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
 
+
+@dataclass
+class OrdersPage:
+    """Страница заказов от новых к старым."""
+    items: List[Tuple[str, Order]]
+    offset: int  # сколько заказов новее первого на странице
+    total: int
+
+    @property
+    def has_newer(self) -> bool:
+        return self.offset > 0
+
+    @property
+    def has_older(self) -> bool:
+        return self.offset + len(self.items) < self.total
+
+
+def _page_ids(ids: List[int], before: Optional[int], after: Optional[int], limit: int) -> Tuple[List[int], int]:
+    """
+    Страница из отсортированного по возрастанию списка номеров, от новых к старым.
+    before — взять limit номеров меньше before (следующая страница),
+    after — limit номеров больше after (предыдущая), без курсора — самые новые.
+    Возвращает номера страницы и число номеров новее неё.
+    """
+    if after is not None:
+        end = min(bisect.bisect_right(ids, after) + limit, len(ids))
+    else:
+        end = len(ids) if before is None else bisect.bisect_left(ids, before)
+    # Неполную страницу у начала списка добираем более старыми заказами
+    start = max(end - limit, 0)
+    return ids[start:end][::-1], len(ids) - end
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(date: str) -> Optional[datetime.date]:
+    """Дата доставки dd.mm.YYYY; None — для некорректной строки (различных дат немного — разбор кэшируется)."""
     try:
-        with open(ORDERS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            # Проверка структуры (на случай ручного редактирования)
-            if "last_id" not in data or "orders" not in data:
-                raise ValueError("Invalid structure")
-            return data
-    except (json.JSONDecodeError, ValueError, KeyError) as e:
-        print(f"⚠️ Ошибка чтения orders.json: {e}. Создаём новый файл.")
-        default_data = {"last_id": 0, "orders": {}}
-        save_orders(default_data)
-        return default_data
+        return datetime.datetime.strptime(date, "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+class OrderRepository:
+    """
+    Хранилище заказов в памяти.
+    При запуске заказы один раз читаются из бэкенда (см. storage.backends),
+    дальше все чтения обслуживаются из памяти. Каждое изменение сразу
+    передаётся бэкенду (строка журнала или строка таблицы), а тяжёлое
+    обслуживание — свёртка журнала в снимок и т.п. — выполняется в фоне.
+
+    Поверх заказов поддерживаются индексы: все номера и user_id → номера
+    заказов (по возрастанию, для постраничного вывода), статус → номера и дата доставки → номера, а также
+    счётчик активных заказов по ключу (user_id, дата, отпечаток корзины)
+    для проверки дубликатов. Статистика продаж (stats) обновляется при
+    переходе заказа в статус «оплачено» и из него, занятость слотов
+    доставки (slots) — при создании и отмене заказа.
+
+    Оплаченные и отменённые заказы, дата доставки которых прошла
+    archive_after_days дней назад, фоновая задача переносит в месячные
+    партиции архива (см. archive_async). В памяти от них остаются только
+    номера — в общих индексах и в archive; сами заказы читаются из партиций,
+    лишь когда страница истории (orders_page), поиск по номеру (fetch) или
+    статистика (sales_stats) до них доходят. Смена статуса архивного заказа
+    возвращает его в рабочие данные.
+    """
+
+    def __init__(self, backend: Optional[StorageBackend] = None, compact_interval: float = COMPACT_INTERVAL,
+                 archive_after_days: int = ARCHIVE_AFTER_DAYS):
+        self._backend = backend
+        self.compact_interval = compact_interval
+        self.archive_after_days = archive_after_days
+        self._data: Optional[OrdersData] = None
+        self._version = 0  # версия данных бэкенда, до которой применены изменения (см. sync)
+        self._compact_task: Optional[asyncio.Task] = None
+        self._periodic_task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None  # сигнал фоновому обслуживанию остановиться
+        self._compact_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        # Индексы
+        self._ids: List[int] = []
+        self._by_user: Dict[int, List[int]] = defaultdict(list)
+        self._by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._by_date: Dict[str, Set[str]] = defaultdict(set)
+        self._active_carts: Dict[Tuple[int, str, str], int] = defaultdict(int)
+        self.stats = SalesStats()
+        self.slots = SlotIndex()
+        # Архив
+        self.archive = ArchiveIndex()
+        self._partitions: "OrderedDict[str, Dict[str, Order]]" = OrderedDict()
+        self._archive_stats: Optional[SalesStats] = None  # считается при первом запросе статистики
+        self._archive_changes = 0  # сколько заказов вернулось из архива (см. sales_stats)
+
+    @property
+    def backend(self) -> StorageBackend:
+        return self._backend or get_backend()
+
+    # === Загрузка ===
+    @property
+    def data(self) -> OrdersData:
+        self._ensure_loaded()
+        return self._data
+
+    def _ensure_loaded(self) -> None:
+        if self._data is None:
+            self.load()
+
+    def load(self) -> None:
+        """Читает рабочие заказы и каталог архива из бэкенда и строит индексы."""
+        # Версию берём до чтения: изменения, сделанные во время загрузки, подтянет sync
+        self._version = self.backend.data_version()
+        self._data = self.backend.load_orders()
+        self.archive = ArchiveIndex.from_catalog(self.backend.load_archive_catalog(), exclude=self._data.orders)
+        self._partitions.clear()
+        self._archive_stats = None
+        self._rebuild_indexes()
+
+    # === Индексы ===
+    def _rebuild_indexes(self) -> None:
+        self._by_user.clear()
+        self._by_status.clear()
+        self._by_date.clear()
+        self._active_carts.clear()
+        self.stats = SalesStats()
+        self.slots.clear()
+        # Номера рабочих и архивных заказов — одной сортировкой, без вставок по одному
+        entries = sorted([(int(oid), order.user_id) for oid, order in self._data.orders.items()]
+                         + list(self.archive.entries()))
+        self._ids = [order_id for order_id, _ in entries]
+        for order_id, user_id in entries:
+            self._by_user[user_id].append(order_id)
+        for order_id, order in self._data.orders.items():
+            self._index_hot(order_id, order)
+
+    def _index(self, order_id: str, order: Order) -> None:
+        bisect.insort(self._ids, int(order_id))
+        bisect.insort(self._by_user[order.user_id], int(order_id))
+        self._index_hot(order_id, order)
+
+    def _index_hot(self, order_id: str, order: Order) -> None:
+        """Индексы, которые ведутся только для рабочих (не архивных) заказов."""
+        self._by_status[order.status].add(order_id)
+        self._by_date[order.date].add(order_id)
+        if not order.fingerprint:
+            # Заказы, созданные до появления отпечатков
+            order.fingerprint = cart_fingerprint(order.cart)
+        self._count_active(order)
+        if order.status == "оплачено":
+            self.stats.add_order(order)
+
+    @staticmethod
+    def _cart_key(order: Order) -> Tuple[int, str, str]:
+        return order.user_id, order.date, order.fingerprint
+
+    def _count_active(self, order: Order) -> None:
+        """Учитывает неотменённый заказ в проверке дубликатов и занятости слотов."""
+        if order.status != "отменён":
+            self._active_carts[self._cart_key(order)] += 1
+            self.slots.add(order.date, order.time)
+
+    def _uncount_active(self, order: Order) -> None:
+        if order.status == "отменён":
+            return
+        self.slots.remove(order.date, order.time)
+        key = self._cart_key(order)
+        self._active_carts[key] -= 1
+        if self._active_carts[key] <= 0:
+            del self._active_carts[key]
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, order_id: str) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(order_id)
+            if not ids:
+                del index[key]
+
+    # === Чтение ===
+    def get(self, order_id: str) -> Optional[Order]:
+        """Заказ из рабочих данных; архивный заказ вернёт fetch."""
+        return self.data.orders.get(str(order_id))
+
+    async def fetch(self, order_id: str) -> Optional[Order]:
+        """Заказ по номеру, в том числе архивный (его партиция читается при необходимости)."""
+        order = self.get(order_id)
+        if order is None and str(order_id).isdigit():
+            found = await self._resolve_archived([int(order_id)])
+            order = found[0][1] if found else None
+        return order
+
+    async def fetch_many(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        """Заказы по номерам, в том числе архивные (каждая партиция читается один раз); ненайденных в ответе нет."""
+        return dict(await self._resolve_archived([int(oid) for oid in order_ids]))
+
+    def items(self) -> Iterator[Tuple[str, Order]]:
+        """Рабочие (не архивные) заказы."""
+        return iter(self.data.orders.items())
+
+    def _resolve(self, order_ids: Iterable) -> List[Tuple[str, Order]]:
+        # Архивные номера из общих индексов пропускаются
+        orders = self.data.orders
+        return [(str(oid), orders[str(oid)]) for oid in order_ids if str(oid) in orders]
+
+    async def _resolve_archived(self, order_ids: List[int]) -> List[Tuple[str, Order]]:
+        """Как _resolve, но заказы, которых нет в рабочих данных, дочитываются из партиций архива."""
+        orders = self.data.orders
+        months: Dict[str, Dict[str, Order]] = {}
+        for oid in order_ids:
+            month = self.archive.month_of(oid) if str(oid) not in orders else None
+            if month is not None and month not in months:
+                months[month] = await self._archive_month(month)
+        result = []
+        for oid in order_ids:
+            order = orders.get(str(oid))
+            if order is None:
+                # Пока читалась партиция, заказ могли вернуть из архива — тогда он уже в orders
+                order = months.get(self.archive.month_of(oid), {}).get(str(oid))
+            if order is not None:
+                result.append((str(oid), order))
+        return result
+
+    async def _archive_month(self, month: str) -> Dict[str, Order]:
+        orders = self._partitions.get(month)
+        if orders is None:
+            with storage_seconds.time(operation="archive_load"):
+                orders = await run_io(self.backend.load_archive_month, month)
+            self._cache_month(month, orders)
+        else:
+            self._partitions.move_to_end(month)
+        return orders
+
+    def _cache_month(self, month: str, orders: Dict[str, Order]) -> None:
+        self._partitions[month] = orders
+        self._partitions.move_to_end(month)
+        while len(self._partitions) > ARCHIVE_CACHE_MONTHS:
+            self._partitions.popitem(last=False)
+
+    def user_orders(self, user_id: int, newest_first: bool = False) -> List[Tuple[str, Order]]:
+        """Рабочие (не архивные) заказы пользователя, отсортированные по номеру."""
+        self._ensure_loaded()
+        with storage_seconds.time(operation="orders_lookup"):
+            order_ids = self._by_user.get(user_id, [])
+            return self._resolve(reversed(order_ids) if newest_first else order_ids)
+
+    async def orders_page(self, user_id: Optional[int] = None, before: Optional[int] = None,
+                          after: Optional[int] = None, limit: int = PAGE_SIZE) -> OrdersPage:
+        """
+        Страница заказов (всех или одного пользователя) от новых к старым.
+        Курсор — номер заказа: before для следующей страницы, after — для предыдущей.
+        Архивные заказы страницы дочитываются из их партиций.
+        """
+        self._ensure_loaded()
+        with storage_seconds.time(operation="orders_page"):
+            ids = self._ids if user_id is None else self._by_user.get(user_id, [])
+            page, offset = _page_ids(ids, before, after, limit)
+            return OrdersPage(await self._resolve_archived(page), offset, len(ids))
+
+    def orders_by_status(self, *statuses: str) -> List[Tuple[str, Order]]:
+        """Рабочие заказы с любым из указанных статусов (без сортировки)."""
+        self._ensure_loaded()
+        return self._resolve(oid for status in statuses for oid in self._by_status.get(status, ()))
+
+    def has_active_cart(self, user_id: int, date: str, fingerprint: str) -> bool:
+        """Есть ли у пользователя неотменённый заказ с такой корзиной на дату."""
+        self._ensure_loaded()
+        return (user_id, date, fingerprint) in self._active_carts
+
+    async def sales_stats(self) -> SalesStats:
+        """
+        Статистика продаж за всё время. Архивная часть при первом запросе
+        собирается из статистики, которую бэкенд хранит по месяцам; партиция
+        читается, только если такой статистики нет или часть её заказов уже
+        вернули в рабочие данные. Дальше архивная часть ведётся вместе с
+        переносом заказов в архив и из него.
+        """
+        self._ensure_loaded()
+        if not self.archive:
+            return self.stats
+        while self._archive_stats is None:
+            changes = self._archive_changes
+            stats = SalesStats()
+            # Перенос в архив во время подсчёта не идёт: он под той же блокировкой
+            async with self._maintenance_lock():
+                saved = await run_io(self.backend.load_archive_stats)
+                for month in self.archive.months():
+                    order_ids = self.archive.month_ids(month)
+                    count, month_stats = saved.get(month, (None, None))
+                    if count != len(order_ids):
+                        month_stats = await run_io(self._month_stats, month, {str(oid) for oid in order_ids})
+                    stats = stats.merged(month_stats)
+            # Если за время подсчёта заказ вернули из архива, считаем заново
+            if changes == self._archive_changes:
+                self._archive_stats = stats
+        return self.stats.merged(self._archive_stats)
+
+    def _month_stats(self, month: str, order_ids: Set[str]) -> SalesStats:
+        """Статистика оплаченных заказов одной партиции (выполняется в пуле потоков)."""
+        stats = SalesStats()
+        for order_id, order in self.backend.load_archive_month(month).items():
+            if order.status == "оплачено" and order_id in order_ids:
+                stats.add_order(order)
+        return stats
+
+    def slot_index(self) -> SlotIndex:
+        self._ensure_loaded()
+        return self.slots
+
+    def orders_by_date(self, date: str) -> List[Tuple[str, Order]]:
+        """Рабочие заказы на дату доставки в формате dd.mm.YYYY (без сортировки)."""
+        self._ensure_loaded()
+        return self._resolve(self._by_date.get(date, ()))
+
+    async def iter_by_dates(self, date_from: datetime.date, date_to: datetime.date,
+                            status: Optional[str] = None) -> AsyncIterator[Tuple[str, Order]]:
+        """
+        Заказы с датой доставки с date_from по date_to включительно — по дням,
+        внутри дня по номеру; status — только заказы с этим статусом.
+        Обходятся только дни, на которые есть заказы: рабочие берутся из индекса
+        дат, архивные — из месячных партиций, и в памяти одновременно держится
+        не больше одной партиции.
+        """
+        self._ensure_loaded()
+        hot_days: Dict[str, Set[datetime.date]] = defaultdict(set)
+        for date in list(self._by_date):
+            day = _parse_date(date)
+            if day is not None and date_from <= day <= date_to:
+                hot_days[day.strftime("%Y-%m")].add(day)
+        first, last = date_from.strftime("%Y-%m"), date_to.strftime("%Y-%m")
+        months = set(hot_days) | {month for month in self.archive.months() if first <= month <= last}
+
+        for month in sorted(months):
+            archived: Dict[datetime.date, List[Tuple[str, Order]]] = defaultdict(list)
+            if len(self.archive.month_ids(month)):
+                for order_id, order in (await self._peek_month(month)).items():
+                    day = _parse_date(order.date)
+                    # Копия в партиции, чей заказ уже вернули в рабочие данные, пропускается
+                    if day is not None and date_from <= day <= date_to and order_id not in self._data.orders:
+                        archived[day].append((order_id, order))
+            for day in sorted(hot_days.get(month, set()) | set(archived)):
+                orders = self._resolve(self._by_date.get(day.strftime("%d.%m.%Y"), ()))
+                orders += archived.pop(day, [])
+                orders.sort(key=lambda item: int(item[0]))
+                for order_id, order in orders:
+                    if status is None or order.status == status:
+                        yield order_id, order
+                # День за днём отдаём управление event loop, даже если заказы дня отфильтрованы
+                await asyncio.sleep(0)
+
+    async def _peek_month(self, month: str) -> Dict[str, Order]:
+        """Партиция архива из кэша или с диска — без записи в кэш (для разовых проходов по всему архиву)."""
+        orders = self._partitions.get(month)
+        if orders is None:
+            with storage_seconds.time(operation="archive_load"):
+                orders = await run_io(self.backend.load_archive_month, month)
+        return orders
+
+    # === Изменения ===
+    # У каждого изменения два варианта: синхронный (скрипты, миграции, JSON-бэкенд)
+    # и *_async для обработчиков. Если запись в бэкенд может ждать (blocking_writes,
+    # SQLite), *_async выполняет её в пуле потоков и не останавливает event loop;
+    # изменения одного процесса при этом идут по очереди (_write_lock).
+    def create(self, order: Order) -> str:
+        """Сохраняет новый заказ и возвращает его номер."""
+        if not order.fingerprint:
+            order.fingerprint = cart_fingerprint(order.cart)
+        with storage_seconds.time(operation="orders_insert"):
+            order_id = self.backend.create_order(order, self.data.last_id)
+        return self._add_created(order_id, order)
+
+    async def create_async(self, order: Order) -> str:
+        """
+        То же, что create. Слот и корзина учитываются сразу, до записи:
+        параллельное оформление не займёт тот же слот сверх лимита.
+        """
+        if not order.fingerprint:
+            order.fingerprint = cart_fingerprint(order.cart)
+        self._ensure_loaded()
+        self._count_active(order)
+        try:
+            async with self._writing():
+                with storage_seconds.time(operation="orders_insert"):
+                    order_id = await self._write(self.backend.create_order, order, self._data.last_id)
+        finally:
+            self._uncount_active(order)
+        return self._add_created(order_id, order)
+
+    def _add_created(self, order_id: int, order: Order) -> str:
+        data = self.data
+        data.last_id = max(data.last_id, order_id)
+        data.orders[str(order_id)] = order
+        self._index(str(order_id), order)
+        self._after_write()
+        return str(order_id)
+
+    def set_status(self, order_id: str, status: str) -> None:
+        order_id = str(order_id)
+        order = self.data.orders.get(order_id)
+        if order is None:
+            self._restore(order_id, status)
+        else:
+            with storage_seconds.time(operation="orders_update"):
+                self.backend.update_status(int(order_id), status)
+            self._change_status(order_id, order, status)
+        self._after_write()
+
+    async def set_status_async(self, order_id: str, status: str) -> None:
+        order_id = str(order_id)
+        self._ensure_loaded()
+        async with self._writing():
+            order = self._data.orders.get(order_id)
+            if order is None:
+                await self._restore_async(order_id, status)
+            else:
+                with storage_seconds.time(operation="orders_update"):
+                    await self._write(self.backend.update_status, int(order_id), status)
+                self._change_status(order_id, order, status)
+        self._after_write()
+
+    def _split_changes(self, changes: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Делит изменения статусов на рабочие и архивные заказы; неизвестный номер — KeyError."""
+        orders = self.data.orders
+        hot = {str(oid): status for oid, status in changes.items() if str(oid) in orders}
+        archived = {str(oid): status for oid, status in changes.items() if str(oid) not in hot}
+        for order_id in archived:
+            if int(order_id) not in self.archive:
+                raise KeyError(order_id)
+        return hot, archived
+
+    def set_statuses(self, changes: Dict[str, str]) -> None:
+        """
+        Меняет статусы нескольких заказов (номер → статус) одной записью
+        в хранилище. Архивные заказы возвращаются в рабочие данные так же,
+        как в set_status — каждый своей записью.
+        """
+        hot, archived = self._split_changes(changes)
+        if hot:
+            with storage_seconds.time(operation="orders_update"):
+                self.backend.update_statuses([(int(oid), status) for oid, status in hot.items()])
+            self._change_statuses(hot)
+        for order_id, status in archived.items():
+            self._restore(order_id, status)
+        self._after_write()
+
+    async def set_statuses_async(self, changes: Dict[str, str]) -> None:
+        self._ensure_loaded()
+        async with self._writing():
+            hot, archived = self._split_changes(changes)
+            if hot:
+                with storage_seconds.time(operation="orders_update"):
+                    await self._write(self.backend.update_statuses,
+                                      [(int(oid), status) for oid, status in hot.items()])
+                self._change_statuses(hot)
+            for order_id, status in archived.items():
+                await self._restore_async(order_id, status)
+        self._after_write()
+
+    def _change_statuses(self, changes: Dict[str, str]) -> None:
+        orders = self._data.orders
+        for order_id, status in changes.items():
+            self._change_status(order_id, orders[order_id], status)
+
+    def _restore(self, order_id: str, status: str) -> None:
+        """Возвращает архивный заказ в рабочие данные с новым статусом."""
+        month = self._archived_month(order_id)
+        partition = self._partitions.get(month)
+        if partition is None:
+            # Обычно партицию уже прочитал fetch; иначе читаем её здесь (редкий случай)
+            partition = self.backend.load_archive_month(month)
+            self._cache_month(month, partition)
+        archived, order = self._restored_copy(partition, order_id, status)
+        with storage_seconds.time(operation="orders_update"):
+            self.backend.restore_order(int(order_id), order)
+        self._finish_restore(partition, order_id, archived, order)
+
+    async def _restore_async(self, order_id: str, status: str) -> None:
+        partition = await self._archive_month(self._archived_month(order_id))
+        archived, order = self._restored_copy(partition, order_id, status)
+        with storage_seconds.time(operation="orders_update"):
+            await self._write(self.backend.restore_order, int(order_id), order)
+        self._finish_restore(partition, order_id, archived, order)
+
+    def _archived_month(self, order_id: str) -> str:
+        month = self.archive.month_of(int(order_id))
+        if month is None:
+            raise KeyError(order_id)
+        return month
+
+    @staticmethod
+    def _restored_copy(partition: Dict[str, Order], order_id: str, status: str) -> Tuple[Order, Order]:
+        archived = partition[order_id]
+        order = Order(**archived.to_dict())
+        order.status = status
+        return archived, order
+
+    def _finish_restore(self, partition: Dict[str, Order], order_id: str, archived: Order, order: Order) -> None:
+        partition.pop(order_id, None)
+        self.archive.discard(int(order_id))
+        self._archive_changes += 1
+        if self._archive_stats is not None and archived.status == "оплачено":
+            self._archive_stats.remove_order(archived)
+        self._data.orders[order_id] = order
+        self._index_hot(order_id, order)
+
+    def _change_status(self, order_id: str, order: Order, status: str) -> None:
+        self._discard(self._by_status, order.status, order_id)
+        self._uncount_active(order)
+        if order.status == "оплачено" and status != "оплачено":
+            self.stats.remove_order(order)
+        elif order.status != "оплачено" and status == "оплачено":
+            self.stats.add_order(order)
+        order.status = status
+        self._by_status[status].add(order_id)
+        self._count_active(order)
+
+    def _writing(self) -> asyncio.Lock:
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        return self._write_lock
+
+    async def _write(self, func: Callable[..., T], *args: Any) -> T:
+        """Вызов бэкенда из *_async: блокирующий — в пуле потоков, остальные — сразу."""
+        if self.backend.blocking_writes:
+            return await run_io_shielded(func, *args)
+        return func(*args)
+
+    def sync(self) -> int:
+        """
+        Применяет изменения, сделанные другими процессами бота (см. режим WORKERS).
+        Работает только с бэкендами, которые ведут версии строк (SQLite);
+        для остальных ничего не делает. Возвращает число применённых заказов.
+        """
+        if self._data is None:
+            return 0
+        return self._apply_changes(self.backend.order_changes(self._version))
+
+    async def sync_async(self) -> int:
+        """То же, что sync, но чтение изменений идёт через _write (для SQLite — в пуле потоков)."""
+        if self._data is None:
+            return 0
+        async with self._writing():
+            return self._apply_changes(await self._write(self.backend.order_changes, self._version))
+
+    def _apply_changes(self, changes: Optional[Tuple[int, List[Tuple[str, Order]]]]) -> int:
+        if changes is None:
+            return 0
+        self._version, orders = changes
+        for order_id, order in orders:
+            current = self._data.orders.get(order_id)
+            if current is None:
+                self._data.orders[order_id] = order
+                self._data.last_id = max(self._data.last_id, int(order_id))
+                month = self.archive.discard(int(order_id))
+                if month is None:
+                    self._index(order_id, order)
+                else:
+                    # Другой процесс вернул заказ из архива: архивную статистику посчитаем заново
+                    self._partitions.get(month, {}).pop(order_id, None)
+                    self._archive_stats = None
+                    self._archive_changes += 1
+                    self._index_hot(order_id, order)
+            elif current.status != order.status:
+                self._change_status(order_id, current, order.status)
+        return len(orders)
+
+    def replace(self, data: OrdersData) -> None:
+        """Заменяет рабочие заказы хранилища (для совместимости с save_orders); архив не меняется."""
+        self._set_data(data)
+        self._request_compaction(force=True)
+
+    def _set_data(self, data: OrdersData) -> None:
+        self._data = data
+        # Заказ, переданный в рабочих данных, важнее своей архивной копии
+        if self.archive.discard_many(int(oid) for oid in data.orders):
+            self._archive_stats = None
+            self._archive_changes += 1
+        self._rebuild_indexes()
+
+    def _after_write(self) -> None:
+        if self.backend.needs_compaction():
+            self._request_compaction()
+
+    # === Архив ===
+    def _maintenance_lock(self) -> asyncio.Lock:
+        if self._compact_lock is None:
+            self._compact_lock = asyncio.Lock()
+        return self._compact_lock
+
+    async def archive_async(self, today: Optional[datetime.date] = None) -> int:
+        """
+        Переносит в месячные партиции архива оплаченные и отменённые заказы,
+        дата доставки которых прошла archive_after_days дней назад.
+        Запись идёт в пуле потоков, по партиции за раз; из снимка рабочих
+        данных заказы уйдут при следующей компактизации. Возвращает число
+        перенесённых заказов.
+        """
+        if self._data is None or self.archive_after_days <= 0:
+            return 0
+        today = today or datetime.date.today()
+        moved = 0
+        async with self._maintenance_lock():
+            months: Dict[str, Dict[str, Order]] = defaultdict(dict)
+            for date, order_ids in self._by_date.items():
+                if not is_archive_date(date, today, self.archive_after_days):
+                    continue
+                for order_id in order_ids:
+                    order = self._data.orders[order_id]
+                    if order.status in TERMINAL_STATUSES:
+                        months[archive_month(date)][order_id] = order
+            for month, orders in sorted(months.items()):
+                if self._stopping is not None and self._stopping.is_set():
+                    break  # бот останавливается — остальные месяцы перенесём при следующем запуске
+                statuses = {order_id: order.status for order_id, order in orders.items()}
+                job = self.backend.prepare_archive({month: orders})
+                if job is None:
+                    return moved  # бэкенд без архива
+                try:
+                    with storage_seconds.time(operation="archive_save"):
+                        archived = await run_io_shielded(job)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка переноса заказов в архив ({self.backend.name}, {month}): {e}")
+                    break
+                entries = []
+                for order_id in archived:
+                    order = self._data.orders.get(order_id)
+                    # Статус сменили, пока шла запись, — заказ остаётся в рабочих данных
+                    if order is None or order.status != statuses.get(order_id):
+                        continue
+                    self._unindex_archived(order_id, order)
+                    entries.append((int(order_id), order.user_id))
+                self.archive.add(month, entries)
+                self._partitions.pop(month, None)
+                moved += len(entries)
+        if moved:
+            logger.info(f"🗄 В архив перенесено заказов: {moved}")
+        return moved
+
+    def _unindex_archived(self, order_id: str, order: Order) -> None:
+        """Убирает заказ из рабочих данных; номер остаётся в общих индексах (_ids, _by_user)."""
+        del self._data.orders[order_id]
+        self._discard(self._by_status, order.status, order_id)
+        self._discard(self._by_date, order.date, order_id)
+        self._uncount_active(order)
+        if order.status == "оплачено":
+            self.stats.remove_order(order)
+            if self._archive_stats is not None:
+                self._archive_stats.add_order(order)
+
+    # === Компактизация ===
+    def _request_compaction(self, force: bool = False) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop (скрипты, миграции) компактизируем сразу
+            self.compact(force=force)
+            return
+        if self._compact_task is None or self._compact_task.done():
+            self._compact_task = loop.create_task(self.compact_async(force=force))
+
+    def compact(self, force: bool = False) -> None:
+        """Синхронно выполняет обслуживание хранилища (свёртку журнала в снимок и т.п.)."""
+        job = self.backend.prepare_compaction(self.data, force=force)
+        if job is not None:
+            job()
+
+    async def compact_async(self, force: bool = False) -> None:
+        """Выполняет обслуживание хранилища; запись на диск идёт в пуле потоков."""
+        async with self._maintenance_lock():
+            if self._data is None:
+                return
+            start = time.perf_counter()
+            job = self.backend.prepare_compaction(self._data, force=force)
+            if job is None:
+                return
+            try:
+                await run_io_shielded(job)
+            except Exception as e:
+                # Несвёрнутые изменения остаются в бэкенде и будут учтены при следующей попытке
+                logger.error(f"❌ Ошибка компактизации хранилища ({self.backend.name}): {e}")
+            storage_seconds.observe(time.perf_counter() - start, operation="orders_save")
+
+    async def _maintain_periodically(self) -> None:
+        while not self._stopping.is_set():
+            # Первый проход — сразу после запуска: архив мог накопиться, пока бот не работал
+            await self.archive_async()
+            await self.compact_async()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.compact_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """Загружает заказы (в пуле потоков) и запускает фоновые архивацию и компактизацию по таймеру."""
+        with storage_seconds.time(operation="orders_load"):
+            await run_io(self.load)
+        self._stopping = asyncio.Event()
+        self._periodic_task = asyncio.get_running_loop().create_task(self._maintain_periodically())
+
+    async def close(self) -> None:
+        """Останавливает фоновую компактизацию и сворачивает изменения при остановке бота."""
+        if self._periodic_task is not None:
+            # Не cancel(): начатая запись в пуле потоков должна закончиться до финальной компактизации
+            self._stopping.set()
+            await asyncio.wait([self._periodic_task])
+            self._periodic_task = None
+        if self._compact_task is not None and not self._compact_task.done():
+            await self._compact_task
+        await self.compact_async()
+
+
+orders_repo = OrderRepository()
+
+
+def load_orders() -> Dict[str, Any]:
+    """
+    Возвращает копию данных заказов в виде словаря (как в orders.json).
+    Оставлено для совместимости — новые вызовы должны использовать orders_repo.
+    """
+    return orders_repo.data.to_dict()
 
 
 def save_orders(data: Dict[str, Any]) -> None:
     """
-    Сохраняет данные заказов в orders.json с форматированием.
+    Заменяет данные заказов целиком и сохраняет их в бэкенд.
+    Оставлено для совместимости — новые вызовы должны использовать orders_repo.
     """
-    with open(ORDERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    orders_repo.replace(OrdersData(**data))
+
+
+async def aload_orders() -> Dict[str, Any]:
+    """Асинхронный вариант load_orders: первое чтение идёт в пуле потоков."""
+    if orders_repo._data is None:
+        await run_io(orders_repo.load)
+    return orders_repo.data.to_dict()
+
+
+async def asave_orders(data: Dict[str, Any]) -> None:
+    """Асинхронный вариант save_orders: данные записываются в пуле потоков."""
+    orders_repo._set_data(OrdersData(**data))
+    await orders_repo.compact_async(force=True)
 
 
 def is_duplicate_order(cart: List[Dict], user_id: int, target_date: str) -> bool:
     """
     Проверяет, есть ли у пользователя уже оформленный заказ
     с таким же составом корзины на указанную дату.
-    Сравнение — по сортированному списку ягод (игнорирует порядок).
-    """
-    orders_data = load_orders()
-    cart_sorted = sorted(cart, key=lambda x: x["berry"])
-
-    for order in orders_data["orders"].values():
-        if (
-            order["user_id"] == user_id
-            and order["date"] == target_date
-            and order["status"] != "отменён"
-        ):
-            order_cart_sorted = sorted(order["cart"], key=lambda x: x["berry"])
-            if cart_sorted == order_cart_sorted:
-                return True
-    return False
\ No newline at end of file
+    Сравнение — по отпечатку корзины (игнорирует порядок), одна проверка по хэшу.
+    """
+    fingerprint = cart_fingerprint([CartItem(**item) for item in cart])
+    return orders_repo.has_active_cart(user_id, target_date, fingerprint)
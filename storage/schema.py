@@ -1,36 +1,139 @@
 # storage/schema.py
+import sys
 from dataclasses import dataclass, field
-from typing import List, Optional
+from collections import defaultdict
+from typing import List, Optional, Dict, Any, Tuple, Iterable
+
+
+# Строки из небольших замкнутых наборов (ягоды, статусы, даты, время) интернируются:
+# все заказы ссылаются на один экземпляр строки. ФИО, телефоны и отпечатки корзин
+# не интернируются — их число растёт вместе с историей
+def _text(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+# Повторяющиеся числа и упакованные корзины тоже хранятся по одному объекту на значение.
+# Ключ включает тип, чтобы 1 и 1.0 не подменяли друг друга. Кэш ограничен SHARED_LIMIT
+# значениями и при переполнении очищается: популярные корзины быстро попадают в него
+# снова, а значения удалённых заказов не живут до конца процесса
+SHARED_LIMIT = 10_000
+_SHARED: Dict[Tuple[type, Any], Any] = {}
+
+
+def _shared(value: Any) -> Any:
+    key = (type(value), value)
+    shared = _SHARED.get(key)
+    if shared is None:
+        if len(_SHARED) >= SHARED_LIMIT:
+            _SHARED.clear()
+        shared = _SHARED[key] = value
+    return shared
 
 
-@dataclass
 class CartItem:
-    berry: str
-    kg: float
-    price_per_kg: int
-    total_price: float
+    """Позиция корзины. Внутри Order позиции хранятся упакованными в один кортеж (см. Order.cart)."""
 
-    def __post_init__(self):
+    __slots__ = ("berry", "kg", "price_per_kg", "total_price")
+
+    def __init__(self, berry: str, kg: float, price_per_kg: int, total_price: float):
         # Приведение типов на случай загрузки из JSON (где всё — str)
-        self.kg = float(self.kg)
-        self.price_per_kg = int(self.price_per_kg)
-        self.total_price = float(self.total_price)
+        self.berry = _text(berry)
+        self.kg = _shared(float(kg))
+        self.price_per_kg = _shared(int(price_per_kg))
+        self.total_price = _shared(float(total_price))
+
+    @classmethod
+    def _unpacked(cls, berry: str, kg: float, price_per_kg: int, total_price: float) -> "CartItem":
+        """Позиция из уже приведённых значений упакованной корзины (без повторных преобразований)."""
+        item = cls.__new__(cls)
+        item.berry, item.kg, item.price_per_kg, item.total_price = berry, kg, price_per_kg, total_price
+        return item
+
+    def _values(self) -> Tuple[str, float, int, float]:
+        return self.berry, self.kg, self.price_per_kg, self.total_price
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, CartItem) and self._values() == other._values()
+
+    def __repr__(self) -> str:
+        return (f"CartItem(berry={self.berry!r}, kg={self.kg!r}, "
+                f"price_per_kg={self.price_per_kg!r}, total_price={self.total_price!r})")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "berry": self.berry,
+            "kg": self.kg,
+            "price_per_kg": self.price_per_kg,
+            "total_price": self.total_price,
+        }
+
+
+# Полей одной позиции в упакованной корзине: ягода, кг, цена за кг, сумма
+_ITEM_WIDTH = 4
 
 
-@dataclass
 class Order:
-    user_id: int
-    full_name: str
-    phone: str
-    cart: List[CartItem]
-    date: str          # Формат: "dd.mm.YYYY"
-    time: str          # Формат: "HH:MM"
-    status: str        # "ожидает оплату", "оплачено", "отменён"
+    """
+    Заказ. Хранится компактно: __slots__ вместо __dict__, интернированные
+    статусы, даты и время и корзина, упакованная в один кортеж (ягода, кг,
+    цена, сумма, ягода, кг, …), общий для одинаковых корзин через ограниченный
+    кэш. Свойство cart отдаёт список CartItem.
+    """
 
-    def __post_init__(self):
-        if isinstance(self.cart[0], dict):
-            self.cart = [CartItem(**item) for item in self.cart]
-        self.user_id = int(self.user_id)
+    __slots__ = ("user_id", "full_name", "phone", "_cart", "date", "time", "status", "fingerprint")
+
+    def __init__(self, user_id: int, full_name: str, phone: str, cart: Iterable[Any],
+                 date: str, time: str, status: str, fingerprint: str = ""):
+        self.user_id = int(user_id)
+        self.full_name = full_name
+        self.phone = phone
+        self.cart = cart
+        self.date = _text(date)          # Формат: "dd.mm.YYYY"
+        self.time = _text(time)          # Формат: "HH:MM"
+        self.status = _text(status)      # "ожидает оплату", "оплачено", "отменён"
+        self.fingerprint = fingerprint  # Отпечаток состава корзины (см. storage.orders.cart_fingerprint)
+
+    @property
+    def cart(self) -> List[CartItem]:
+        packed = self._cart
+        return [CartItem._unpacked(*packed[i:i + _ITEM_WIDTH]) for i in range(0, len(packed), _ITEM_WIDTH)]
+
+    @cart.setter
+    def cart(self, items: Iterable[Any]) -> None:
+        packed: List[Any] = []
+        for item in items:
+            if isinstance(item, dict):
+                item = CartItem(**item)
+            packed.extend(item._values())
+        self._cart = _shared(tuple(packed))
+
+    @property
+    def total(self) -> float:
+        return sum(self._cart[_ITEM_WIDTH - 1::_ITEM_WIDTH])
+
+    def _values(self) -> Tuple[Any, ...]:
+        return (self.user_id, self.full_name, self.phone, self._cart,
+                self.date, self.time, self.status, self.fingerprint)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Order) and self._values() == other._values()
+
+    def __repr__(self) -> str:
+        return (f"Order(user_id={self.user_id!r}, full_name={self.full_name!r}, phone={self.phone!r}, "
+                f"cart={self.cart!r}, date={self.date!r}, time={self.time!r}, status={self.status!r}, "
+                f"fingerprint={self.fingerprint!r})")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "full_name": self.full_name,
+            "phone": self.phone,
+            "cart": [item.to_dict() for item in self.cart],
+            "date": self.date,
+            "time": self.time,
+            "status": self.status,
+            "fingerprint": self.fingerprint,
+        }
 
 
 @dataclass
@@ -49,12 +152,87 @@ class OrdersData:
                 new_orders[oid] = order_dict  # уже объект
         self.orders = new_orders
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "last_id": self.last_id,
+            "orders": {oid: order.to_dict() for oid, order in self.orders.items()},
+        }
+
 
 @dataclass
+class SalesStats:
+    """Накопительная статистика по оплаченным заказам."""
+    revenue: float = 0.0
+    paid_count: int = 0
+    berry_kg: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    berry_revenue: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+    def add_order(self, order: Order) -> None:
+        self._apply(order, 1)
+
+    def remove_order(self, order: Order) -> None:
+        self._apply(order, -1)
+
+    def _apply(self, order: Order, sign: int) -> None:
+        self.paid_count += sign
+        for item in order.cart:
+            self.revenue += sign * item.total_price
+            self.berry_kg[item.berry] += sign * item.kg
+            self.berry_revenue[item.berry] += sign * item.total_price
+            if abs(self.berry_kg[item.berry]) < 1e-9:
+                del self.berry_kg[item.berry]
+                self.berry_revenue.pop(item.berry, None)
+
+    def merged(self, other: "SalesStats") -> "SalesStats":
+        """Сумма двух статистик (например, рабочих данных и архива) — новый объект."""
+        result = SalesStats(revenue=self.revenue + other.revenue, paid_count=self.paid_count + other.paid_count)
+        for stats in (self, other):
+            for berry, kg in stats.berry_kg.items():
+                result.berry_kg[berry] += kg
+            for berry, revenue in stats.berry_revenue.items():
+                result.berry_revenue[berry] += revenue
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "revenue": self.revenue,
+            "paid_count": self.paid_count,
+            "berry_kg": dict(self.berry_kg),
+            "berry_revenue": dict(self.berry_revenue),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SalesStats":
+        stats = cls(revenue=data["revenue"], paid_count=data["paid_count"])
+        stats.berry_kg.update(data["berry_kg"])
+        stats.berry_revenue.update(data["berry_revenue"])
+        return stats
+
+    def top_berries(self, limit: Optional[int] = None) -> List[Tuple[str, float, float]]:
+        """Рейтинг ягод по объёму: (ягода, кг, выручка), limit=None — все."""
+        ranking = sorted(self.berry_kg.items(), key=lambda x: x[1], reverse=True)
+        if limit is not None:
+            ranking = ranking[:limit]
+        return [(berry, kg, self.berry_revenue.get(berry, 0.0)) for berry, kg in ranking]
+
+
 class User:
-    user_id: int
-    full_name: str
-    phone: str
+    __slots__ = ("user_id", "full_name", "phone")
 
-    def __post_init__(self):
-        self.user_id = int(self.user_id)
\ No newline at end of file
+    def __init__(self, user_id: int, full_name: str, phone: str):
+        self.user_id = int(user_id)
+        self.full_name = full_name
+        self.phone = phone
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, User) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"User(user_id={self.user_id!r}, full_name={self.full_name!r}, phone={self.phone!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "full_name": self.full_name,
+            "phone": self.phone,
+        }
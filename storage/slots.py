@@ -0,0 +1,99 @@
+# storage/slots.py
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+# Часовые слоты доставки: 10:00 – 20:00 включительно
+SLOT_HOURS = range(10, 21)
+SLOT_TIMES = tuple(f"{h:02d}:00" for h in SLOT_HOURS)
+
+# Сколько заказов по умолчанию можно принять на один слот
+SLOT_CAPACITY = 3
+
+_SLOT_POSITION = {time: i for i, time in enumerate(SLOT_TIMES)}
+
+
+def _date_key(date: str) -> str:
+    """Ключ сортировки для даты dd.mm.YYYY без strptime: YYYYmmdd."""
+    return date[6:] + date[3:5] + date[:2]
+
+
+class SlotIndex:
+    """
+    Занятость слотов доставки: для каждой даты — массив счётчиков
+    активных (неотменённых) заказов по 11 часовым слотам.
+    Обновляется хранилищем заказов при создании и отмене заказа.
+    Заказы на время вне сетки (старые данные) хранятся отдельно
+    и только показываются в /admin_slots.
+    """
+
+    def __init__(self, capacity: int = SLOT_CAPACITY):
+        self.capacity = capacity
+        self._counts: Dict[str, List[int]] = {}
+        self._extra: Dict[Tuple[str, str], int] = {}
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self._extra.clear()
+
+    def add(self, date: str, time: str) -> None:
+        self._change(date, time, 1)
+
+    def remove(self, date: str, time: str) -> None:
+        self._change(date, time, -1)
+
+    def _change(self, date: str, time: str, delta: int) -> None:
+        pos = _SLOT_POSITION.get(time)
+        if pos is None:
+            key = (date, time)
+            count = self._extra.get(key, 0) + delta
+            if count > 0:
+                self._extra[key] = count
+            else:
+                self._extra.pop(key, None)
+            return
+        counts = self._counts.get(date)
+        if counts is None:
+            counts = self._counts[date] = [0] * len(SLOT_TIMES)
+        counts[pos] = max(counts[pos] + delta, 0)
+        if not any(counts):
+            del self._counts[date]
+
+    # === Чтение ===
+    def count(self, date: str, time: str) -> int:
+        pos = _SLOT_POSITION.get(time)
+        if pos is None:
+            return self._extra.get((date, time), 0)
+        counts = self._counts.get(date)
+        return counts[pos] if counts else 0
+
+    def is_full(self, date: str, time: str) -> bool:
+        return self.count(date, time) >= self.capacity
+
+    def full_times(self, date: str) -> FrozenSet[str]:
+        """Занятые до предела слоты на дату."""
+        counts = self._counts.get(date)
+        if not counts:
+            return frozenset()
+        return frozenset(t for t, c in zip(SLOT_TIMES, counts) if c >= self.capacity)
+
+    def is_date_full(self, date: str) -> bool:
+        counts = self._counts.get(date)
+        return bool(counts) and min(counts) >= self.capacity
+
+    def full_dates(self, dates: Iterable[str]) -> FrozenSet[str]:
+        """Даты из списка, на которые не осталось ни одного свободного слота."""
+        return frozenset(d for d in dates if self.is_date_full(d))
+
+    def occupied(self, since: Optional[str] = None) -> Iterator[Tuple[str, List[Tuple[str, int]]]]:
+        """
+        Занятые слоты по датам (по возрастанию): (дата, [(время, заказов), ...]).
+        since — дата dd.mm.YYYY, более ранние даты пропускаются.
+        """
+        dates = set(self._counts) | {d for d, _ in self._extra}
+        if since is not None:
+            since_key = _date_key(since)
+            dates = {d for d in dates if _date_key(d) >= since_key}
+        for date in sorted(dates, key=_date_key):
+            counts = self._counts.get(date, ())
+            slots = [(t, c) for t, c in zip(SLOT_TIMES, counts) if c]
+            slots += [(t, c) for (d, t), c in self._extra.items() if d == date]
+            yield date, sorted(slots)
@@ -1,36 +1,202 @@
 # storage/users.py
-import json
-from pathlib import Path
-from typing import Dict, Any
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 
-# Путь к файлу с пользователями
-USERS_FILE = Path("users.json")
+from .backends import StorageBackend, get_backend
+from .io import run_io, run_io_shielded
+from .schema import User
+from utils.metrics import storage_seconds
 
+T = TypeVar("T")
 
-def load_users() -> Dict[str, Any]:
+# Как часто (в секундах) проверять журнал регистраций на необходимость компактизации
+COMPACT_INTERVAL = 300.0
+
+logger = logging.getLogger(__name__)
+
+
+class UserRepository:
     """
-    Загружает пользователей из users.json.
-    Если файл не существует — возвращает пустой словарь.
-    Если файл повреждён — создаёт резервную копию и возвращает пустой словарь.
+    Пользователи в памяти с индексами по номеру телефона и Telegram user_id.
+    Загружаются из бэкенда один раз; регистрация — одна запись в бэкенд
+    (строка журнала или строка таблицы), поэтому вход и регистрация
+    не зависят от числа клиентов.
     """
-    if not USERS_FILE.exists():
-        return {}
-
-    try:
-        with open(USERS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            # Убедимся, что это словарь
-            if not isinstance(data, dict):
-                raise ValueError("users.json должен содержать объект (словарь).")
-            return data
-    except (json.JSONDecodeError, ValueError, OSError) as e:
-        print(f"⚠️ Ошибка чтения users.json: {e}. Данные не загружены.")
-        # Опционально: создать резервную копию повреждённого файла
+
+    def __init__(self, backend: Optional[StorageBackend] = None, compact_interval: float = COMPACT_INTERVAL):
+        self._backend = backend
+        self.compact_interval = compact_interval
+        self._by_phone: Optional[Dict[str, User]] = None
+        self._by_user_id: Dict[int, User] = {}
+        self._version = 0  # версия данных бэкенда, до которой применены изменения (см. sync)
+        self._compact_task: Optional[asyncio.Task] = None
+        self._periodic_task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None  # сигнал фоновой компактизации остановиться
+        self._compact_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def backend(self) -> StorageBackend:
+        return self._backend or get_backend()
+
+    # === Загрузка ===
+    def _ensure_loaded(self) -> None:
+        if self._by_phone is None:
+            self.load()
+
+    def load(self) -> None:
+        self._version = self.backend.data_version()
+        by_phone = self.backend.load_users()
+        self._by_user_id = {user.user_id: user for user in by_phone.values()}
+        self._by_phone = by_phone
+
+    # === Чтение ===
+    def get_by_phone(self, phone: str) -> Optional[User]:
+        self._ensure_loaded()
+        with storage_seconds.time(operation="users_lookup"):
+            return self._by_phone.get(phone)
+
+    def get_by_user_id(self, user_id: int) -> Optional[User]:
+        self._ensure_loaded()
+        return self._by_user_id.get(user_id)
+
+    def all(self) -> List[User]:
+        self._ensure_loaded()
+        return list(self._by_phone.values())
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._by_phone)
+
+    # === Изменения ===
+    def upsert(self, user: User) -> None:
+        """Сохраняет или обновляет пользователя по номеру телефона."""
+        self._ensure_loaded()
+        with storage_seconds.time(operation="users_upsert"):
+            self.backend.upsert_user(user)
+        self._after_upsert(user)
+
+    async def upsert_async(self, user: User) -> None:
+        """То же, что upsert, но блокирующая запись (SQLite) идёт в пуле потоков."""
+        self._ensure_loaded()
+        async with self._writing():
+            with storage_seconds.time(operation="users_upsert"):
+                await self._write(self.backend.upsert_user, user)
+        self._after_upsert(user)
+
+    def _after_upsert(self, user: User) -> None:
+        self._remember(user)
+        if self.backend.users_need_compaction():
+            self._request_compaction()
+
+    def _remember(self, user: User) -> None:
+        previous = self._by_phone.get(user.phone)
+        if previous is not None and self._by_user_id.get(previous.user_id) is previous:
+            del self._by_user_id[previous.user_id]
+        self._by_phone[user.phone] = user
+        self._by_user_id[user.user_id] = user
+
+    def sync(self) -> int:
+        """Применяет регистрации, сделанные другими процессами бота (как OrderRepository.sync)."""
+        if self._by_phone is None:
+            return 0
+        return self._apply_changes(self.backend.user_changes(self._version))
+
+    async def sync_async(self) -> int:
+        """То же, что sync, но чтение изменений идёт через _write (для SQLite — в пуле потоков)."""
+        if self._by_phone is None:
+            return 0
+        async with self._writing():
+            return self._apply_changes(await self._write(self.backend.user_changes, self._version))
+
+    def _apply_changes(self, changes: Optional[Tuple[int, List[User]]]) -> int:
+        if changes is None:
+            return 0
+        self._version, users = changes
+        for user in users:
+            self._remember(user)
+        return len(users)
+
+    def _writing(self) -> asyncio.Lock:
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        return self._write_lock
+
+    async def _write(self, func: Callable[..., T], *args: Any) -> T:
+        """Вызов бэкенда из *_async: блокирующий — в пуле потоков, остальные — сразу."""
+        if self.backend.blocking_writes:
+            return await run_io_shielded(func, *args)
+        return func(*args)
+
+    # === Компактизация ===
+    def _request_compaction(self) -> None:
         try:
-            USERS_FILE.rename(USERS_FILE.with_suffix(".json.corrupted"))
-        except Exception:
-            pass
-        return {}
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop (скрипты, миграции) компактизируем сразу
+            job = self.backend.prepare_users_compaction(self._by_phone)
+            if job is not None:
+                job()
+            return
+        if self._compact_task is None or self._compact_task.done():
+            self._compact_task = loop.create_task(self.compact_async())
+
+    async def compact_async(self) -> None:
+        """Сворачивает журнал регистраций в снимок; запись идёт в пуле потоков."""
+        if self._compact_lock is None:
+            self._compact_lock = asyncio.Lock()
+        async with self._compact_lock:
+            if self._by_phone is None:
+                return
+            start = time.perf_counter()
+            job = self.backend.prepare_users_compaction(self._by_phone)
+            if job is None:
+                return
+            try:
+                await run_io_shielded(job)
+            except Exception as e:
+                logger.error(f"❌ Ошибка компактизации пользователей ({self.backend.name}): {e}")
+            storage_seconds.observe(time.perf_counter() - start, operation="users_save")
+
+    async def _compact_periodically(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.compact_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            await self.compact_async()
+
+    async def start(self) -> None:
+        """Загружает пользователей (в пуле потоков) и запускает фоновую компактизацию."""
+        with storage_seconds.time(operation="users_load"):
+            await run_io(self.load)
+        self._stopping = asyncio.Event()
+        self._periodic_task = asyncio.get_running_loop().create_task(self._compact_periodically())
+
+    async def close(self) -> None:
+        if self._periodic_task is not None:
+            # Не cancel(): начатая запись в пуле потоков должна закончиться до финальной компактизации
+            self._stopping.set()
+            await asyncio.wait([self._periodic_task])
+            self._periodic_task = None
+        if self._compact_task is not None and not self._compact_task.done():
+            await self._compact_task
+        await self.compact_async()
+
+
+users_repo = UserRepository()
+
+
+def load_users() -> Dict[str, Any]:
+    """
+    Возвращает копию всех пользователей в виде словаря.
+    Формат: {phone: {"user_id": ..., "full_name": ..., "phone": ...}}
+    Оставлено для совместимости — новые вызовы должны использовать users_repo.
+    """
+    return {user.phone: user.to_dict() for user in users_repo.all()}
 
 
 def save_user(phone: str, user_id: int, full_name: str) -> None:
@@ -45,15 +211,16 @@ def save_user(phone: str, user_id: int, full_name: str) -> None:
       }
     }
     """
-    users = load_users()
-    users[phone] = {
-        "user_id": user_id,
-        "full_name": full_name,
-        "phone": phone
-    }
-    try:
-        with open(USERS_FILE, "w", encoding="utf-8") as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"❌ Ошибка сохранения users.json: {e}")
-        raise
\ No newline at end of file
+    users_repo.upsert(User(user_id=user_id, full_name=full_name, phone=phone))
+
+
+async def aload_users() -> Dict[str, Any]:
+    """Асинхронный вариант load_users: первое чтение выполняется в пуле потоков."""
+    if users_repo._by_phone is None:
+        await run_io(users_repo.load)
+    return load_users()
+
+
+async def asave_user(phone: str, user_id: int, full_name: str) -> None:
+    """Асинхронный вариант save_user (одна дозапись в журнал или строка в таблице)."""
+    await users_repo.upsert_async(User(user_id=user_id, full_name=full_name, phone=phone))
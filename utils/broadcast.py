@@ -0,0 +1,176 @@
+# utils/broadcast.py
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from storage.io import atomic_write_json, run_io
+from .ratelimit import KeyedRateLimiter, TokenBucket
+
+# Файл с текущей рассылкой (текст и получатели; пишется один раз при запуске)
+# и файл с её прогрессом (пишется после каждого шага) — для продолжения после перезапуска
+BROADCAST_JOB_FILE = Path("broadcast_job.json")
+PROGRESS_FIELDS = ("position", "success", "failed")
+
+# Лимиты Telegram: ~30 сообщений в секунду всего и 1 сообщение в секунду в один чат
+GLOBAL_RATE = 30.0
+PER_CHAT_RATE = 1.0
+
+# Сколько получателей обрабатывается за один шаг (после шага состояние сохраняется)
+BATCH_SIZE = 30
+
+# Как часто (в секундах) обновлять сообщение с прогрессом
+PROGRESS_INTERVAL = 3.0
+
+# Сколько раз повторять отправку после RetryAfter
+MAX_RETRIES = 3
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastEngine:
+    """
+    Фоновая рассылка сообщения всем пользователям.
+
+    Отправки идут параллельно под общим token bucket (GLOBAL_RATE в секунду)
+    и ограничением PER_CHAT_RATE на чат; TelegramRetryAfter приостанавливает
+    все отправки на указанное время. Прогресс показывается правкой статусного
+    сообщения у админа. Текст и список получателей пишутся в файл один раз
+    при запуске, а после каждого шага — только позиция и счётчики в соседний
+    небольшой файл: прерванная рассылка продолжается с места остановки при
+    следующем запуске.
+    """
+
+    def __init__(self, job_file: Path = BROADCAST_JOB_FILE, global_rate: float = GLOBAL_RATE,
+                 per_chat_rate: float = PER_CHAT_RATE, batch_size: int = BATCH_SIZE,
+                 progress_interval: float = PROGRESS_INTERVAL):
+        self.job_file = job_file
+        self.progress_file = job_file.with_name(job_file.stem + ".progress.json")
+        self.global_limiter = TokenBucket(global_rate)
+        self.chat_limiter = KeyedRateLimiter(per_chat_rate)
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.job: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # === Запуск и продолжение ===
+    def start(self, bot: Bot, text: str, user_ids: List[int], chat_id: int, status_message_id: int) -> None:
+        """Запускает новую рассылку в фоне."""
+        if self.running:
+            raise RuntimeError("Рассылка уже выполняется")
+        self.job = {
+            "text": text,
+            # У пользователя может быть несколько записей с разными телефонами — сообщение одно
+            "user_ids": list(dict.fromkeys(user_ids)),
+            "position": 0,
+            "success": 0,
+            "failed": 0,
+            "chat_id": chat_id,
+            "status_message_id": status_message_id,
+        }
+        self._task = asyncio.create_task(self._run(bot, new_job=True))
+
+    def resume(self, bot: Bot) -> bool:
+        """Продолжает прерванную рассылку, если её состояние сохранено. Возвращает True, если продолжили."""
+        if self.running or not self.job_file.exists():
+            return False
+        try:
+            with open(self.job_file, "r", encoding="utf-8") as f:
+                self.job = json.load(f)
+            if self.progress_file.exists():
+                with open(self.progress_file, "r", encoding="utf-8") as f:
+                    self.job.update(json.load(f))
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать {self.job_file}: {e}")
+            return False
+        logger.info(f"📢 Продолжаем рассылку с {self.job['position']} из {len(self.job['user_ids'])}")
+        self._task = asyncio.create_task(self._run(bot))
+        return True
+
+    async def stop(self) -> None:
+        """Останавливает рассылку; сохранённое состояние позволит продолжить её позже."""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    # === Основной цикл ===
+    async def _run(self, bot: Bot, new_job: bool = False) -> None:
+        job = self.job
+        user_ids = job["user_ids"]
+        last_progress = 0.0
+        try:
+            if new_job:
+                self.progress_file.unlink(missing_ok=True)
+                await run_io(atomic_write_json, self.job_file, job)
+            while job["position"] < len(user_ids):
+                batch = user_ids[job["position"]:job["position"] + self.batch_size]
+                results = await asyncio.gather(*(self._send(bot, uid, job["text"]) for uid in batch))
+                job["success"] += sum(results)
+                job["failed"] += len(results) - sum(results)
+                job["position"] += len(batch)
+                await run_io(atomic_write_json, self.progress_file, {name: job[name] for name in PROGRESS_FIELDS})
+
+                if time.monotonic() - last_progress >= self.progress_interval:
+                    last_progress = time.monotonic()
+                    await self._report(bot, f"📢 Рассылка: {job['position']}/{len(user_ids)}…")
+
+            await self._report(
+                bot,
+                f"✅ Рассылка завершена!\nУспешно: {job['success']}, Неудачно: {job['failed']}"
+            )
+            self.job_file.unlink(missing_ok=True)
+            self.progress_file.unlink(missing_ok=True)
+        except asyncio.CancelledError:
+            logger.info(f"📢 Рассылка прервана на {job['position']} из {len(user_ids)}")
+            raise
+        except Exception as e:
+            logger.error(f"❌ Ошибка рассылки: {e}", exc_info=True)
+
+    async def _send(self, bot: Bot, user_id: int, text: str) -> bool:
+        return await self.send(bot, user_id, f"📢 Рассылка:\n\n{text}")
+
+    async def send(self, bot: Bot, chat_id: int, text: str) -> bool:
+        """
+        Отправляет одно сообщение под лимитами рассылки (их делят все массовые
+        отправки бота) с повтором после RetryAfter. Возвращает, доставлено ли оно.
+        """
+        for _ in range(MAX_RETRIES + 1):
+            await self.chat_limiter.acquire(chat_id)
+            await self.global_limiter.acquire()
+            try:
+                await bot.send_message(chat_id, text)
+                return True
+            except TelegramRetryAfter as e:
+                # Флуд-контроль Telegram: притормаживаем все отправки
+                self.global_limiter.pause(e.retry_after)
+                self.chat_limiter.bucket(chat_id).pause(e.retry_after)
+            except TelegramAPIError:
+                # Пользователь заблокировал бота, удалил аккаунт и т.п.
+                return False
+        return False
+
+    async def _report(self, bot: Bot, text: str) -> None:
+        try:
+            await bot.edit_message_text(
+                text=text,
+                chat_id=self.job["chat_id"],
+                message_id=self.job["status_message_id"]
+            )
+        except TelegramAPIError:
+            pass  # Сообщение удалено или текст не изменился — прогресс не критичен
+
+
+broadcaster = BroadcastEngine()
@@ -1,5 +1,6 @@
 # utils/helpers.py
 import re
+from typing import Dict, List, Optional, Tuple
 
 
 def extract_berry_name(text: str) -> str:
@@ -24,4 +25,36 @@ def get_user_role(user_id: int, admin_id: int, helper_ids: list) -> str:
     elif user_id in helper_ids:
         return "helper"
     else:
-        return "user"
\ No newline at end of file
+        return "user"
+
+def parse_page_cursor(callback_data: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Разбирает курсор из callback_data вида "<префикс>_before_<номер>" или "<префикс>_after_<номер>".
+    Возвращает (before, after); для нераспознанных данных — (None, None), т.е. первая страница.
+    """
+    match = re.search(r"_(before|after)_(\d+)$", callback_data)
+    if not match:
+        return None, None
+    cursor = int(match.group(2))
+    return (cursor, None) if match.group(1) == "before" else (None, cursor)
+
+
+def parse_order_ids(spec: str, limit: int) -> Optional[List[str]]:
+    """
+    Разбирает номера заказов вида "12", "12,15" или "20-25" (можно вперемешку: "12,15,20-25").
+    Возвращает номера без повторов в порядке перечисления; None — если формат
+    не распознан или номеров больше limit.
+    """
+    ids: Dict[int, None] = {}
+    for part in spec.split(","):
+        match = re.fullmatch(r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?", part)
+        if not match:
+            return None
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        if last < first or last - first >= limit:
+            return None
+        ids.update(dict.fromkeys(range(first, last + 1)))
+        if len(ids) > limit:
+            return None
+    return [str(order_id) for order_id in ids]
@@ -0,0 +1,89 @@
+# utils/inflight.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, TelegramObject
+
+from .metrics import registry
+
+# Сколько секунд после завершения обработки повтор той же кнопки считается двойным нажатием
+RECENT_TTL = 3.0
+
+logger = logging.getLogger(__name__)
+
+coalesced_total = registry.counter(
+    "bot_coalesced_callbacks_total", "Повторные нажатия кнопок, не дошедшие до обработчика.", ("reason",))
+
+
+class CallbackDeduplicator:
+    """
+    Inner-middleware для кнопок: одно нажатие — одна обработка.
+
+    Ключ — сессия FSM (бот, чат, пользователь) и callback data. Пока
+    обработчик для ключа выполняется, повторные нажатия не запускают его
+    ещё раз, а ждут окончания первой обработки и только «отпускают»
+    кнопку. Ещё RECENT_TTL секунд после успешной обработки повтор
+    отбрасывается сразу — так двойное нажатие не создаёт второй заказ,
+    даже если обновления обрабатываются строго по очереди.
+    """
+
+    def __init__(self, recent_ttl: float = RECENT_TTL):
+        self.recent_ttl = recent_ttl
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        # Ключ → когда закончилась обработка; порядок вставки совпадает с порядком времени
+        self._recent: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    @staticmethod
+    def _key(event: CallbackQuery, data: Dict[str, Any]) -> Tuple:
+        state = data.get("state")
+        session = state.key if state is not None else (event.from_user.id,)
+        return session, event.data
+
+    def _expire(self, now: float) -> None:
+        while self._recent:
+            key, finished = next(iter(self._recent.items()))
+            if now - finished < self.recent_ttl:
+                break
+            del self._recent[key]
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        if not isinstance(event, CallbackQuery) or not event.data:
+            return await handler(event, data)
+        key = self._key(event, data)
+        running = self._in_flight.get(key)
+        if running is not None:
+            coalesced_total.inc(reason="in_flight")
+            # Результат первой обработки не нужен — только дождаться её, не отменяя
+            await asyncio.wait([running])
+            await self._release(event)
+            return None
+        now = time.monotonic()
+        self._expire(now)
+        if key in self._recent:
+            coalesced_total.inc(reason="recent")
+            await self._release(event)
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await handler(event, data)
+            # После ошибки повторное нажатие — законная попытка ещё раз
+            self._recent[key] = time.monotonic()
+            return result
+        finally:
+            del self._in_flight[key]
+            future.set_result(None)
+
+    @staticmethod
+    async def _release(event: CallbackQuery) -> None:
+        """Отвечает на повторное нажатие, чтобы у клиента не крутился индикатор загрузки."""
+        try:
+            await event.answer()
+        except TelegramAPIError as e:
+            logger.debug(f"Не удалось ответить на повторное нажатие: {e}")
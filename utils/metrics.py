@@ -0,0 +1,241 @@
+# utils/metrics.py
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+# Границы корзин гистограмм задержки, в секундах
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Счётчик с метками (растёт только вверх)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value:g}"
+
+
+class Histogram:
+    """
+    Гистограмма с метками: число наблюдений по корзинам, сумма и количество.
+    Наблюдения делаются только из потока event loop, поэтому блокировки не нужны.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Для каждого набора меток: [наблюдений в корзинах (последняя — +Inf), сумма, количество]
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Замеряет время выполнения блока with (в том числе при исключении)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(labels[name] for name in self.labelnames))
+        return series[2] if series else 0
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, observed in zip(self.buckets + (float("inf"),), counts):
+                cumulative += observed
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:.6f}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class MetricsRegistry:
+    """Набор метрик процесса и их выгрузка в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+updates_total = registry.counter(
+    "bot_updates_total", "Полученные обновления по типам.", ("type",))
+update_seconds = registry.histogram(
+    "bot_update_seconds", "Полное время обработки обновления (фильтры, middleware, обработчик).", ("type",))
+handler_seconds = registry.histogram(
+    "bot_handler_seconds", "Время работы обработчика.", ("handler",))
+handler_errors_total = registry.counter(
+    "bot_handler_errors_total", "Исключения, вылетевшие из обработчиков.", ("handler",))
+storage_seconds = registry.histogram(
+    "bot_storage_seconds", "Время операций хранилища (загрузка, запись, поиск).", ("operation",))
+telegram_api_seconds = registry.histogram(
+    "bot_telegram_api_seconds", "Время запросов к Telegram Bot API.", ("method",))
+telegram_api_errors_total = registry.counter(
+    "bot_telegram_api_errors_total", "Запросы к Telegram Bot API, завершившиеся ошибкой.", ("method",))
+
+
+# === Middleware ===
+async def count_updates(handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                        event: Update, data: Dict[str, Any]) -> Any:
+    """Outer-middleware Dispatcher: число и полное время обработки обновлений по типам."""
+    update_type = event.event_type
+    updates_total.inc(type=update_type)
+    with update_seconds.time(type=update_type):
+        return await handler(event, data)
+
+
+async def time_handler(handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+    """Inner-middleware: время и ошибки конкретного обработчика (модуль.функция)."""
+    callback = data["handler"].callback
+    name = f"{callback.__module__}.{callback.__name__}"
+    start = time.perf_counter()
+    try:
+        return await handler(event, data)
+    except Exception:
+        handler_errors_total.inc(handler=name)
+        raise
+    finally:
+        handler_seconds.observe(time.perf_counter() - start, handler=name)
+
+
+async def time_telegram_request(make_request, bot: Bot, method) -> Any:
+    """Middleware сессии бота: время и ошибки запросов к Bot API по методам."""
+    name = type(method).__name__
+    start = time.perf_counter()
+    try:
+        return await make_request(bot, method)
+    except Exception:
+        telegram_api_errors_total.inc(method=name)
+        raise
+    finally:
+        telegram_api_seconds.observe(time.perf_counter() - start, method=name)
+
+
+# === HTTP-эндпоинт /metrics ===
+async def _metrics_view(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер, отдающий метрики на GET /metrics."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", _metrics_view)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"📈 Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def setup_metrics(dp: Dispatcher, host: str = "127.0.0.1", port: int = 0) -> None:
+    """
+    Подключает сбор метрик к Dispatcher: подсчёт обновлений, время обработчиков
+    и запросов к Bot API. Если port не 0, при запуске поднимается эндпоинт /metrics.
+    """
+    dp.update.outer_middleware(count_updates)
+    for name, observer in dp.observers.items():
+        # Inner-middleware Dispatcher действуют и на обработчики вложенных роутеров
+        if name not in ("update", "error"):
+            observer.middleware(time_handler)
+
+    server = MetricsServer(host, port) if port else None
+
+    async def on_startup(bot: Bot) -> None:
+        if time_telegram_request not in bot.session.middleware:
+            bot.session.middleware(time_telegram_request)
+        if server is not None:
+            await server.start()
+
+    async def on_shutdown() -> None:
+        if server is not None:
+            await server.stop()
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
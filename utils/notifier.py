@@ -0,0 +1,155 @@
+# utils/notifier.py
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+# Не больше BURST_LIMIT отдельных уведомлений за WINDOW секунд, остальные — сводкой
+BURST_LIMIT = 5
+WINDOW = 60.0
+
+# Повторные попытки отправки: 1, 2, 4, 8 … секунд
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+
+# Подписи для сводки по видам уведомлений
+KIND_LABELS = {
+    "order": "🛒 Новые заказы",
+    "cancel": "🔁 Отмены заказов",
+}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notification:
+    text: str
+    kind: str = "info"
+    summary: str = ""  # короткая строка для сводки, например "№12"
+    parse_mode: Optional[str] = None
+
+
+class AdminNotifier:
+    """
+    Очередь уведомлений админу с фоновым отправителем.
+
+    Обработчики кладут уведомление в очередь и сразу отвечают клиенту,
+    а отправка (с повторами и экспоненциальной задержкой) идёт в фоне.
+    Если за WINDOW секунд набирается больше BURST_LIMIT уведомлений,
+    остальные объединяются в одно сообщение-сводку.
+    """
+
+    def __init__(self, burst_limit: int = BURST_LIMIT, window: float = WINDOW,
+                 max_retries: int = MAX_RETRIES, base_delay: float = BASE_DELAY):
+        self.burst_limit = burst_limit
+        self.window = window
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.chat_id: Optional[int] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._sent: Deque[float] = deque()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, bot: Bot, chat_id: int) -> None:
+        self.chat_id = chat_id
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._worker(bot))
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Даёт отправителю дослать очередь (не дольше timeout секунд) и останавливает его."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Не отправлено уведомлений админу: {self._queue.qsize()}")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self, text: str, kind: str = "info", summary: str = "", parse_mode: Optional[str] = None) -> None:
+        """Ставит уведомление в очередь и сразу возвращает управление."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait(Notification(text, kind, summary, parse_mode))
+
+    # === Фоновая отправка ===
+    def _drain(self, pending: List[Notification]) -> None:
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    def _budget(self) -> int:
+        """Сколько отдельных сообщений ещё можно отправить в текущем окне."""
+        now = time.monotonic()
+        while self._sent and now - self._sent[0] >= self.window:
+            self._sent.popleft()
+        return self.burst_limit - len(self._sent)
+
+    async def _worker(self, bot: Bot) -> None:
+        while True:
+            pending = [await self._queue.get()]
+            self._drain(pending)
+            try:
+                budget = self._budget()
+                if len(pending) <= budget:
+                    for item in pending:
+                        await self._deliver(bot, item.text, item.parse_mode)
+                else:
+                    if budget <= 0:
+                        # Лимит исчерпан: копим уведомления до конца окна
+                        await asyncio.sleep(self._sent[0] + self.window - time.monotonic())
+                        self._drain(pending)
+                    await self._deliver(bot, self._digest(pending), None)
+            except Exception as e:
+                # Неожиданная ошибка не должна останавливать отправителя: очередь иначе никто не разберёт
+                logger.error(f"❌ Ошибка отправки уведомлений админу ({len(pending)} шт.): {e}", exc_info=True)
+            finally:
+                for _ in pending:
+                    self._queue.task_done()
+
+    def _digest(self, items: List[Notification]) -> str:
+        groups = {}
+        for item in items:
+            groups.setdefault(item.kind, []).append(item)
+        lines = [f"📬 Сводка: {len(items)} уведомлений"]
+        for kind, group in groups.items():
+            label = KIND_LABELS.get(kind, "ℹ️ Прочее")
+            summaries = [i.summary for i in group if i.summary]
+            details = ", ".join(summaries[:20]) + (" …" if len(summaries) > 20 else "")
+            lines.append(f"{label}: {len(group)}" + (f" ({details})" if details else ""))
+        return "\n".join(lines)
+
+    async def _deliver(self, bot: Bot, text: str, parse_mode: Optional[str]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await bot.send_message(self.chat_id, text, parse_mode=parse_mode)
+                self._sent.append(time.monotonic())
+                return
+            except TelegramRetryAfter as e:
+                delay = e.retry_after
+            except (TelegramNetworkError, TelegramServerError) as e:
+                # Временные ошибки — повторяем с нарастающей задержкой
+                logger.warning(f"⚠️ Ошибка при отправке уведомления админу: {e}")
+                delay = self.base_delay * 2 ** attempt
+            except TelegramAPIError as e:
+                # Постоянные ошибки (чат не найден, бот заблокирован) повторять бессмысленно
+                logger.error(f"❌ Не удалось отправить уведомление админу: {e}")
+                return
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+        logger.error(f"❌ Уведомление админу не доставлено: {text[:100]}")
+
+
+admin_notifier = AdminNotifier()
@@ -0,0 +1,95 @@
+# utils/ratelimit.py
+import asyncio
+import time
+from typing import Dict, Hashable, Optional
+
+
+class TokenBucket:
+    """
+    Классический token bucket: rate токенов в секунду, не больше capacity в запасе.
+    """
+
+    # Бакетов бывает по одному на пользователя — без __dict__ они заметно меньше
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Через сколько секунд будет доступно tokens токенов (0 — уже доступно)."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < tokens:
+            wait = max(wait, (tokens - self.tokens) / self.rate)
+        return wait
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        if self.delay(tokens) > 0:
+            return False
+        self.tokens -= tokens
+        return True
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Ждёт, пока не освободится токен, и забирает его."""
+        while True:
+            wait = self.delay(tokens)
+            if wait <= 0:
+                self.tokens -= tokens
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Запрещает выдачу токенов на seconds секунд (например, после RetryAfter)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class KeyedRateLimiter:
+    """
+    Набор token bucket-ов по ключу (например, по chat_id).
+    Бакеты, которые давно не использовались и успели наполниться,
+    удаляются, чтобы словарь не рос бесконечно.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, cleanup_every: int = 1000):
+        self.rate = rate
+        self.capacity = capacity
+        self.cleanup_every = cleanup_every
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._calls = 0
+
+    def bucket(self, key: Hashable) -> TokenBucket:
+        # Чистим до поиска: иначе возвращённый бакет мог бы тут же удалиться,
+        # и то, что с ним сделает вызывающий (забранный токен, пауза), потерялось бы
+        self._calls += 1
+        if self._calls >= self.cleanup_every:
+            self._calls = 0
+            self.cleanup()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+        return bucket
+
+    def try_acquire(self, key: Hashable, tokens: float = 1.0) -> bool:
+        return self.bucket(key).try_acquire(tokens)
+
+    async def acquire(self, key: Hashable, tokens: float = 1.0) -> None:
+        await self.bucket(key).acquire(tokens)
+
+    def cleanup(self) -> None:
+        """Удаляет полностью восстановившиеся бакеты — они ничем не отличаются от новых."""
+        now = time.monotonic()
+        for key in [k for k, b in self._buckets.items()
+                    if b.paused_until <= now and b.tokens + (now - b.updated) * b.rate >= b.capacity]:
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,95 @@
+# utils/throttling.py
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import Dispatcher
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, TelegramObject, User
+
+from .metrics import registry
+from .ratelimit import KeyedRateLimiter
+
+# Классы команд: у каждого свой лимит запросов на пользователя
+DEFAULT_CLASS = "default"   # ввод в диалоге, кнопки корзины и т.п.
+HISTORY_CLASS = "history"   # история и оформление заказов — читают и пересчитывают заказы
+ADMIN_CLASS = "admin"       # отчёты и команды админа
+THROTTLE_CLASSES = (DEFAULT_CLASS, HISTORY_CLASS, ADMIN_CLASS)
+
+HISTORY_COMMANDS = frozenset({"/my_orders", "/order", "/cancel_order"})
+HISTORY_CALLBACKS = ("my_orders", "current_orders", "cancel_page_", "cancel_user_")
+ADMIN_COMMANDS = frozenset({"/oplata", "/cancel_order_admin"})
+ADMIN_CALLBACKS = ("admin_orders_",)
+
+THROTTLED_TEXT = "⏳ Слишком много запросов. Подождите несколько секунд."
+
+# Не чаще одного предупреждения «слишком часто» на пользователя за столько секунд
+WARN_INTERVAL = 10.0
+
+logger = logging.getLogger(__name__)
+
+throttled_total = registry.counter(
+    "bot_throttled_updates_total", "Обновления, отброшенные защитой от флуда, по классам команд.", ("class",))
+
+
+def command_class(event: TelegramObject) -> str:
+    """Класс команды для сообщения или нажатия кнопки."""
+    if isinstance(event, CallbackQuery):
+        data = event.data or ""
+        if data.startswith(ADMIN_CALLBACKS):
+            return ADMIN_CLASS
+        if data.startswith(HISTORY_CALLBACKS):
+            return HISTORY_CLASS
+        return DEFAULT_CLASS
+    text = getattr(event, "text", None) or ""
+    if not text.startswith("/"):
+        return DEFAULT_CLASS
+    command = text.split(maxsplit=1)[0]
+    if command in ADMIN_COMMANDS or command.startswith("/admin_"):
+        return ADMIN_CLASS
+    if command in HISTORY_COMMANDS:
+        return HISTORY_CLASS
+    return DEFAULT_CLASS
+
+
+class Throttler:
+    """
+    Защита от флуда: token bucket на каждого пользователя в каждом классе
+    команд (KeyedRateLimiter — восстановившиеся бакеты сами удаляются).
+    Outer-middleware срабатывает до фильтров и обработчиков: лишнее
+    обновление просто отбрасывается, а пользователь не чаще раза в
+    WARN_INTERVAL секунд получает короткое предупреждение (на кнопку —
+    всплывающим ответом, без нового сообщения).
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], warn_interval: float = WARN_INTERVAL):
+        self._limiters = {name: KeyedRateLimiter(rate, burst) for name, (rate, burst) in limits.items()}
+        self._warnings = KeyedRateLimiter(1 / warn_interval, 1)
+
+    def allow(self, user_id: int, command: str) -> bool:
+        limiter = self._limiters.get(command)
+        return limiter is None or limiter.try_acquire(user_id)
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        command = command_class(event)
+        if user is None or self.allow(user.id, command):
+            return await handler(event, data)
+        throttled_total.inc(**{"class": command})
+        warn = self._warnings.try_acquire(user.id)
+        # На кнопку отвечаем всегда, иначе у клиента продолжает крутиться индикатор загрузки
+        if warn or isinstance(event, CallbackQuery):
+            try:
+                await event.answer(THROTTLED_TEXT if warn else None)
+            except TelegramAPIError as e:
+                logger.warning(f"⚠️ Не удалось ответить на отброшенное обновление: {e}")
+        return None
+
+
+def setup_throttling(dp: Dispatcher, limits: Dict[str, Tuple[float, float]]) -> None:
+    """Подключает защиту от флуда к сообщениям и кнопкам; пустые limits — без ограничений."""
+    if not limits:
+        return
+    throttler = Throttler(limits)
+    dp.message.outer_middleware(throttler)
+    dp.callback_query.outer_middleware(throttler)
@@ -0,0 +1,212 @@
+# utils/watchdog.py
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as StackCounter, defaultdict
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Dict, Optional
+
+from aiogram import Dispatcher
+
+from storage.io import atomic_write_text
+from .metrics import registry
+
+# Как часто event loop отмечается, что он жив (и замеряется его задержка), в секундах
+HEARTBEAT_INTERVAL = 0.1
+
+# Как часто профилировщик сбрасывает накопленные профили на диск, в секундах
+PROFILE_DUMP_INTERVAL = 60.0
+
+# Профиль кода, выполнявшегося вне обработчиков (компактизация, фоновые задачи и т.п.)
+OTHER_PROFILE = "_other"
+
+logger = logging.getLogger(__name__)
+
+loop_lag_seconds = registry.histogram(
+    "bot_loop_lag_seconds", "Задержка пробуждения event loop относительно запланированного времени.")
+loop_stalls_total = registry.counter(
+    "bot_loop_stalls_total", "Сколько раз event loop был занят дольше порога LOOP_LAG_THRESHOLD.")
+
+
+def _frame_label(code: CodeType) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class LoopWatchdog:
+    """
+    Сторож event loop.
+
+    Задача в loop каждые HEARTBEAT_INTERVAL секунд отмечается и пишет в
+    гистограмму, насколько позже запланированного она проснулась. Отдельный
+    поток следит за отметками: если loop не отмечался дольше threshold
+    секунд, значит, какой-то колбэк блокирует его — поток снимает стек
+    потока loop (sys._current_frames) и пишет его в лог, пока блокировка
+    ещё идёт. На одну блокировку — одна запись в лог и +1 к счётчику.
+    """
+
+    def __init__(self, threshold: float, interval: float = HEARTBEAT_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        # Счётчик без меток создаётся заранее: дальше его меняет только поток сторожа
+        loop_stalls_total.inc(0)
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"🐕 Сторож event loop запущен (порог {self.threshold * 1000:.0f} мс)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            planned = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            loop_lag_seconds.observe(max(loop.time() - planned, 0.0))
+            self._beat = time.monotonic()
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold + self.interval or beat == reported_beat:
+                continue
+            reported_beat = beat
+            loop_stalls_total.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(стек недоступен)\n"
+            logger.warning(f"🐢 Event loop заблокирован уже {blocked * 1000:.0f} мс. Стек:\n{stack}")
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик обработчиков.
+
+    Поток раз в interval секунд снимает стек потока event loop и относит
+    его к обработчику, кадр которого есть в стеке (самый внешний, если
+    обработчик вызвал другой). Пока loop простаивает в select, сэмплы
+    не пишутся; работа вне обработчиков копится в профиле _other.
+    Раз в PROFILE_DUMP_INTERVAL секунд и при остановке профили пишутся в
+    out_dir/<модуль.обработчик>.folded — формат «кадр;кадр;… число»,
+    который понимают flamegraph.pl, speedscope и подобные инструменты.
+    """
+
+    def __init__(self, out_dir: Path, interval: float, dump_interval: float = PROFILE_DUMP_INTERVAL):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.dump_interval = dump_interval
+        self._handlers: Dict[CodeType, str] = {}
+        self._profiles: Dict[str, StackCounter] = defaultdict(StackCounter)
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, dp: Dispatcher) -> None:
+        for router in dp.chain_tail:
+            for name, observer in router.observers.items():
+                # На update висит сам Dispatcher (_listen_update) — он в стеке любого обработчика
+                if name == "update":
+                    continue
+                for handler in observer.handlers:
+                    callback = handler.callback
+                    code = getattr(callback, "__code__", None)
+                    if code is not None:
+                        self._handlers[code] = f"{callback.__module__}.{callback.__name__}"
+        self._loop_thread_id = threading.get_ident()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"🔬 Профилировщик пишет профили в {self.out_dir} (сэмпл раз в {self.interval * 1000:.0f} мс)")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            # Поток при выходе сам сбрасывает профили на диск
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+            self._thread = None
+
+    def _run(self) -> None:
+        next_dump = time.monotonic() + self.dump_interval
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._sample(frame)
+            if time.monotonic() >= next_dump:
+                self._dump()
+                next_dump = time.monotonic() + self.dump_interval
+        self._dump()
+
+    def _sample(self, frame: FrameType) -> None:
+        # Loop ждёт событий — это простой, а не работа
+        if frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py"):
+            return
+        stack = []
+        profile = OTHER_PROFILE
+        handler_depth = None
+        while frame is not None:
+            stack.append(frame.f_code)
+            name = self._handlers.get(frame.f_code)
+            if name is not None:
+                profile, handler_depth = name, len(stack)
+            frame = frame.f_back
+        # Для обработчика стек начинается с его кадра, для остального кода — с корня
+        stack = stack[:handler_depth] if handler_depth is not None else stack
+        self._profiles[profile][";".join(_frame_label(code) for code in reversed(stack))] += 1
+
+    def _dump(self) -> None:
+        for profile, stacks in list(self._profiles.items()):
+            lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+            try:
+                atomic_write_text(self.out_dir / f"{profile}.folded", "\n".join(lines) + "\n")
+            except OSError as e:
+                logger.error(f"❌ Не удалось записать профиль {profile}: {e}")
+
+
+def setup_watchdog(dp: Dispatcher, threshold: float = 0.0, profile_dir: Optional[Path] = None,
+                   profile_interval: float = 0.01) -> None:
+    """
+    Подключает к Dispatcher сторож event loop (если threshold > 0) и
+    сэмплирующий профилировщик обработчиков (если задан profile_dir).
+    """
+    watchdog = LoopWatchdog(threshold) if threshold > 0 else None
+    profiler = SamplingProfiler(profile_dir, profile_interval) if profile_dir else None
+    if watchdog is None and profiler is None:
+        return
+
+    async def on_startup() -> None:
+        if watchdog is not None:
+            watchdog.start()
+        if profiler is not None:
+            profiler.start(dp)
+
+    async def on_shutdown() -> None:
+        if watchdog is not None:
+            await watchdog.stop()
+        if profiler is not None:
+            await profiler.stop()
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
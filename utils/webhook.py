@@ -0,0 +1,87 @@
+# utils/webhook.py
+import asyncio
+import logging
+import secrets
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+# Сколько обновлений может обрабатываться одновременно
+MAX_IN_FLIGHT = 100
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Приём обновлений по вебхуку с ограничением числа одновременно обрабатываемых.
+
+    Каждое обновление обрабатывается в фоне, а Telegram сразу получает ответ 200.
+    Когда в работе уже max_in_flight обновлений, ответ на следующий запрос
+    задерживается до освобождения места — Telegram сам притормаживает отправку.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_in_flight: int = MAX_IN_FLIGHT,
+                 secret_token: Optional[str] = None, **data: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_in_flight = max_in_flight
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update: Dict[str, Any] = await request.json(loads=bot.session.json_loads)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        await self._slots.acquire()
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._release)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    def _release(self, task: asyncio.Task) -> None:
+        self._background_feed_update_tasks.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ Ошибка обработки обновления: {task.exception()}")
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret_token: str,
+                       max_in_flight: int = MAX_IN_FLIGHT) -> web.Application:
+    """aiohttp-приложение, принимающее обновления на path; запуск и остановка Dispatcher привязаны к нему."""
+    app = web.Application()
+    handler = BoundedRequestHandler(dp, bot, max_in_flight=max_in_flight, secret_token=secret_token)
+    handler.register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, base_url: str, path: str, host: str, port: int,
+                      secret_token: Optional[str] = None, max_in_flight: int = MAX_IN_FLIGHT) -> None:
+    """
+    Запускает локальный HTTP-сервер для вебхука и регистрирует его в Telegram.
+    Работает, пока задачу не отменят (Ctrl+C).
+    Если secret_token не задан, он генерируется при каждом запуске.
+    """
+    secret_token = secret_token or secrets.token_urlsafe(32)
+    app = create_webhook_app(dp, bot, path, secret_token, max_in_flight)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        await bot.set_webhook(
+            f"{base_url.rstrip('/')}{path}",
+            secret_token=secret_token,
+            max_connections=min(max_in_flight, 100),  # ограничение Telegram: 1–100
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=True
+        )
+        logger.info(f"🌐 Вебхук слушает http://{host}:{port}{path}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
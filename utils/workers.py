@@ -0,0 +1,166 @@
+# utils/workers.py
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+# Сколько обновлений один рабочий процесс обрабатывает одновременно
+WORKER_MAX_IN_FLIGHT = 100
+
+# Сколько секунд ждать завершения рабочих процессов при остановке
+STOP_TIMEOUT = 15.0
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_id(update: Update) -> int:
+    """Telegram ID пользователя, от которого пришло обновление (0, если его нет)."""
+    from_user = getattr(update.event, "from_user", None)
+    return from_user.id if from_user is not None else 0
+
+
+def shard_for(user_id: int, workers: int) -> int:
+    """Номер рабочего процесса, который обслуживает пользователя."""
+    return user_id % workers
+
+
+def worker_fsm_path(fsm_path: Path, index: int) -> Path:
+    """У каждого процесса свой файл состояний: fsm.db → fsm.0.db, fsm.1.db, …"""
+    return fsm_path.with_name(f"{fsm_path.stem}.{index}{fsm_path.suffix}")
+
+
+class WorkerPool:
+    """
+    Несколько процессов бота за одной точкой приёма обновлений.
+
+    Принимающий процесс (polling или вебхук) ничего не обрабатывает сам:
+    его Dispatcher пересылает каждое обновление в очередь процесса
+    user_id % workers. Так все обновления одного пользователя попадают в
+    один процесс, и его состояние FSM (корзина, данные входа) остаётся
+    локальным. Общие данные — заказы и пользователи — процессы делят через
+    SQLite и перед каждым обновлением подтягивают чужие изменения.
+    """
+
+    def __init__(self, workers: int, fsm_path: Path):
+        self.workers = workers
+        self.fsm_path = fsm_path
+        self._queues: List[Any] = []
+        self._processes: List[multiprocessing.Process] = []
+
+    def attach(self, dp: Dispatcher) -> None:
+        """Подключает пересылку обновлений и запуск/остановку процессов к принимающему Dispatcher."""
+        dp.update.outer_middleware(self._forward)
+        dp.startup.register(self.start)
+        dp.shutdown.register(self.stop)
+
+    def start(self) -> None:
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            queue = context.Queue()
+            process = context.Process(
+                target=run_worker,
+                args=(index, self.workers, queue, worker_fsm_path(self.fsm_path, index)),
+                name=f"bot-worker-{index}"
+            )
+            process.start()
+            self._queues.append(queue)
+            self._processes.append(process)
+        logger.info(f"👷 Запущено рабочих процессов: {self.workers}")
+
+    async def stop(self) -> None:
+        """Просит процессы доработать принятые обновления и завершиться."""
+        for queue in self._queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"⚠️ {process.name} не завершился вовремя — останавливаем принудительно")
+                process.terminate()
+        self._queues.clear()
+        self._processes.clear()
+
+    async def _forward(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> None:
+        queue = self._queues[shard_for(update_user_id(event), self.workers)]
+        queue.put(event.model_dump_json(exclude_unset=True))
+
+
+# === Рабочий процесс ===
+def run_worker(index: int, workers: int, queue: Any, fsm_path: Path) -> None:
+    """Точка входа рабочего процесса. Ctrl+C обрабатывает принимающий процесс — он же присылает сигнал остановки."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(index, workers, queue, fsm_path))
+
+
+async def sync_storage(handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+    """Подтягивает заказы и пользователей, изменённые другими процессами, перед обработкой обновления."""
+    from storage.orders import orders_repo
+    from storage.users import users_repo
+
+    # Чтение идёт в пуле потоков: пока другой процесс пишет в базу, event loop не ждёт
+    await orders_repo.sync_async()
+    await users_repo.sync_async()
+    return await handler(event, data)
+
+
+async def _serve(index: int, workers: int, queue: Any, fsm_path: Path) -> None:
+    from config import ADMIN_ID, BOT_TOKEN, METRICS_PORT, PROFILE_DIR
+    from main import create_dispatcher
+
+    bot = Bot(token=BOT_TOKEN)
+    dp = create_dispatcher(
+        fsm_path,
+        metrics_port=METRICS_PORT + 1 + index if METRICS_PORT else 0,
+        profile_dir=PROFILE_DIR / f"worker-{index}" if PROFILE_DIR else None
+    )
+    dp.update.outer_middleware(sync_storage)
+    # Рассылку продолжает только процесс, который обслуживает админа
+    await dp.emit_startup(bot=bot, dispatcher=dp, resume_broadcast=shard_for(ADMIN_ID, workers) == index)
+    logger.info(f"👷 Рабочий процесс {index} готов")
+
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(WORKER_MAX_IN_FLIGHT)
+    tasks: set = set()
+    # Последняя задача каждого пользователя: его обновления обрабатываются строго по очереди
+    last_task: Dict[int, asyncio.Task] = {}
+
+    async def handle(update: Update, previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        await dp.feed_update(bot, update)
+
+    def release(user_id: int, task: asyncio.Task) -> None:
+        tasks.discard(task)
+        if last_task.get(user_id) is task:
+            del last_task[user_id]
+        slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ Ошибка обработки обновления: {task.exception()}")
+
+    try:
+        while True:
+            raw: Optional[str] = await loop.run_in_executor(None, queue.get)
+            if raw is None:
+                break
+            await slots.acquire()
+            update = Update.model_validate(json.loads(raw), context={"bot": bot})
+            user_id = update_user_id(update)
+            task = asyncio.create_task(handle(update, last_task.get(user_id)))
+            last_task[user_id] = task
+            tasks.add(task)
+            task.add_done_callback(partial(release, user_id))
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        logger.info(f"👷 Рабочий процесс {index} остановлен")